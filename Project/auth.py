@@ -7,26 +7,41 @@ How it works:
 - Uses JWT (JSON Web Tokens) to securely manage user authentication.
 - Provides functions to hash passwords, verify passwords, create JWT tokens, and extract the logged-in user from a token.
 - Uses FastAPI's OAuth2PasswordBearer for extracting tokens from requests.
-- Uses passlib for secure password hashing.
+- Uses passlib for secure password hashing. Hashing and verification run on a dedicated process pool, so the
+  CPU-heavy bcrypt work never blocks the event loop or other requests.
 
 Key Concepts:
 - JWT tokens are used to identify users after they log in, so they don't have to send their password with every request.
 - Passwords are never stored in plain text; they are hashed before saving to the database.
 - The `get_logged_in_user` function is used as a dependency in routes to ensure the user is authenticated.
+- `hash_password` and `verify_password` are awaitable. BCRYPT_ROUNDS sets the bcrypt cost; hashes made with a
+  different cost are reported by `verify_and_update_password` so they can be re-hashed on the next login.
+- Verified tokens are cached (keyed by a SHA-256 digest of the token) until their `exp`, so repeat requests with the
+  same token skip signature verification. `revoke_token` removes a token from the cache and rejects it until it expires.
+- Hashing, verification and token checks are timed into the histograms in metrics.py.
+- `require_admin` guards the admin endpoints with a fixed ADMIN_TOKEN instead of a user's JWT.
 
 Other modules can import these functions to handle authentication and password security.
 """
+import asyncio
+import hashlib
+import multiprocessing
 import os
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
+import config  # noqa: F401  (loads .env before the settings below are read)
+from metrics import PASSWORD_HASH_SECONDS, TOKEN_VERIFY_SECONDS, timed
+
 # ___________________________________JWT Token________________________
 
-load_dotenv()
 # Secret key for encoding and decoding JWT tokens.
 SECRET_KEY = os.getenv("SECRET_KEY", "Hasan1234567890")
 # Algorithm used for JWT encoding.
@@ -38,18 +53,67 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 # OAuth2 scheme for extracting the token from the Authorization header.
 token_extractor = OAuth2PasswordBearer(tokenUrl="/users/login")
 
+# ___________________________________Password Hashing________________________
+
+# bcrypt cost factor (work grows 2x per step). Existing hashes with another cost are upgraded on login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Number of processes used for hashing. Bounds how much CPU a login burst can take.
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+
 # Password hashing context using bcrypt algorithm.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
+# Process pool for hashing, created on first use.
+_hash_pool = None
 
-# Function to hash a plain password before storing it in the database.
-def hash_password(password: str):
+
+# Returns the hashing process pool, creating it if needed.
+# 'spawn' starts clean processes, so no sockets or locks are inherited from the server process.
+def get_hash_pool():
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=HASH_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _hash_pool
+
+
+# Stops the hashing processes. Called when the application shuts down.
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(cancel_futures=True)
+        _hash_pool = None
+
+
+# These two run inside the pool processes.
+def _hash(password):
     return pwd_context.hash(password)
 
 
+def _verify_and_update(plain, hashed):
+    return pwd_context.verify_and_update(plain, hashed)
+
+
+# Function to hash a plain password before storing it in the database.
+async def hash_password(password: str):
+    loop = asyncio.get_running_loop()
+    with timed(PASSWORD_HASH_SECONDS, "hash"):
+        return await loop.run_in_executor(get_hash_pool(), _hash, password)
+
+
 # Function to verify a plain password against its hashed version.
-def verify_password(plain, hashed):
-    return pwd_context.verify(plain, hashed)
+# Returns (valid, new_hash). new_hash is set when the stored hash uses an outdated cost and should be replaced.
+async def verify_and_update_password(plain, hashed):
+    loop = asyncio.get_running_loop()
+    with timed(PASSWORD_HASH_SECONDS, "verify"):
+        return await loop.run_in_executor(get_hash_pool(), _verify_and_update, plain, hashed)
+
+
+# Function to verify a plain password against its hashed version.
+async def verify_password(plain, hashed):
+    valid, _ = await verify_and_update_password(plain, hashed)
+    return valid
 
 
 # Function to create a JWT token for a user.
@@ -61,17 +125,91 @@ def create_token(data: dict):
     return encoded_token
 
 
+# ___________________________________Verified Token Cache________________________
+
+# Maximum number of verified tokens remembered at once (least recently used are dropped first).
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+# token digest -> (user_id, exp) for tokens whose signature has already been verified.
+_verified_tokens = OrderedDict()
+# token digest -> exp for tokens that were revoked before they expired.
+_revoked_tokens = {}
+
+
+# Returns the cache key for a token. The raw token is never stored.
+def token_digest(token: str):
+    return hashlib.sha256(token.encode()).digest()
+
+
+# Revocation hook: forgets a cached token and rejects it until it would have expired anyway.
+def revoke_token(token: str):
+    now = time.time()
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp", now + ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    except JWTError:
+        exp = now + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    digest = token_digest(token)
+    _verified_tokens.pop(digest, None)
+    _revoked_tokens[digest] = exp
+    # Revoked tokens only need to be remembered until they expire.
+    for expired in [key for key, expires_at in _revoked_tokens.items() if expires_at <= now]:
+        del _revoked_tokens[expired]
+
+
+# Empties the verified-token cache (e.g. after rotating SECRET_KEY).
+def clear_token_cache():
+    _verified_tokens.clear()
+
+
 # Dependency function to get the currently logged-in user from the JWT token.
-def get_logged_in_user(token: str = Depends(token_extractor)):
+async def get_logged_in_user(token: str = Depends(token_extractor)):
+    start = time.perf_counter()
+    digest = token_digest(token)
+    now = time.time()
+
+    if digest in _revoked_tokens:
+        TOKEN_VERIFY_SECONDS.observe(time.perf_counter() - start, "rejected")
+        raise HTTPException(status_code=401, detail="Token is invalid or expired")
+
+    cached = _verified_tokens.get(digest)
+    if cached is not None:
+        user_id, exp = cached
+        if exp > now:
+            _verified_tokens.move_to_end(digest)
+            TOKEN_VERIFY_SECONDS.observe(time.perf_counter() - start, "cached")
+            return user_id
+        del _verified_tokens[digest]
+
     try:
         # Decode token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")  # 'sub' holds the user ID
 
         if user_id is None:
+            TOKEN_VERIFY_SECONDS.observe(time.perf_counter() - start, "rejected")
             raise HTTPException(status_code=401, detail="Invalid token (no user)")
 
-        return user_id
-
     except JWTError as exc:
+        TOKEN_VERIFY_SECONDS.observe(time.perf_counter() - start, "rejected")
         raise HTTPException(status_code=401, detail="Token is invalid or expired") from exc
+
+    # Remember the verified token until it expires.
+    _verified_tokens[digest] = (user_id, payload.get("exp", now + ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+    if len(_verified_tokens) > TOKEN_CACHE_SIZE:
+        _verified_tokens.popitem(last=False)
+    TOKEN_VERIFY_SECONDS.observe(time.perf_counter() - start, "decoded")
+    return user_id
+
+
+# ___________________________________Admin Token________________________
+
+# Bearer token required by the admin endpoints (routes/admin.py). When empty, those endpoints are disabled.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+# Dependency function that only lets requests carrying ADMIN_TOKEN through.
+def require_admin(token: str = Depends(token_extractor)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,58 @@
+"""
+bench_auth_dependency.py
+
+Microbenchmark of the per-request cost of the `get_logged_in_user` dependency.
+
+How it works:
+- Creates a token with auth.create_token.
+- "cold": clears the verified-token cache before every call, so each call decodes and verifies the JWT.
+- "warm": calls the dependency repeatedly with the same token, so every call after the first is a cache hit.
+- Prints the mean cost per call (in microseconds) for both modes as JSON.
+
+Usage:
+    python benchmarks/bench_auth_dependency.py --calls 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+from common import report
+
+import auth
+
+
+async def run(calls):
+    token = auth.create_token({"sub": "bench-user"})
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        auth.clear_token_cache()
+        await auth.get_logged_in_user(token)
+    cold = time.perf_counter() - start
+
+    auth.clear_token_cache()
+    start = time.perf_counter()
+    for _ in range(calls):
+        await auth.get_logged_in_user(token)
+    warm = time.perf_counter() - start
+
+    return {
+        "calls": calls,
+        "algorithm": auth.ALGORITHM,
+        "cold_us_per_call": round(cold / calls * 1e6, 2),
+        "warm_us_per_call": round(warm / calls * 1e6, 2),
+        "speedup": round(cold / warm, 1) if warm else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+    report(asyncio.run(run(args.calls)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+bench_bulk_ingest.py
+
+Measures how fast a running Tracker API server ingests episodes through the bulk endpoint.
+
+How it works:
+- Creates a throwaway show with POST /shows/add.
+- Generates N synthetic episodes and streams them as NDJSON to POST /shows/{show_id}/episodes/bulk.
+- Prints episodes per second and the server's inserted/failed counts as JSON.
+
+Usage:
+    uvicorn main:app --port 8000
+    python benchmarks/bench_bulk_ingest.py --episodes 100000
+
+Use a scratch database: the show and its episodes are left in place after the run.
+"""
+
+import argparse
+import json
+import time
+import uuid
+
+import httpx
+
+from common import report
+
+
+def generate_episodes(show_id, count, per_season=24):
+    for n in range(count):
+        yield (json.dumps({
+            "id": f"{show_id}-ep-{n:07d}",
+            "show_id": show_id,
+            "season_number": n // per_season + 1,
+            "episode_number": n % per_season + 1,
+            "title": f"Episode {n}",
+            "duration_minutes": 42,
+        }) + "\n").encode()
+
+
+def run(base_url, count, timeout):
+    show_id = f"bench-{uuid.uuid4().hex[:8]}"
+    with httpx.Client(base_url=base_url, timeout=timeout) as http:
+        http.post("/shows/add", json={
+            "id": show_id, "title": "Bulk benchmark", "description": "Synthetic show",
+            "genre": "Benchmark", "release_year": 2024, "type": "Series",
+        }).raise_for_status()
+
+        start = time.perf_counter()
+        response = http.post(
+            f"/shows/{show_id}/episodes/bulk",
+            content=generate_episodes(show_id, count),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        elapsed = time.perf_counter() - start
+        response.raise_for_status()
+        body = response.json()
+
+    return {
+        "show_id": show_id,
+        "episodes": count,
+        "inserted": body.get("inserted"),
+        "failed": body.get("failed"),
+        "elapsed_s": round(elapsed, 3),
+        "episodes_per_s": round(count / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--episodes", type=int, default=100000)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+    report(run(args.base_url, args.episodes, args.timeout), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+bench_concurrency.py
+
+Measures throughput of a running Tracker API server under many concurrent clients.
+
+How it works:
+- Opens N concurrent clients (500 by default) with httpx and has each one send requests in a loop.
+- Every client hits the given paths in turn until the total request budget is used up.
+- Prints requests per second plus latency percentiles as JSON.
+
+Usage:
+    uvicorn main:app --port 8000
+    python benchmarks/bench_concurrency.py --base-url http://localhost:8000 --clients 500 --requests 20000
+
+Run it once against the old sync build and once against the async build (same MongoDB, same data)
+to compare throughput. Thread starvation in the sync build shows up as a flat requests/second
+and a very long p99 as soon as the client count exceeds the threadpool size (40 by default).
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import report, summarize
+
+
+async def run(base_url, paths, clients, total_requests, timeout):
+    latencies = []
+    errors = 0
+    remaining = total_requests
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as http:
+        async def client_loop(offset):
+            nonlocal remaining, errors
+            i = offset
+            while remaining > 0:
+                remaining -= 1
+                path = paths[i % len(paths)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    response = await http.get(path)
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(n) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "base_url": base_url,
+        "paths": paths,
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "latency": summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", action="append", dest="paths", help="Path to request (repeatable)")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    paths = args.paths or ["/", "/shows"]
+    result = asyncio.run(run(args.base_url, paths, args.clients, args.requests, args.timeout))
+    report(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+bench_login.py
+
+Compares login latency under a concurrent burst for the three ways of running bcrypt.
+
+How it works:
+- Hashes one password, then fires N concurrent "logins" (password verifications) at once.
+- Runs the burst three times:
+    - inline:     bcrypt runs directly on the event loop (what an `async def` route calling passlib would do)
+    - threadpool: bcrypt runs on the default threadpool (what the original sync `def` routes did)
+    - process:    bcrypt runs on the dedicated process pool from auth.py (current behaviour)
+- While each burst runs, a ticker measures event-loop lag: how late a trivial request would be served.
+- Prints login p50/p95/p99 and event-loop lag per mode as JSON.
+
+Usage:
+    python benchmarks/bench_login.py --logins 200
+    BCRYPT_ROUNDS=10 HASH_POOL_WORKERS=8 python benchmarks/bench_login.py
+"""
+
+import argparse
+import asyncio
+import time
+
+from common import report, summarize
+
+import auth
+
+
+async def measure_lag(stop, lags, interval=0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def burst(mode, hashed, logins):
+    loop = asyncio.get_running_loop()
+
+    async def one_login():
+        start = time.perf_counter()
+        if mode == "inline":
+            auth._verify_and_update("secret-password", hashed)
+        elif mode == "threadpool":
+            await loop.run_in_executor(None, auth._verify_and_update, "secret-password", hashed)
+        else:
+            await auth.verify_password("secret-password", hashed)
+        return time.perf_counter() - start
+
+    lags = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one_login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    return {
+        "logins_per_s": round(logins / elapsed, 1),
+        "login_latency": summarize(list(latencies)),
+        "event_loop_lag": summarize(lags or [0.0]),
+    }
+
+
+async def run(logins, modes):
+    hashed = auth._hash("secret-password")
+    # Start the pool processes before timing so the first burst does not pay for process start-up.
+    await asyncio.gather(*(auth.verify_password("secret-password", hashed) for _ in range(auth.HASH_POOL_WORKERS)))
+    results = {}
+    for mode in modes:
+        results[mode] = await burst(mode, hashed, logins)
+    auth.shutdown_hash_pool()
+    return {
+        "bcrypt_rounds": auth.BCRYPT_ROUNDS,
+        "hash_pool_workers": auth.HASH_POOL_WORKERS,
+        "logins": logins,
+        "modes": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--mode", action="append", dest="modes", choices=["inline", "threadpool", "process"])
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+    report(asyncio.run(run(args.logins, args.modes or ["inline", "threadpool", "process"])), args.output)
+
+
+if __name__ == "__main__":
+    main()
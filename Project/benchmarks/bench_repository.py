@@ -0,0 +1,90 @@
+"""
+bench_repository.py
+
+Compares the latency of an ownership-checked update done the old way (find_one, then update_one)
+with the single conditional find_one_and_update used by repository.py.
+
+How it works:
+- Seeds a scratch collection with N watchlist-like documents (unique index on id).
+- "two_call": find_one({"id", "user_id"}) followed by update_one({"id"}) - two round trips.
+- "one_call": find_one_and_update({"id", "user_id"}) - one round trip.
+- Runs both patterns with the given concurrency and prints latency percentiles as JSON.
+- Drops the scratch collection at the end.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_repository.py --docs 10000 --ops 20000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from common import report, summarize
+
+from pymongo import ASCENDING, ReturnDocument
+
+from database import db
+
+
+async def two_call(collection, doc_id, user_id):
+    if await collection.find_one({"id": doc_id, "user_id": user_id}):
+        await collection.update_one({"id": doc_id}, {"$set": {"rating": random.randint(1, 10)}})
+
+
+async def one_call(collection, doc_id, user_id):
+    await collection.find_one_and_update(
+        {"id": doc_id, "user_id": user_id},
+        {"$set": {"rating": random.randint(1, 10)}},
+        return_document=ReturnDocument.BEFORE,
+    )
+
+
+async def timed_run(pattern, collection, docs, ops, concurrency):
+    latencies = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(n):
+        doc_id = f"bench-{n % docs}"
+        async with slots:
+            start = time.perf_counter()
+            await pattern(collection, doc_id, f"user-{n % docs % 100}")
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(random.randrange(docs)) for _ in range(ops)))
+    elapsed = time.perf_counter() - started
+    return {"ops_per_s": round(ops / elapsed, 1), "latency": summarize(latencies)}
+
+
+async def run(docs, ops, concurrency):
+    collection = db["bench_repository"]
+    await collection.drop()
+    await collection.create_index([("id", ASCENDING)], unique=True)
+    await collection.insert_many(
+        [{"id": f"bench-{n}", "user_id": f"user-{n % 100}", "rating": 5} for n in range(docs)]
+    )
+    try:
+        return {
+            "docs": docs,
+            "ops": ops,
+            "concurrency": concurrency,
+            "two_call": await timed_run(two_call, collection, docs, ops, concurrency),
+            "one_call": await timed_run(one_call, collection, docs, ops, concurrency),
+        }
+    finally:
+        await collection.drop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+    report(asyncio.run(run(args.docs, args.ops, args.concurrency)), args.output)
+
+
+if __name__ == "__main__":
+    main()
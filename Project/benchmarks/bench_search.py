@@ -0,0 +1,113 @@
+"""
+bench_search.py
+
+Measures search latency of the in-process inverted index on a synthetic show catalog.
+
+How it works:
+- Generates N synthetic shows (500k by default) with random titles, descriptions, genres, types and years.
+- Loads them into search.InvertedIndex (the fallback used when MongoDB has no text index).
+- Query words are sampled from the generated titles (weighted by how often they occur), so every query matches
+  something. Reported separately per kind:
+    - one_word, two_words (both from one title), multi_word (3-4 words of one title), word_and_filters
+    - no_match: words that occur in no title (cheap lookups, kept apart so they do not flatter the others)
+    - empty_q: an empty q over the whole index. GET /shows/search no longer runs this (it pages through the
+      catalog by id instead), so this is the cost the route avoids.
+- Prints build time and query latency percentiles per query kind as JSON.
+
+Usage:
+    python benchmarks/bench_search.py --shows 500000 --queries 500
+
+For the MongoDB text-index backend, seed a database with the same data and point bench_concurrency.py at
+/shows/search?q=... on a running server.
+"""
+
+import argparse
+import random
+import time
+
+from common import report, summarize
+
+from search import InvertedIndex, filter_query
+
+GENRES = ["Drama", "Comedy", "Thriller", "Documentary", "Sci-Fi", "Fantasy", "Crime", "Animation"]
+TYPES = ["Series", "Movie"]
+
+
+def make_vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def make_show(n, vocabulary, rng):
+    # Zipf-like word choice: a few words are common, most are rare, like real text.
+    def words(count):
+        return " ".join(vocabulary[int(rng.paretovariate(1.2)) % len(vocabulary)] for _ in range(count))
+
+    return {
+        "id": f"show-{n}",
+        "title": words(rng.randint(1, 4)),
+        "description": words(rng.randint(10, 30)),
+        "genre": rng.choice(GENRES),
+        "release_year": rng.randint(1950, 2025),
+        "type": rng.choice(TYPES),
+    }
+
+
+def run(shows, queries, seed):
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(50000, rng)
+    index = InvertedIndex()
+
+    titles = []
+    start = time.perf_counter()
+    for n in range(shows):
+        show = make_show(n, vocabulary, rng)
+        index.upsert(show)
+        titles.append(show["title"].split())
+    build_s = time.perf_counter() - start
+
+    title_words = [word for title in titles for word in title]
+    used = set(title_words)
+    unused = [word for word in vocabulary if word not in used] or vocabulary
+    long_titles = {count: [title for title in titles if len(title) >= count] or titles for count in (2, 3)}
+
+    def words_of_one_title(count):
+        title = rng.choice(long_titles[min(count, 3)])
+        return " ".join(rng.sample(title, min(count, len(title))))
+
+    kinds = {
+        "one_word": lambda: (rng.choice(title_words), {}),
+        "two_words": lambda: (words_of_one_title(2), {}),
+        "multi_word": lambda: (words_of_one_title(rng.randint(3, 4)), {}),
+        "word_and_filters": lambda: (
+            rng.choice(title_words),
+            filter_query(rng.choice(GENRES), rng.choice(TYPES), 1990, 2020),
+        ),
+        "no_match": lambda: (rng.choice(unused), {}),
+        "empty_q": lambda: ("", {}),
+    }
+    results = {}
+    for kind, make_query in kinds.items():
+        latencies = []
+        for _ in range(queries):
+            q, filters = make_query()
+            start = time.perf_counter()
+            index.search(q, filters, 20, 0)
+            latencies.append(time.perf_counter() - start)
+        results[kind] = summarize(latencies)
+
+    return {"shows": shows, "build_s": round(build_s, 2), "queries_per_kind": queries, "latency": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shows", type=int, default=500000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+    report(run(args.shows, args.queries, args.seed), args.output)
+
+
+if __name__ == "__main__":
+    main()
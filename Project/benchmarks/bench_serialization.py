@@ -0,0 +1,87 @@
+"""
+bench_serialization.py
+
+Compares JSON serialization throughput for large episode lists.
+
+How it works:
+- Generates 10k and 100k episode documents shaped like the ones GET /episodes returns.
+- "fastapi_default": jsonable_encoder followed by JSONResponse rendering (stdlib json), which is what
+  FastAPI does for a route that returns a plain dict/list.
+- "orjson_response": ORJSONResponse rendering without jsonable_encoder, which is what the read routes do now.
+- Prints documents per second and MB per second for both paths as JSON.
+
+Usage:
+    python benchmarks/bench_serialization.py --sizes 10000 100000 --repeat 5
+"""
+
+import argparse
+import time
+
+from common import report
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+def make_episodes(count):
+    return [
+        {
+            "id": f"ep-{n:07d}",
+            "show_id": f"show-{n // 100}",
+            "season_number": n // 24 % 10 + 1,
+            "episode_number": n % 24 + 1,
+            "title": f"Episode number {n}",
+            "duration_minutes": 42,
+        }
+        for n in range(count)
+    ]
+
+
+def fastapi_default(docs):
+    return JSONResponse(jsonable_encoder(docs)).body
+
+
+def orjson_response(docs):
+    return ORJSONResponse(docs).body
+
+
+def measure(render, docs, repeat):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(render(docs))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "best_ms": round(best * 1000, 2),
+        "docs_per_s": round(len(docs) / best),
+        "mb_per_s": round(size / best / 1e6, 1),
+    }
+
+
+def run(sizes, repeat):
+    results = {}
+    for size in sizes:
+        docs = make_episodes(size)
+        default = measure(fastapi_default, docs, repeat)
+        fast = measure(orjson_response, docs, repeat)
+        results[str(size)] = {
+            "fastapi_default": default,
+            "orjson_response": fast,
+            "speedup": round(default["best_ms"] / fast["best_ms"], 1),
+        }
+    return {"repeat": repeat, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+    report(run(args.sizes, args.repeat), args.output)
+
+
+if __name__ == "__main__":
+    main()
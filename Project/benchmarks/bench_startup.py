@@ -0,0 +1,107 @@
+"""
+bench_startup.py
+
+Measures cold-start and shutdown latency of the Tracker API application.
+
+How it works:
+- "import": time to `import main` in a fresh Python process (module imports and create_app(), no I/O).
+- "uvicorn": starts `uvicorn main:create_app --factory` (one process), polls GET / until it answers, then stops it
+  with SIGTERM. Records time to first response (includes connecting to MongoDB and creating indexes) and time
+  to exit (includes closing the client and the hash pool).
+- "gunicorn": the same with `gunicorn -c gunicorn.conf.py` and --workers worker processes.
+- Every measurement is repeated --runs times; prints percentiles per mode as JSON.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_startup.py --runs 5 --workers 4
+    python benchmarks/bench_startup.py --modes import --runs 20
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+from common import PROJECT_DIR, report, summarize
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+
+def measure_import():
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=PROJECT_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def server_command(mode, port, workers):
+    if mode == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "main:create_app", "--factory", "--port", str(port)], {}
+    return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"], {"PORT": str(port), "WEB_CONCURRENCY": str(workers)}
+
+
+# Starts a server, waits for its first successful response, then stops it. Returns (startup_s, shutdown_s).
+def measure_server(mode, port, workers, timeout):
+    command, extra_env = server_command(mode, port, workers)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, cwd=PROJECT_DIR, env={**os.environ, **extra_env},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{mode} exited with code {process.returncode} before answering")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"{mode} did not answer within {timeout} s")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        startup = time.perf_counter() - start
+
+        stop = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=timeout)
+        return startup, time.perf_counter() - stop
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def run(modes, runs, port, workers, timeout):
+    results = {}
+    for mode in modes:
+        if mode == "import":
+            results[mode] = {"import": summarize([measure_import() for _ in range(runs)])}
+            continue
+        startups, shutdowns = [], []
+        for _ in range(runs):
+            startup, shutdown = measure_server(mode, port, workers, timeout)
+            startups.append(startup)
+            shutdowns.append(shutdown)
+        results[mode] = {"first_response": summarize(startups), "shutdown": summarize(shutdowns)}
+    return {"runs": runs, "workers": workers, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=["import", "uvicorn", "gunicorn"],
+                        default=["import", "uvicorn", "gunicorn"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="gunicorn worker processes")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+    report(run(args.modes, args.runs, args.port, args.workers, args.timeout), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+bench_suite.py
+
+Reproducible load and latency benchmark for the whole Tracker API, with regression thresholds.
+
+How it works:
+- Seeds a scratch MongoDB database (see seed.py) with a configurable number of users, shows, episodes and
+  watch events. The database name comes from --db (default: MONGO_DB_NAME or "bench_show_tracker").
+- Starts virtual users that run a weighted mix of workloads until --duration seconds have passed:
+    - login:  POST /users/login (bcrypt verification storms)
+    - browse: GET /shows, /shows/{show_id}, /shows/{show_id}/episodes and /shows/search
+    - binge:  POST /watched/batch for a whole season
+    - edits:  PUT /watchlist/{watchlist_id} followed by the dashboard, progress, up-next and stats reads
+- By default requests go to main.app in-process through httpx.ASGITransport (no server needed). With --base-url
+  they go to a running server instead; start it with the same MONGO_DB_NAME.
+- Prints JSON with overall throughput and count, error count, requests/second and p50/p95/p99 per route.
+- With --check thresholds.json, exits with status 1 if any threshold is exceeded.
+
+Thresholds file format (route names as printed in the report, "*" applies to every route, "total" to the sum):
+    {"*": {"max_error_rate": 0.01}, "GET /shows": {"p95_ms": 100}, "total": {"min_rps": 200}}
+Keys ending in "_ms" are upper bounds on that latency, "min_rps" is a lower bound on requests/second and
+"max_error_rate" is an upper bound on errors/count.
+
+Usage:
+    python benchmarks/bench_suite.py --users 1000 --shows 500 --duration 30 --concurrency 50 \\
+        --mix login=1,browse=6,binge=2,edits=2 --check benchmarks/thresholds.json --output results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+import httpx
+
+from common import report, summarize
+
+WORKLOADS = ("login", "browse", "binge", "edits")
+DEFAULT_MIX = "login=1,browse=6,binge=2,edits=2"
+SEARCH_WORDS = ["lost", "night", "city", "river", "king", "dark", "secret", "ghost", "empire", "storm"]
+
+
+# Collects latencies and errors per route name.
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.recording = False
+
+    async def request(self, http, route, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await http.request(method, url, **kwargs)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            response, failed = None, True
+        if self.recording:
+            self.latencies[route].append(time.perf_counter() - start)
+            if failed:
+                self.errors[route] += 1
+        return response
+
+    def results(self, elapsed):
+        routes = {}
+        for route in sorted(self.latencies):
+            latencies = self.latencies[route]
+            routes[route] = {
+                **summarize(latencies),
+                "errors": self.errors[route],
+                "rps": round(len(latencies) / elapsed, 1),
+            }
+        count = sum(len(latencies) for latencies in self.latencies.values())
+        total = {
+            "count": count,
+            "errors": sum(self.errors.values()),
+            "rps": round(count / elapsed, 1),
+        }
+        return total, routes
+
+
+# One simulated user: logs in once, then runs workloads chosen by weight.
+class VirtualUser:
+    def __init__(self, http, recorder, rng, args, user_index):
+        self.http = http
+        self.recorder = recorder
+        self.rng = rng
+        self.args = args
+        self.user_id = f"user-{user_index}"
+        self.username = f"user{user_index}"
+        self.headers = {}
+        self.entries = []
+
+    async def setup(self, password):
+        response = await self.http.post("/users/login", data={"username": self.username, "password": password})
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await self.http.get(f"/watchlist/{self.user_id}")
+        response.raise_for_status()
+        # list_watchlist wraps the entries: {"watchlist": [...]}. Seeded users without entries skip the
+        # scenarios that need one (binge, watchlist edits).
+        self.entries = response.json().get("watchlist") or []
+
+    def random_show(self):
+        return f"show-{self.rng.randrange(self.args.shows)}"
+
+    async def login(self, password):
+        await self.recorder.request(self.http, "POST /users/login", "POST", "/users/login",
+                                    data={"username": self.username, "password": password})
+
+    async def browse(self):
+        request = self.recorder.request
+        show_id = self.random_show()
+        await request(self.http, "GET /shows", "GET", "/shows", params={"limit": 50})
+        await request(self.http, "GET /shows/{show_id}", "GET", f"/shows/{show_id}")
+        await request(self.http, "GET /shows/{show_id}/episodes", "GET", f"/shows/{show_id}/episodes",
+                      params={"limit": 100})
+        await request(self.http, "GET /shows/search", "GET", "/shows/search",
+                      params={"q": self.rng.choice(SEARCH_WORDS), "limit": 20})
+
+    async def binge(self):
+        if not self.entries:
+            return
+        entry = self.rng.choice(self.entries)
+        seasons = max(1, -(-self.args.episodes_per_show // 12))
+        await self.recorder.request(self.http, "POST /watched/batch", "POST", "/watched/batch", headers=self.headers,
+                                    json={"watchlist_id": entry["id"], "watched_at": int(time.time()),
+                                          "season_number": self.rng.randint(1, seasons)})
+
+    async def edits(self):
+        request = self.recorder.request
+        if self.entries:
+            entry = dict(self.rng.choice(self.entries))
+            entry["rating"] = self.rng.randint(1, 10)
+            entry["status"] = self.rng.choice(["watching", "completed"])
+            await request(self.http, "PUT /watchlist/{watchlist_id}", "PUT", f"/watchlist/{entry['id']}",
+                          headers=self.headers, json=entry)
+        await request(self.http, "GET /watchlist/{user_id}/dashboard", "GET", f"/watchlist/{self.user_id}/dashboard")
+        await request(self.http, "GET /watchlist/{user_id}/progress", "GET", f"/watchlist/{self.user_id}/progress")
+        await request(self.http, "GET /watchlist/{user_id}/up-next", "GET", f"/watchlist/{self.user_id}/up-next")
+        await request(self.http, "GET /watched/{user_id}/stats", "GET", f"/watched/{self.user_id}/stats",
+                      params={"period": "year", "bucket": "2024"})
+
+
+# Parses "login=1,browse=6" into {"login": 1.0, "browse": 6.0}.
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in WORKLOADS:
+            raise SystemExit(f"Unknown workload {name!r}; choose from {', '.join(WORKLOADS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# Returns a list of violation messages for the given thresholds.
+def check_thresholds(thresholds, total, routes):
+    violations = []
+
+    def check(name, stats, limits):
+        for key, limit in limits.items():
+            if key == "min_rps":
+                actual, ok = stats["rps"], stats["rps"] >= limit
+            elif key == "max_error_rate":
+                actual = stats["errors"] / stats["count"] if stats["count"] else 0.0
+                ok = actual <= limit
+            elif key.endswith("_ms") and key in stats:
+                actual, ok = stats[key], stats[key] <= limit
+            else:
+                violations.append(f"{name}: unknown threshold {key!r}")
+                continue
+            if not ok:
+                violations.append(f"{name}: {key} is {actual}, limit {limit}")
+
+    for route, stats in routes.items():
+        check(route, stats, {**thresholds.get("*", {}), **thresholds.get(route, {})})
+    if "total" in thresholds:
+        check("total", total, thresholds["total"])
+    return violations
+
+
+@asynccontextmanager
+async def open_client(base_url, concurrency, timeout):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as http:
+            yield http
+        return
+
+    # In-process: run the app's lifespan ourselves, because ASGITransport does not.
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as http:
+            yield http
+
+
+async def run(args):
+    from seed import PASSWORD, seed_from_args
+
+    seeded = None if args.skip_seed else await seed_from_args(args)
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    recorder = Recorder()
+
+    async with open_client(args.base_url, args.concurrency, args.timeout) as http:
+        users = []
+        for n in range(args.concurrency):
+            rng = random.Random(args.seed * 100003 + n)
+            user = VirtualUser(http, recorder, rng, args, rng.randrange(args.users))
+            await user.setup(PASSWORD)
+            users.append(user)
+
+        async def loop(user, deadline):
+            while time.perf_counter() < deadline:
+                workload = user.rng.choices(names, weights)[0]
+                if workload == "login":
+                    await user.login(PASSWORD)
+                else:
+                    await getattr(user, workload)()
+
+        if args.warmup:
+            await asyncio.gather(*(loop(user, time.perf_counter() + args.warmup) for user in users))
+        recorder.recording = True
+        start = time.perf_counter()
+        await asyncio.gather(*(loop(user, start + args.duration) for user in users))
+        elapsed = time.perf_counter() - start
+
+    total, routes = recorder.results(elapsed)
+    return {
+        "database": os.environ["MONGO_DB_NAME"],
+        "target": args.base_url or "in-process",
+        "seeded": seeded,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "mix": mix,
+        "total": total,
+        "routes": routes,
+    }
+
+
+def main():
+    from seed import add_arguments
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.getenv("MONGO_DB_NAME") or "bench_show_tracker",
+                        help="Scratch database to seed and benchmark (never the default Show_Tracker)")
+    add_arguments(parser)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the data already in the database")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the app in-process")
+    parser.add_argument("--concurrency", type=int, default=50, help="Number of virtual users")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds to run before recording")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Workload weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--check", metavar="THRESHOLDS", help="Fail if the results exceed these thresholds")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    # Must be set before database.py is imported (by seed.py or main.py).
+    os.environ["MONGO_DB_NAME"] = args.db
+
+    result = asyncio.run(run(args))
+    if args.check:
+        with open(args.check) as handle:
+            result["violations"] = check_thresholds(json.load(handle), result["total"], result["routes"])
+    report(result, args.output)
+    if result.get("violations"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
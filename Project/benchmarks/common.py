@@ -0,0 +1,51 @@
+"""
+common.py
+
+Shared helpers for the benchmark scripts in this folder.
+
+How it works:
+- Makes the Project folder importable, so benchmarks can import the app modules (auth, database, routes, ...).
+- Provides small statistics helpers (percentiles and a latency summary) used by every benchmark.
+- Provides a helper that prints results as JSON, so they can be saved and compared between runs.
+
+Other benchmark scripts import these helpers instead of re-implementing them.
+"""
+
+import json
+import os
+import sys
+
+# Make `import auth`, `import database`, ... work when a benchmark is run from any folder.
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+
+# Returns the p-th percentile (0-100) of a list of numbers using nearest-rank.
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+# Summarises a list of latencies (in seconds) as milliseconds.
+def summarize(latencies):
+    return {
+        "count": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+# Prints a benchmark result as indented JSON (and optionally writes it to a file).
+def report(result, output=None):
+    text = json.dumps(result, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as handle:
+            handle.write(text + "\n")
@@ -0,0 +1,138 @@
+"""
+seed.py
+
+Fills a scratch MongoDB database with synthetic Tracker API data for benchmarks.
+
+How it works:
+- Drops and recreates every application collection in the database named by MONGO_DB_NAME.
+- Creates the application's indexes, then inserts users, shows, episodes, watchlist entries and watch events
+  in large unordered batches. The same random seed always produces the same data.
+- Every user gets the password "bench-password" (hashed once and reused, so seeding stays fast).
+- Rebuilds the watchlist progress documents and watch-history rollups at the end.
+
+Usage (standalone):
+    MONGO_DB_NAME=bench_show_tracker python benchmarks/seed.py --users 1000 --shows 500
+
+Refuses to run against the default 'Show_Tracker' database.
+"""
+
+import argparse
+import asyncio
+import random
+
+from common import report
+
+import auth
+import database
+from indexes import ensure_indexes
+import progress
+import rollups
+
+PASSWORD = "bench-password"
+GENRES = ["Drama", "Comedy", "Thriller", "Documentary", "Sci-Fi", "Fantasy", "Crime", "Animation"]
+STATUSES = ["watching", "watching", "completed", "plan_to_watch"]
+WORDS = ("lost night city river king dark house last secret blue game world fire family road dream "
+         "star war love time ghost island crown empire shadow storm code ocean").split()
+EPISODES_PER_SEASON = 12
+BATCH = 5000
+
+
+async def insert_batched(collection, documents):
+    batch = []
+    count = 0
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= BATCH:
+            await collection.insert_many(batch, ordered=False)
+            count += len(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+        count += len(batch)
+    return count
+
+
+async def seed(users=1000, shows=500, episodes_per_show=24, watchlist_per_user=10, watched_per_entry=6, seed_value=1):
+    if database.MONGO_DB_NAME == "Show_Tracker":
+        raise SystemExit("Refusing to seed the default database; set MONGO_DB_NAME to a scratch database")
+    rng = random.Random(seed_value)
+
+    for name in await database.db.list_collection_names():
+        await database.db.drop_collection(name)
+    await ensure_indexes()
+
+    hashed = auth._hash(PASSWORD)
+    counts = {}
+    counts["users"] = await insert_batched(database.users_db, (
+        {"id": f"user-{n}", "username": f"user{n}", "email": f"user{n}@example.com", "password": hashed}
+        for n in range(users)
+    ))
+    counts["shows"] = await insert_batched(database.shows_db, (
+        {
+            "id": f"show-{n}",
+            "title": " ".join(rng.sample(WORDS, rng.randint(1, 3))).title(),
+            "description": " ".join(rng.choice(WORDS) for _ in range(20)),
+            "genre": rng.choice(GENRES),
+            "release_year": rng.randint(1980, 2025),
+            "type": "Series",
+        }
+        for n in range(shows)
+    ))
+    counts["episodes"] = await insert_batched(database.episodes_db, (
+        {
+            "id": f"show-{s}-ep-{e:04d}",
+            "show_id": f"show-{s}",
+            "season_number": e // EPISODES_PER_SEASON + 1,
+            "episode_number": e % EPISODES_PER_SEASON + 1,
+            "title": f"Episode {e + 1}",
+            "duration_minutes": rng.choice([22, 30, 45, 60]),
+        }
+        for s in range(shows) for e in range(episodes_per_show)
+    ))
+
+    entries = []
+    for u in range(users):
+        for k, s in enumerate(rng.sample(range(shows), min(watchlist_per_user, shows))):
+            entries.append({
+                "id": f"wl-{u}-{k}", "user_id": f"user-{u}", "show_id": f"show-{s}",
+                "status": rng.choice(STATUSES), "rating": rng.randint(1, 10), "notes": "",
+            })
+    counts["watchlist"] = await insert_batched(database.watchlist_db, entries)
+    counts["watched"] = await insert_batched(database.watched_episodes_db, (
+        {
+            "id": f"{entry['id']}:{entry['show_id']}-ep-{e:04d}",
+            "watchlist_id": entry["id"],
+            "episode_id": f"{entry['show_id']}-ep-{e:04d}",
+            "user_id": entry["user_id"],
+            "watched_at": 1700000000 + rng.randint(0, 30000000),
+        }
+        for entry in entries for e in range(min(watched_per_entry, episodes_per_show))
+    ))
+    counts["progress"] = await progress.rebuild()
+    counts["rollup_users"] = await rollups.rebuild()
+    return counts
+
+
+def add_arguments(parser):
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--shows", type=int, default=500)
+    parser.add_argument("--episodes-per-show", type=int, default=24)
+    parser.add_argument("--watchlist-per-user", type=int, default=10)
+    parser.add_argument("--watched-per-entry", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def seed_from_args(args):
+    return seed(args.users, args.shows, args.episodes_per_show, args.watchlist_per_user,
+                args.watched_per_entry, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+    report(asyncio.run(seed_from_args(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+bulk.py
+
+This file provides helpers for bulk ingestion of documents in the Tracker API application.
+
+How it works:
+- `read_items()` reads a request body that is either a JSON array or an NDJSON stream (one JSON object per line)
+  and yields the items one by one. NDJSON bodies are parsed as they arrive, so they never sit in memory whole.
+- `ChunkedInserter` collects documents into chunks and writes each chunk with an unordered `insert_many`.
+  A few chunks are written concurrently, and per-item write errors (e.g. duplicate ids) are collected.
+
+Key Concepts:
+- Unordered inserts let MongoDB keep going after a failed document, so one duplicate does not abort the batch.
+- Item positions in errors are the 0-based positions in the request body.
+- BULK_CHUNK_SIZE and BULK_CONCURRENCY control how many documents go in one write and how many writes run at once.
+
+Other modules can import these helpers to add bulk endpoints for any collection.
+"""
+
+import asyncio
+import os
+
+import orjson
+from pymongo.errors import BulkWriteError
+
+# Documents sent to MongoDB in one insert_many call.
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+# Number of insert_many calls allowed to run at the same time for one request.
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", 4))
+
+# MongoDB error code for a duplicate key.
+DUPLICATE_KEY = 11000
+
+
+# Yields (position, item) for every item in a JSON array or NDJSON request body.
+# Lines that are not valid JSON are yielded as (position, ValueError).
+async def read_items(request):
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        position = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield position, _parse_line(line)
+                    position += 1
+        if buffer.strip():
+            yield position, _parse_line(buffer)
+        return
+
+    try:
+        items = orjson.loads(await request.body())
+    except ValueError as exc:
+        yield 0, ValueError(f"Invalid JSON body: {exc}")
+        return
+    if not isinstance(items, list):
+        yield 0, ValueError("Expected a JSON array")
+        return
+    for position, item in enumerate(items):
+        yield position, item
+
+
+def _parse_line(line):
+    try:
+        return orjson.loads(line)
+    except ValueError as exc:
+        return ValueError(f"Invalid JSON: {exc}")
+
+
+# Writes documents in unordered chunks and collects per-item errors.
+class ChunkedInserter:
+    def __init__(self, collection, chunk_size=BULK_CHUNK_SIZE, concurrency=BULK_CONCURRENCY):
+        self.collection = collection
+        self.chunk_size = chunk_size
+        self.inserted = 0
+        self.errors = []
+        self._chunk = []      # (position, document) pairs waiting to be written
+        self._tasks = []
+        self._slots = asyncio.Semaphore(concurrency)
+
+    # Records an error for an item that was never sent to MongoDB (e.g. failed validation).
+    def reject(self, position, item_id, message):
+        self.errors.append({"index": position, "id": item_id, "error": message})
+
+    # Queues a document; a full chunk is written in the background.
+    async def add(self, position, document):
+        self._chunk.append((position, document))
+        if len(self._chunk) >= self.chunk_size:
+            await self._flush()
+
+    # Writes the last partial chunk and waits for every write to finish.
+    async def finish(self):
+        await self._flush()
+        await asyncio.gather(*self._tasks)
+        self.errors.sort(key=lambda error: error["index"])
+        return {"inserted": self.inserted, "failed": len(self.errors), "errors": self.errors}
+
+    async def _flush(self):
+        if not self._chunk:
+            return
+        chunk, self._chunk = self._chunk, []
+        # Waiting for a free slot here keeps at most `concurrency` chunks in memory.
+        await self._slots.acquire()
+        self._tasks.append(asyncio.create_task(self._write(chunk)))
+
+    async def _write(self, chunk):
+        try:
+            await self.collection.insert_many([document for _, document in chunk], ordered=False)
+            self.inserted += len(chunk)
+        except BulkWriteError as exc:
+            self.inserted += exc.details.get("nInserted", 0)
+            for error in exc.details.get("writeErrors", []):
+                position, document = chunk[error["index"]]
+                message = "Duplicate id" if error.get("code") == DUPLICATE_KEY else error.get("errmsg", "Write failed")
+                self.reject(position, document.get("id"), message)
+        finally:
+            self._slots.release()
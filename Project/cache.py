@@ -0,0 +1,162 @@
+"""
+cache.py
+
+This file provides a read-through cache for show and episode metadata in the Tracker API application.
+
+How it works:
+- `CatalogCache` keeps show documents (key "show:<show_id>") and the first page of a show's episode list
+  (key "episodes:<show_id>") so repeated reads do not go to MongoDB. Later pages are read with a keyset query,
+  so a cached entry never grows with the size of the show.
+- On a miss the value is loaded from MongoDB, stored, and returned. Hits and misses are counted.
+- The write routes in shows.py and episodes.py call `invalidate_show()` / `invalidate_episodes()` so the next
+  read loads fresh data.
+- Values are stored in a pluggable backend. `MemoryBackend` (the default) is an in-process LRU with a TTL.
+  A shared backend (e.g. Redis) can be used across workers by subclassing `CacheBackend` and either calling
+  `catalog_cache.set_backend(...)` or setting CATALOG_CACHE_BACKEND="module:ClassName".
+
+Key Concepts:
+- Every entry has one key ("show:<show_id>" / "episodes:<show_id>") and is stored together with the version
+  (from etags.py) it was loaded for. A read that passes a different version reloads the entry, so once any worker
+  bumps the version the old copy is not served. Reads without a version (e.g. existence checks) take the entry as is.
+- With the in-process backend each worker has its own copy, so a write made by another worker becomes visible
+  after at most CATALOG_CACHE_TTL seconds. Use a shared backend if that is not acceptable.
+- Cached values are shared between requests and must not be modified by callers.
+
+Other modules can import `catalog_cache` to read shows and episode lists through the cache.
+"""
+
+import importlib
+import os
+import time
+from collections import OrderedDict
+
+from database import shows_db, episodes_db
+from pagination import DEFAULT_PAGE_SIZE
+
+# Seconds a cached value stays valid.
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", 60))
+# Maximum number of entries kept by the in-process backend.
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 10000))
+# Optional "module:ClassName" of a custom backend to use instead of MemoryBackend.
+CATALOG_CACHE_BACKEND = os.getenv("CATALOG_CACHE_BACKEND")
+
+
+# Interface every cache backend implements.
+# Methods are async so that network backends (Redis, Memcached, ...) can be plugged in.
+class CacheBackend:
+    async def get(self, key):
+        raise NotImplementedError
+
+    async def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    async def delete(self, *keys):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+# In-process LRU cache with a per-entry time to live.
+class MemoryBackend(CacheBackend):
+    def __init__(self, max_size=CATALOG_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self):
+        self._entries.clear()
+
+
+# Creates the backend named by CATALOG_CACHE_BACKEND, or a MemoryBackend if it is not set.
+def load_backend(path=CATALOG_CACHE_BACKEND):
+    if not path:
+        return MemoryBackend()
+    module_name, class_name = path.split(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+# Read-through cache for show documents and per-show episode lists.
+class CatalogCache:
+    def __init__(self, backend, ttl=CATALOG_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    # Replaces the backend (e.g. with a shared one) and resets the counters.
+    def set_backend(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the cached value for key, or calls loader() and caches its result.
+    # With a version, an entry loaded for another version counts as a miss. Backends store (version, value) pairs.
+    # None results (e.g. a show that does not exist) are not cached.
+    async def get_or_load(self, key, loader, version=None):
+        entry = await self.backend.get(key)
+        if entry is not None and (version is None or entry[0] == version):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = await loader()
+        if value is not None:
+            await self.backend.set(key, (version, value), self.ttl)
+        return value
+
+    # Returns the show document (without _id), or None if the show does not exist.
+    async def get_show(self, show_id, version=None):
+        return await self.get_or_load(
+            f"show:{show_id}", lambda: shows_db.find_one({"id": show_id}, {"_id": 0}), version
+        )
+
+    # Returns the first DEFAULT_PAGE_SIZE + 1 episodes of a show (without _id), ordered by id.
+    # The extra episode tells page_from_list() whether a next page exists. Later pages are not cached.
+    async def get_episodes(self, show_id, version=None):
+        return await self.get_or_load(
+            f"episodes:{show_id}",
+            lambda: episodes_db.find({"show_id": show_id}, {"_id": 0}).sort("id", 1)
+                .limit(DEFAULT_PAGE_SIZE + 1).to_list(None),
+            version,
+        )
+
+    # Removes cached show documents. Called by every write that changes a show.
+    async def invalidate_show(self, *show_ids):
+        await self.backend.delete(*(f"show:{show_id}" for show_id in show_ids))
+
+    # Removes cached episode lists. Called by every write that changes an episode.
+    async def invalidate_episodes(self, *show_ids):
+        await self.backend.delete(*(f"episodes:{show_id}" for show_id in show_ids))
+
+    # Returns the hit/miss counters.
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# The cache shared by all routers.
+catalog_cache = CatalogCache(load_backend())
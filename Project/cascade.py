@@ -0,0 +1,170 @@
+"""
+cascade.py
+
+This file removes the data that belongs to a deleted show in the Tracker API application.
+
+How it works:
+- shows.delete_show deletes the show document and enqueues a "delete_show" job (see jobs.py). The job removes,
+  in batches of CASCADE_BATCH_SIZE:
+    - the show's watchlist entries, with their watched records and progress documents
+      (each owner gets a "watchlist.removed" event, see events.py)
+    - the show's episodes
+    - the show's precomputed recommendations, and the show itself from other shows' similar lists
+      (see recommendations.py)
+- Each batch reads at most CASCADE_BATCH_SIZE ids with an indexed query and deletes exactly those ids, so no single
+  operation runs long and other requests keep flowing in between. The job's progress counters show how many
+  documents of each kind were removed so far.
+- Deleting is idempotent, so a retried job simply continues where the failed attempt stopped.
+- `sweep()` finds orphans left behind before cascading deletes existed (episodes, watchlist entries and
+  recommendation pairs of shows that no longer exist, watched records and progress documents of watchlist entries
+  that no longer exist) and removes them the same way. Each missing show or watchlist entry is counted once.
+  Run it once by hand:
+      python cascade.py sweep            # remove orphans
+      python cascade.py sweep --dry-run  # only count them
+
+Key Concepts:
+- Watch-history rollups (see rollups.py) are left alone: they describe what a user watched, even if the show is
+  gone.
+
+Other modules can import these functions to remove a show's data or to sweep orphans.
+"""
+
+import argparse
+import asyncio
+import os
+
+from database import (
+    episodes_db, shows_db, show_pairs_db, watchlist_db, watched_episodes_db, watch_progress_db,
+)
+from events import publish
+from jobs import register
+from recommendations import remove_show
+
+# Job type enqueued by shows.delete_show.
+DELETE_SHOW_JOB = "delete_show"
+# Documents removed per batch.
+CASCADE_BATCH_SIZE = int(os.getenv("CASCADE_BATCH_SIZE", 1000))
+# Milliseconds to pause between batches, to leave room for other traffic.
+CASCADE_BATCH_PAUSE_MS = float(os.getenv("CASCADE_BATCH_PAUSE_MS", 0))
+
+
+async def _pause():
+    if CASCADE_BATCH_PAUSE_MS:
+        await asyncio.sleep(CASCADE_BATCH_PAUSE_MS / 1000)
+
+
+# Reports progress to a job context (if any) and returns the count.
+async def _report(context, key, count):
+    if context is not None and count:
+        await context.add(key, count)
+    return count
+
+
+# Deletes every document matching query in batches of ids. Returns the number deleted.
+async def delete_in_batches(collection, query, context=None, key=None):
+    deleted = 0
+    while True:
+        ids = [document["id"] for document in
+               await collection.find(query, {"_id": 0, "id": 1}).limit(CASCADE_BATCH_SIZE).to_list(None)]
+        if not ids:
+            return deleted
+        result = await collection.delete_many({"id": {"$in": ids}})
+        deleted += await _report(context, key or collection.name, result.deleted_count)
+        await _pause()
+
+
+# Deletes watchlist entries (given as documents with id and user_id) with their watched records and progress.
+async def delete_watchlist_entries(entries, context=None):
+    watchlist_ids = [entry["id"] for entry in entries]
+    await delete_in_batches(watched_episodes_db, {"watchlist_id": {"$in": watchlist_ids}}, context, "watched")
+    result = await watch_progress_db.delete_many({"watchlist_id": {"$in": watchlist_ids}})
+    await _report(context, "progress", result.deleted_count)
+    result = await watchlist_db.delete_many({"id": {"$in": watchlist_ids}})
+    await _report(context, "watchlist", result.deleted_count)
+    for entry in entries:
+        await publish(entry["user_id"], "watchlist.removed", {"id": entry["id"]})
+
+
+# Removes everything that belongs to a show. Safe to run again after a partial run.
+@register(DELETE_SHOW_JOB)
+async def cascade_delete_show(params, context=None):
+    show_id = params["show_id"]
+    while True:
+        entries = await watchlist_db.find(
+            {"show_id": show_id}, {"_id": 0, "id": 1, "user_id": 1}
+        ).limit(CASCADE_BATCH_SIZE).to_list(None)
+        if not entries:
+            break
+        await delete_watchlist_entries(entries, context)
+        await _pause()
+    await delete_in_batches(episodes_db, {"show_id": show_id}, context, "episodes")
+    await remove_show(show_id)
+
+
+# Yields the distinct values of field in a collection, streamed from the server.
+async def _distinct(collection, field):
+    async for row in await collection.aggregate([{"$group": {"_id": f"${field}"}}]):
+        yield row["_id"]
+
+
+# Yields the values in `values` (an async iterator) that have no matching `id` in `collection`, checked in batches.
+async def _missing(values, collection):
+    batch = []
+
+    async def check(batch):
+        found = {document["id"] async for document in collection.find({"id": {"$in": batch}}, {"_id": 0, "id": 1})}
+        return [value for value in batch if value not in found]
+
+    async for value in values:
+        batch.append(value)
+        if len(batch) >= CASCADE_BATCH_SIZE:
+            for missing in await check(batch):
+                yield missing
+            batch = []
+    if batch:
+        for missing in await check(batch):
+            yield missing
+
+
+# Finds (and unless dry_run, removes) data whose show or watchlist entry no longer exists. Returns counts.
+async def sweep(dry_run=False):
+    counts = {"orphan_shows": 0, "orphan_watchlist_entries": 0, "watched": 0, "progress": 0}
+
+    # Shows that are gone but still have episodes, watchlist entries or recommendation pairs.
+    orphan_shows = set()
+    for collection, field in ((episodes_db, "show_id"), (watchlist_db, "show_id"), (show_pairs_db, "a")):
+        async for show_id in _missing(_distinct(collection, field), shows_db):
+            orphan_shows.add(show_id)
+    counts["orphan_shows"] = len(orphan_shows)
+    if not dry_run:
+        for show_id in orphan_shows:
+            await cascade_delete_show({"show_id": show_id})
+
+    # Watchlist entries that are gone but still have watched records or progress documents. An entry with both
+    # is counted once.
+    orphan_entries = set()
+    for collection, key in ((watched_episodes_db, "watched"), (watch_progress_db, "progress")):
+        orphans = [watchlist_id async for watchlist_id in _missing(_distinct(collection, "watchlist_id"), watchlist_db)]
+        orphan_entries.update(orphans)
+        for start in range(0, len(orphans), CASCADE_BATCH_SIZE):
+            query = {"watchlist_id": {"$in": orphans[start:start + CASCADE_BATCH_SIZE]}}
+            if dry_run:
+                counts[key] += await collection.count_documents(query)
+            elif key == "watched":
+                counts[key] += await delete_in_batches(collection, query)
+            else:
+                counts[key] += (await collection.delete_many(query)).deleted_count
+    counts["orphan_watchlist_entries"] = len(orphan_entries)
+    return counts
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Remove data left behind by deleted shows and watchlist entries.")
+    parser.add_argument("command", choices=["sweep"])
+    parser.add_argument("--dry-run", action="store_true", help="Only count the orphans")
+    args = parser.parse_args()
+    print(await sweep(args.dry_run))
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
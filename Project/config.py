@@ -0,0 +1,21 @@
+"""
+config.py
+
+This file loads the settings of the Tracker API application from the environment.
+
+How it works:
+- Reads the .env file (if there is one) into the process environment, exactly once, when this module is first
+  imported. Variables that are already set in the real environment win over the .env file.
+- Every other module reads its own settings with os.getenv() after this has run. main.py imports this module
+  first; database.py and auth.py import it too, so command-line tools (progress.py, indexes.py, ...) also see .env.
+
+Key Concepts:
+- Loading .env has no side effects beyond setting environment variables, so it is safe to import this module
+  before forking worker processes.
+
+Other modules can import this module to make sure .env has been loaded before they read their settings.
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv()
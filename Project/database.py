@@ -4,47 +4,151 @@ database.py
 This file sets up the connection between the Tracker API application and a MongoDB database.
 
 How it works:
-- Connects to a MongoDB server running on your computer (localhost) at the default port 27017.
-- Selects (or creates) a database named 'Tracker_API'.
+- Connects to the MongoDB server given by the MONGO_URI environment variable using PyMongo's async client.
+- The client is created lazily: `connect()` opens it (main.py's lifespan calls it when a worker starts) and
+  `close()` closes it on shutdown. Importing this module opens no sockets, so the app can be imported before
+  worker processes are forked (e.g. gunicorn --preload) without sharing connections between them.
+- Configures the connection pool (size, timeouts and retry behaviour) from environment variables.
+- Registers the command listener from metrics.py, which times every MongoDB command.
+- Selects (or creates) a database named 'Show_Tracker' (or MONGO_DB_NAME, e.g. a scratch database for benchmarks).
 - Defines references to different collections (like tables in SQL) within the database:
     - users_db: Stores user information (usernames, emails, passwords, etc.)
     - shows_db: Stores TV show details (titles, genres, descriptions, etc.)
     - episodes_db: Stores episode details for each show (episode titles, numbers, etc.)
     - watchlist_db: Stores users' watchlists (shows/episodes they want to watch)
     - watched_episodes_db: Stores records of episodes users have already watched
+    - watch_progress_db: Stores per-watchlist-entry progress counters (see progress.py)
+    - catalog_versions_db: Stores version counters used to build ETags for catalog responses (see etags.py)
+    - watch_rollups_db: Stores per-user watch totals by day, week, month and year (see rollups.py)
+    - show_pairs_db / similar_shows_db: Store show co-occurrence weights and precomputed similar shows
+      (see recommendations.py)
+    - recommendation_users_db: Stores, per user, the watchlist entries already counted in show_pairs_db
+      (see recommendations.py)
+    - events_db: Stores per-user change events for multi-worker event streams (see events.py)
+    - stream_tickets_db: Stores the short-lived, single-use tickets that open an event stream (see routes/events.py)
+    - jobs_db: Stores background jobs and their progress (see jobs.py)
+
+Key Concepts:
+- The async client never blocks the event loop, so routes can be written as `async def` and awaited.
+- A single client (and therefore a single connection pool) is shared by the whole process.
+- The collection variables below are lazy proxies: `users_db.find(...)` works exactly like on a real collection,
+  and the first use connects if `connect()` has not been called yet (e.g. in command-line tools). A process
+  that was forked after connecting gets its own new client instead of reusing the parent's sockets.
 
 Other modules can import these collection variables to interact with the database.
 No data is added or changed here; this file only sets up the connection and references.
 """
 
-# Importing MongoClient from pymongo, which allows Python to connect to a MongoDB database.
-from pymongo import MongoClient
+# Importing AsyncMongoClient from pymongo, which allows Python to talk to MongoDB without blocking the event loop.
+from pymongo import AsyncMongoClient
 import os
-from dotenv import load_dotenv
+
+import config  # noqa: F401  (loads .env before the settings below are read)
+from metrics import METRICS_ENABLED, mongo_listener
 # _____________________________________Mongo DB________________________
-# Creating a connection to the MongoDB server running on your own computer (localhost) at the default port 27017.
 
-load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
+# Name of the database to use. Benchmarks and tests point this at a scratch database.
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "Show_Tracker")
+
+# Connection pool settings. Every value can be overridden from the environment.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 200))                 # Max open connections per server
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 10))                  # Connections kept warm when idle
+MONGO_MAX_CONNECTING = int(os.getenv("MONGO_MAX_CONNECTING", 10))                # Connections allowed to open at once
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000))         # Close connections idle for longer
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))      # Time allowed to open a socket
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000))       # Time allowed for a reply
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))  # Time to wait for a free connection
+MONGO_RETRY_WRITES = os.getenv("MONGO_RETRY_WRITES", "true").lower() == "true"
+MONGO_RETRY_READS = os.getenv("MONGO_RETRY_READS", "true").lower() == "true"
+
+# The client of this process and the id of the process that created it.
+client = None
+_client_pid = None
+
+
+# Creates the AsyncMongoClient (once per process) using MONGO_URI and the pool settings above, and returns it.
+def connect():
+    global client, _client_pid
+    if client is None or _client_pid != os.getpid():
+        client = AsyncMongoClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxConnecting=MONGO_MAX_CONNECTING,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            retryWrites=MONGO_RETRY_WRITES,
+            retryReads=MONGO_RETRY_READS,
+            event_listeners=[mongo_listener] if METRICS_ENABLED else [],
+        )
+        _client_pid = os.getpid()
+    return client
+
+
+# Closes this process's client. The next use of a collection connects again.
+async def close():
+    global client, _client_pid
+    if client is not None and _client_pid == os.getpid():
+        await client.close()
+    client = None
+    _client_pid = None
 
-# Create a MongoClient instance using the MONGO_URI environment variable.
-client = MongoClient(MONGO_URI)
 
-# Selecting (or creating, if it doesn't exist) a database named 'Tracker_API'.
-db = client["Show_Tracker"]
+# Stands in for the database until it is first used.
+class LazyDatabase:
+    def __getattr__(self, attribute):
+        return getattr(connect()[MONGO_DB_NAME], attribute)
 
-# Creating references to different collections (like tables in SQL) within the 'Tracker_API' database.
+    def __getitem__(self, name):
+        return connect()[MONGO_DB_NAME][name]
+
+
+# Stands in for a collection until it is first used. The real collection is re-created if the client changes.
+class LazyCollection:
+    def __init__(self, name):
+        self.name = name
+        self._client = None
+        self._collection = None
+
+    def get(self):
+        current = connect()
+        if self._client is not current:
+            self._collection = current[MONGO_DB_NAME][self.name]
+            self._client = current
+        return self._collection
+
+    def __getattr__(self, attribute):
+        return getattr(self.get(), attribute)
+
+
+# Selecting (or creating, if it doesn't exist) a database named 'Show_Tracker'.
+db = LazyDatabase()
+
+# Creating references to different collections (like tables in SQL) within the 'Show_Tracker' database.
 # Each collection stores a specific type of data for the application.
 
-users_db = db["users_db"]               # Stores user information (e.g., usernames, emails, passwords)
-shows_db = db["shows_db"]               # Stores TV show details (e.g., titles, genres, descriptions)
-episodes_db = db["episodes_db"]         # Stores episode details for each show (e.g., episode titles, numbers)
-watchlist_db = db["watchlist_db"]       # Stores users' watchlists (shows/episodes they want to watch)
-watched_episodes_db = db["watched_episodes_db"]  # Stores records of episodes users have already watched
+users_db = LazyCollection("users_db")                        # Stores user information (e.g., usernames, emails, passwords)
+shows_db = LazyCollection("shows_db")                        # Stores TV show details (e.g., titles, genres, descriptions)
+episodes_db = LazyCollection("episodes_db")                  # Stores episode details for each show (e.g., episode titles, numbers)
+watchlist_db = LazyCollection("watchlist_db")                # Stores users' watchlists (shows/episodes they want to watch)
+watched_episodes_db = LazyCollection("watched_episodes_db")  # Stores records of episodes users have already watched
+watch_progress_db = LazyCollection("watch_progress_db")      # Stores how far each watchlist entry is (episodes/minutes watched)
+catalog_versions_db = LazyCollection("catalog_versions_db")  # Stores version counters for show/episode ETags
+watch_rollups_db = LazyCollection("watch_rollups_db")        # Stores per-user watch totals per day/week/month/year
+show_pairs_db = LazyCollection("show_pairs_db")              # Stores how strongly each pair of shows co-occurs in watchlists
+similar_shows_db = LazyCollection("similar_shows_db")        # Stores the precomputed top similar shows of every show
+recommendation_users_db = LazyCollection("recommendation_users_db")  # Stores the watchlist entries counted in show_pairs_db
+events_db = LazyCollection("events_db")                      # Stores recent change events (only with EVENTS_BROKER=mongo)
+stream_tickets_db = LazyCollection("stream_tickets_db")      # Stores unused event stream tickets until they expire
+jobs_db = LazyCollection("jobs_db")                          # Stores background jobs (only with JOBS_STORE=mongo)
 
 # How this file works:
 # - This file sets up the connection between your Python code and the MongoDB database.
 # - It prepares access to different collections, so other parts of your app can easily read/write data.
 # - Other modules can import these collection variables (like users_db) to interact with the database.
-# - No data is added or changed here; this file only establishes the connection and defines the structure.
-
+# - No data is added or changed here; this file only defines the connection (opened by connect()) and the structure.
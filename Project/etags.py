@@ -0,0 +1,143 @@
+"""
+etags.py
+
+This file provides ETag / conditional GET support for the catalog endpoints of the Tracker API application.
+
+How it works:
+- catalog_versions_db holds one version counter per cacheable resource:
+    - "shows"               the show list (GET /shows)
+    - "show:<show_id>"      one show (GET /shows/{show_id})
+    - "episodes:<show_id>"  the episodes of one show (GET /shows/{show_id}/episodes)
+- The write routes in shows.py and episodes.py call `bump_versions()` after every change.
+- A read route calls `conditional_get()` first. It reads the counters it depends on and builds a strong ETag from
+  them plus the query string. Counters are kept in process memory for CATALOG_VERSIONS_TTL seconds, so most
+  requests need no database round trip at all; only counters that are unknown or older than that are read (one
+  small indexed query). If the request's If-None-Match matches, the route returns the prepared 304 response
+  without reading any documents.
+- `If-None-Match: *` matches any current representation, so it only applies once the route has found the resource:
+  the route calls `not_modified_if_exists()` after its existence check, and a missing resource still gets its 404.
+- Otherwise the route builds its response and calls `apply()` to add the ETag and Cache-Control headers.
+
+Key Concepts:
+- The counters live in MongoDB, so every worker agrees on them. A worker forgets its copy of a counter when it bumps
+  it, so its own writes show up at once; writes made by other workers show up after at most CATALOG_VERSIONS_TTL.
+- The versions are also passed to the catalog cache, which reloads an entry cached under an older version, so a
+  worker never serves cached data under a newer ETag.
+- CATALOG_MAX_AGE (seconds, default 30) goes into Cache-Control, so a CDN or reverse proxy can absorb repeat reads.
+
+Other modules can import these helpers to make more endpoints cacheable.
+"""
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+from fastapi import Response
+from pymongo import UpdateOne
+
+from database import catalog_versions_db
+
+# Seconds clients, CDNs and proxies may reuse a catalog response without revalidating.
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", 30))
+
+# Seconds a worker reuses a version counter it read, before reading it from MongoDB again.
+CATALOG_VERSIONS_TTL = float(os.getenv("CATALOG_VERSIONS_TTL", 1))
+# Counters remembered per worker (least recently used are dropped first).
+CATALOG_VERSIONS_SIZE = 100000
+
+SHOWS_KEY = "shows"
+
+# key -> (version, read_at) for counters recently read by this worker.
+_known_versions = OrderedDict()
+
+
+def show_key(show_id):
+    return f"show:{show_id}"
+
+
+def episodes_key(show_id):
+    return f"episodes:{show_id}"
+
+
+# Increments the version counters of the given keys in one round trip.
+async def bump_versions(*keys):
+    if keys:
+        await catalog_versions_db.bulk_write(
+            [UpdateOne({"_id": key}, {"$inc": {"v": 1}}, upsert=True) for key in dict.fromkeys(keys)],
+            ordered=False,
+        )
+        for key in keys:
+            _known_versions.pop(key, None)
+
+
+# Returns {key: version} for the given keys. Keys that were never bumped have version 0.
+# Counters read less than CATALOG_VERSIONS_TTL seconds ago are taken from memory; the rest in one query.
+async def get_versions(*keys):
+    now = time.monotonic()
+    versions = {}
+    for key in keys:
+        known = _known_versions.get(key)
+        if known is not None and now - known[1] < CATALOG_VERSIONS_TTL:
+            versions[key] = known[0]
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        fetched = dict.fromkeys(missing, 0)
+        async for row in catalog_versions_db.find({"_id": {"$in": missing}}):
+            fetched[row["_id"]] = row["v"]
+        for key, version in fetched.items():
+            _known_versions[key] = (version, now)
+            _known_versions.move_to_end(key)
+        while len(_known_versions) > CATALOG_VERSIONS_SIZE:
+            _known_versions.popitem(last=False)
+        versions.update(fetched)
+    return {key: versions[key] for key in keys}
+
+
+def _candidates(if_none_match):
+    return [value.strip() for value in (if_none_match or "").split(",")]
+
+
+# Returns True if an If-None-Match header value lists the ETag. "*" is not checked here (see is_wildcard).
+def etag_matches(if_none_match, etag):
+    candidates = _candidates(if_none_match)
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+# Returns True if an If-None-Match header value is "*", which matches whenever the resource exists.
+def is_wildcard(if_none_match):
+    return "*" in _candidates(if_none_match)
+
+
+# Result of conditional_get(): the versions read, the ETag, a 304 response if the client is up to date, and whether
+# the client sent If-None-Match: *.
+class Conditional:
+    def __init__(self, versions, etag, not_modified, wildcard=False):
+        self.versions = versions
+        self.etag = etag
+        self.not_modified = not_modified
+        self.wildcard = wildcard
+
+    # Adds the ETag and Cache-Control headers to a response and returns it.
+    def apply(self, response):
+        response.headers["ETag"] = self.etag
+        response.headers["Cache-Control"] = f"public, max-age={CATALOG_MAX_AGE}"
+        return response
+
+    # The 304 response to return once the route has found the resource (or None): If-None-Match: * matches too.
+    def not_modified_if_exists(self):
+        if self.not_modified is None and self.wildcard:
+            self.not_modified = self.apply(Response(status_code=304))
+        return self.not_modified
+
+
+# Reads the versions for keys and checks the request's If-None-Match against the resulting ETag.
+async def conditional_get(request, *keys):
+    versions = await get_versions(*keys)
+    fingerprint = ";".join(f"{key}={versions[key]}" for key in keys) + "?" + request.url.query
+    etag = '"' + hashlib.sha256(fingerprint.encode()).hexdigest()[:20] + '"'
+    if_none_match = request.headers.get("if-none-match")
+    conditional = Conditional(versions, etag, None, is_wildcard(if_none_match))
+    if etag_matches(if_none_match, etag):
+        conditional.not_modified = conditional.apply(Response(status_code=304))
+    return conditional
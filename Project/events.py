@@ -0,0 +1,266 @@
+"""
+events.py
+
+This file provides per-user change events for the Tracker API application, so clients can stay in sync across
+devices without polling.
+
+How it works:
+- The write routes in watchlist.py and watched.py call `publish()` after every change, e.g.
+  "watchlist.added", "watchlist.updated", "watchlist.removed", "watched.added", "watched.removed" and
+  "progress.updated" (with the entry's fresh progress document).
+- routes/events.py streams a user's events as server-sent events (SSE). A client opens the stream once and
+  receives every change as it happens.
+- Events go through a pluggable broker:
+    - `InMemoryBroker` (the default) delivers events inside one process. It is enough for a single worker.
+    - `ChangeStreamBroker` (EVENTS_BROKER=mongo) stores events in events_db and delivers them to every worker
+      through one MongoDB change stream per process. It needs a replica set (change streams do not work on a
+      standalone server). events_db is cleaned up by a TTL index after EVENTS_RETENTION_SECONDS.
+    - Any other broker can be plugged in by subclassing `EventBroker` and setting EVENTS_BROKER="module:ClassName".
+- Resuming: every event has an id, sent as the SSE `id:` field. After a reconnect the browser sends it back in
+  the Last-Event-ID header and the stream first replays the events the client missed. The in-memory broker keeps
+  the last EVENTS_BUFFER_SIZE events per user; the change-stream broker uses the change stream resume token as the
+  event id, so any worker can replay from it. If the events cannot be replayed (too old, or unknown id) the stream
+  sends a "reset" event, which tells the client to fetch its data once and continue from there.
+
+Key Concepts:
+- A subscription registers for live events before replaying missed ones and skips duplicates, so no event is lost
+  between the two.
+- A client that reads too slowly gets a "reset" event instead of an unbounded queue.
+- Publishing never fails a write: broker errors are logged.
+
+Other modules can import `publish` to send events, or `event_broker` to subscribe to them.
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import secrets
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+from pymongo.errors import PyMongoError
+
+from database import events_db, watch_progress_db
+
+# "memory" (default), "mongo", or "module:ClassName" of a custom broker.
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "memory")
+# Events remembered per user for resuming (in-memory broker).
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", 100))
+# Users whose recent events are remembered (in-memory broker); least recently active users are dropped first.
+EVENTS_MAX_USERS = int(os.getenv("EVENTS_MAX_USERS", 10000))
+# Events a subscriber may fall behind by before it gets a "reset" event.
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 1000))
+# Seconds events are kept in events_db (change-stream broker).
+EVENTS_RETENTION_SECONDS = int(os.getenv("EVENTS_RETENTION_SECONDS", 86400))
+
+logger = logging.getLogger(__name__)
+
+
+def reset_event():
+    return {"id": None, "type": "reset", "data": {}}
+
+
+# One client's stream of events: replayed events first, then live ones.
+class Subscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self.backlog = deque()
+        self.replayed = set()
+
+    # Returns the next event, or None if nothing arrived within timeout seconds.
+    async def next(self, timeout):
+        if self.backlog:
+            return self.backlog.popleft()
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            # Events that arrived while replaying were already sent from the backlog.
+            if event["id"] not in self.replayed:
+                return event
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind: drop what is queued and ask the client to re-fetch.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(reset_event())
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+# Interface every event broker implements.
+class EventBroker:
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    # Sends an event to every subscriber of user_id.
+    async def publish(self, user_id, event_type, data):
+        raise NotImplementedError
+
+    # Returns a Subscription for user_id that first replays the events after last_event_id.
+    async def subscribe(self, user_id, last_event_id=None):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+# Delivers events inside this process and keeps the last EVENTS_BUFFER_SIZE events per user for resuming.
+class InMemoryBroker(EventBroker):
+    def __init__(self, buffer_size=EVENTS_BUFFER_SIZE, max_users=EVENTS_MAX_USERS):
+        self.buffer_size = buffer_size
+        self.max_users = max_users
+        self._subscribers = {}        # user_id -> set of Subscription
+        self._history = OrderedDict()  # user_id -> deque of recent events
+        # Ids are unique per process start, so an id from before a restart is never mistaken for a new event.
+        self._prefix = secrets.token_hex(4)
+        self._sequence = 0
+
+    async def publish(self, user_id, event_type, data):
+        self._sequence += 1
+        self.deliver(user_id, {"id": f"{self._prefix}-{self._sequence}", "type": event_type, "data": data})
+
+    # Stores an event in the user's history and hands it to their subscribers.
+    def deliver(self, user_id, event):
+        history = self._history.get(user_id)
+        if history is None:
+            history = self._history[user_id] = deque(maxlen=self.buffer_size)
+            if len(self._history) > self.max_users:
+                self._history.popitem(last=False)
+        else:
+            self._history.move_to_end(user_id)
+        history.append(event)
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.deliver(event)
+
+    async def subscribe(self, user_id, last_event_id=None):
+        subscription = Subscription(self, user_id)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        if last_event_id:
+            missed = await self.replay(user_id, last_event_id)
+            if missed is None:
+                subscription.backlog.append(reset_event())
+            else:
+                subscription.backlog.extend(missed)
+                subscription.replayed = {event["id"] for event in missed}
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    # Returns the events after last_event_id, or None if they cannot be replayed.
+    async def replay(self, user_id, last_event_id):
+        history = list(self._history.get(user_id, ()))
+        for position, event in enumerate(history):
+            if event["id"] == last_event_id:
+                return history[position + 1:]
+        return None
+
+
+# Stores events in events_db and delivers them to every worker through a MongoDB change stream.
+# Event ids are change stream resume tokens, so a client can resume on any worker.
+class ChangeStreamBroker(InMemoryBroker):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, user_id, event_type, data):
+        await events_db.insert_one({
+            "user_id": user_id, "type": event_type, "data": data, "created_at": datetime.now(timezone.utc),
+        })
+
+    @staticmethod
+    def _event(change):
+        document = change["fullDocument"]
+        return document["user_id"], {"id": change["_id"]["_data"], "type": document["type"], "data": document["data"]}
+
+    # Follows every insert into events_db for the lifetime of the process, resuming after errors.
+    async def _watch(self):
+        resume_after = None
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with await events_db.watch(pipeline, resume_after=resume_after) as stream:
+                    async for change in stream:
+                        resume_after = change["_id"]
+                        self.deliver(*self._event(change))
+            except PyMongoError:
+                logger.exception("Event change stream failed; reconnecting")
+                await asyncio.sleep(1)
+
+    # Replays from this worker's history if possible, otherwise from the change stream.
+    async def replay(self, user_id, last_event_id):
+        missed = await super().replay(user_id, last_event_id)
+        if missed is not None:
+            return missed
+        missed = []
+        pipeline = [{"$match": {"operationType": "insert", "fullDocument.user_id": user_id}}]
+        try:
+            async with await events_db.watch(pipeline, resume_after={"_data": last_event_id}) as stream:
+                while len(missed) <= self.buffer_size:
+                    change = await stream.try_next()
+                    if change is None:
+                        return missed
+                    missed.append(self._event(change)[1])
+        except PyMongoError:
+            # Unknown or expired resume token.
+            return None
+        return None
+
+
+# Creates the broker named by EVENTS_BROKER.
+def load_broker(name=EVENTS_BROKER):
+    if name == "memory":
+        return InMemoryBroker()
+    if name == "mongo":
+        return ChangeStreamBroker()
+    module_name, class_name = name.split(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+# The broker shared by all routers.
+event_broker = load_broker()
+
+
+# Publishes an event for user_id. Never raises: the write it reports has already happened.
+async def publish(user_id, event_type, data):
+    if isinstance(data, dict):
+        data = {key: value for key, value in data.items() if key != "_id"}
+    try:
+        await event_broker.publish(user_id, event_type, data)
+    except Exception:
+        logger.exception("Failed to publish %s event for user %s", event_type, user_id)
+
+
+# Publishes the current progress document of a watchlist entry.
+async def publish_progress(user_id, watchlist_id):
+    progress = await watch_progress_db.find_one({"watchlist_id": watchlist_id}, {"_id": 0})
+    if progress is not None:
+        await publish(user_id, "progress.updated", progress)
@@ -0,0 +1,52 @@
+"""
+gunicorn.conf.py
+
+This file configures the multi-worker production server for the Tracker API application.
+
+How it works:
+- Gunicorn starts one master process that forks WEB_CONCURRENCY worker processes (default: one per CPU core).
+- Each worker runs the app built by `main.create_app()` with an asyncio event loop (uvicorn's worker class).
+- The app is imported once in the master before forking (preload_app), which makes workers start faster and share
+  memory. This is safe because importing the app opens no MongoDB connections and starts no processes: each
+  worker's lifespan connects after the fork and closes its client on shutdown (see main.py and database.py).
+- A crashed worker is replaced automatically; SIGHUP reloads workers one by one without dropping the socket.
+
+Key Concepts:
+- Start it with:
+      gunicorn -c gunicorn.conf.py
+- Each worker has its own connection pool (MONGO_MAX_POOL_SIZE), catalog cache, token cache and hash pool
+  (HASH_POOL_WORKERS), so size those per worker. With several workers, use EVENTS_BROKER=mongo so server-sent
+  events reach clients connected to any worker. JOBS_STORE defaults to "mongo" under gunicorn, so a job enqueued
+  by one worker can be read from any worker.
+
+Settings come from the environment, like the rest of the application.
+"""
+
+import multiprocessing
+import os
+
+import config  # noqa: F401  (loads .env before the settings below are read)
+
+# Jobs must be visible to every worker (GET /jobs/{id} may reach a different worker than the one that enqueued the
+# job), so the job store defaults to MongoDB here. Set before the app is imported, which reads it in jobs.py.
+os.environ.setdefault("JOBS_STORE", "mongo")
+
+# Address to listen on.
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Number of worker processes.
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Async worker that runs the ASGI app with uvicorn.
+worker_class = "uvicorn_worker.UvicornWorker"
+# The app factory. With preload_app it is called once in the master and the workers inherit the app when forked.
+wsgi_app = "main:create_app()"
+# Import the app in the master before forking (safe: nothing connects at import time).
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+# Seconds a worker may stay silent before it is restarted, and seconds it gets to finish requests on shutdown.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+# Seconds to keep idle client connections open (should exceed the load balancer's idle timeout).
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 75))
+# Restart a worker after this many requests (0 = never), with jitter so workers do not restart together.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 0))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
@@ -0,0 +1,283 @@
+"""
+indexes.py
+
+This file manages the MongoDB indexes used by the Tracker API application.
+
+How it works:
+- INDEXES lists, per collection, every index the routers rely on (unique ids, usernames and compound indexes
+  that match the filters and sorts used in routes/*.py).
+- `ensure_indexes()` creates those indexes. It is called once on application startup from main.py and is safe to
+  run repeatedly, because MongoDB ignores an index that already exists with the same definition.
+  An index whose definition changed in INDEXES (e.g. it became unique) is dropped and built again.
+  An index that cannot be built (e.g. a unique index over data that already has duplicates) is logged and skipped,
+  and the index it was replacing is restored, so an existing database never stops the application from starting
+  or loses an index it had; remove the duplicates and restart
+  (`python repository.py dedupe-watched` does this for watched records; a user's duplicate watchlist entries for
+  one show have to be merged by hand).
+- ROUTER_QUERIES lists the filters and sorts the routers send to MongoDB.
+- `check_query_plans()` runs `explain()` on every router query and raises an error if any of them would scan the
+  whole collection (COLLSCAN) instead of using an index, or would sort in memory (SORT) instead of reading the
+  index in order.
+
+Key Concepts:
+- Without indexes every `find_one({"id": ...})` reads the full collection, so requests get slower as data grows.
+- Set INDEX_CHECK_PLANS=true to run the query-plan check on every startup, or run it by hand:
+      python indexes.py            # create the indexes
+      python indexes.py --check    # create the indexes and verify every router query uses one
+
+Other modules can import these functions to create or verify indexes.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from events import EVENTS_RETENTION_SECONDS
+
+from database import (
+    users_db, shows_db, episodes_db, watchlist_db, watched_episodes_db, watch_progress_db, watch_rollups_db,
+    show_pairs_db, similar_shows_db, recommendation_users_db, events_db, stream_tickets_db,
+    jobs_db,
+)
+
+logger = logging.getLogger(__name__)
+
+# MongoDB error codes for an existing index that has the same name or keys but another definition.
+INDEX_CONFLICT_CODES = (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+
+# Whether main.py should run the query-plan check on startup.
+INDEX_CHECK_PLANS = os.getenv("INDEX_CHECK_PLANS", "false").lower() == "true"
+
+# Index definitions for each collection.
+INDEXES = [
+    (users_db, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    ]),
+    (shows_db, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("title", TEXT), ("description", TEXT)], name="title_description_text",
+                   weights={"title": 10, "description": 1}),
+        IndexModel([("genre", ASCENDING), ("release_year", ASCENDING)], name="genre_year"),
+        IndexModel([("type", ASCENDING), ("release_year", ASCENDING)], name="type_year"),
+        IndexModel([("genre", ASCENDING), ("id", ASCENDING)], name="genre_id"),
+        IndexModel([("type", ASCENDING), ("id", ASCENDING)], name="type_id"),
+    ]),
+    (episodes_db, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("show_id", ASCENDING), ("season_number", ASCENDING), ("episode_number", ASCENDING)],
+                   name="show_season_episode"),
+        IndexModel([("show_id", ASCENDING), ("id", ASCENDING)], name="show_id_keyset"),
+    ]),
+    (watchlist_db, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("rating", DESCENDING), ("id", ASCENDING)],
+                   name="user_status_rating"),
+        IndexModel([("user_id", ASCENDING), ("rating", DESCENDING), ("id", ASCENDING)], name="user_rating"),
+        IndexModel([("show_id", ASCENDING)], name="show_id"),
+        IndexModel([("user_id", ASCENDING), ("show_id", ASCENDING)], name="user_show_unique", unique=True),
+    ]),
+    (watched_episodes_db, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("watched_at", DESCENDING)], name="user_watched_at"),
+        IndexModel([("watchlist_id", ASCENDING), ("episode_id", ASCENDING)], name="watchlist_episode", unique=True),
+        IndexModel([("episode_id", ASCENDING)], name="episode_id"),
+    ]),
+    (watch_progress_db, [
+        IndexModel([("watchlist_id", ASCENDING)], name="watchlist_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("show_id", ASCENDING)], name="show_id"),
+    ]),
+    (watch_rollups_db, [
+        IndexModel([("user_id", ASCENDING), ("period", ASCENDING), ("bucket", ASCENDING)],
+                   name="user_period_bucket_unique", unique=True),
+    ]),
+    (show_pairs_db, [
+        IndexModel([("a", ASCENDING), ("b", ASCENDING)], name="a_b_unique", unique=True),
+        IndexModel([("b", ASCENDING)], name="b"),
+    ]),
+    (similar_shows_db, [
+        IndexModel([("show_id", ASCENDING)], name="show_id_unique", unique=True),
+    ]),
+    (recommendation_users_db, [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+        IndexModel([("entries.show_id", ASCENDING)], name="entries_show_id"),
+    ]),
+    (stream_tickets_db, [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]),
+    (events_db, [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=EVENTS_RETENTION_SECONDS),
+    ]),
+    (jobs_db, [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("heartbeat", ASCENDING)], name="status_heartbeat"),
+    ]),
+]
+
+# Every filter (and sort) the routers send to MongoDB, with sample values.
+# Queries that intentionally read a whole collection (e.g. listing every show) are not listed here.
+ROUTER_QUERIES = [
+    # users.login / users.authenticate
+    (users_db, {"username": "sample"}, None),
+    # shows.get_show / update_show / delete_show, episodes.add_episodes / get_list
+    (shows_db, {"id": "sample"}, None),
+    # shows.search
+    (shows_db, {"$text": {"$search": "sample"}}, None),
+    (shows_db, {"genre": "sample", "release_year": {"$gte": 2000}}, None),
+    (shows_db, {"type": "sample"}, None),
+    # shows.search without q (keyset pages of the filtered catalog)
+    (shows_db, {"genre": "sample", "id": {"$gt": "sample"}}, [("id", ASCENDING)]),
+    (shows_db, {"type": "sample", "id": {"$gt": "sample"}}, [("id", ASCENDING)]),
+    # shows.list_shows (keyset pages)
+    (shows_db, {"id": {"$gt": "sample"}}, [("id", ASCENDING)]),
+    # episodes.get_episode (keyset pages)
+    (episodes_db, {"id": {"$gt": "sample"}}, [("id", ASCENDING)]),
+    # episodes.get_list (keyset pages)
+    (episodes_db, {"show_id": "sample"}, [("id", ASCENDING)]),
+    (episodes_db, {"show_id": "sample", "id": {"$gt": "sample"}}, [("id", ASCENDING)]),
+    # episodes.update_episode / delete_episode
+    (episodes_db, {"id": "sample"}, None),
+    (watched_episodes_db, {"episode_id": "sample"}, None),
+    # watchlist.add_to_watchlist / update_watchlist / remove_from_watchlist, watched ownership checks
+    (watchlist_db, {"id": "sample", "user_id": "sample"}, None),
+    # watchlist.list_watchlist
+    (watchlist_db, {"user_id": "sample"}, None),
+    # watched.list_watched_episodes
+    (watched_episodes_db, {"user_id": "sample"}, None),
+    # watched.remove_watched_episode
+    (watched_episodes_db, {"id": "sample"}, None),
+    # watched.add_watched_batch (episode lookup and idempotent upserts)
+    (episodes_db, {"show_id": "sample", "season_number": 1, "episode_number": {"$gte": 1, "$lte": 24}}, None),
+    (episodes_db, {"show_id": "sample", "id": {"$in": ["sample"]}}, None),
+    (watched_episodes_db, {"watchlist_id": "sample", "episode_id": "sample"}, None),
+    # watchlist.get_dashboard
+    (watchlist_db, {"user_id": "sample", "status": "watching"}, [("rating", DESCENDING), ("id", ASCENDING)]),
+    (watchlist_db, {"user_id": "sample", "status": "watching"}, [("rating", ASCENDING), ("id", DESCENDING)]),
+    (watchlist_db, {"user_id": "sample"}, [("rating", DESCENDING), ("id", ASCENDING)]),
+    (watchlist_db, {"user_id": "sample"}, [("rating", ASCENDING), ("id", DESCENDING)]),
+    # watchlist.get_progress and the progress.py updates
+    (watch_progress_db, {"user_id": "sample"}, None),
+    (watch_progress_db, {"watchlist_id": "sample"}, None),
+    (watch_progress_db, {"show_id": "sample"}, None),
+    (watched_episodes_db, {"watchlist_id": {"$in": ["sample"]}}, None),
+    # watched.get_watch_stats and the rollups.py updates / rebuild
+    (watch_rollups_db, {"user_id": "sample", "period": "year", "bucket": "2026"}, None),
+    (watch_rollups_db, {"user_id": "sample", "period": "month", "bucket": {"$in": ["2026-01"]}}, None),
+    (watched_episodes_db, {"user_id": {"$in": ["sample"]}}, None),
+    # shows.get_similar_shows and the recommendations.py incremental updates
+    (similar_shows_db, {"show_id": "sample"}, None),
+    (similar_shows_db, {"show_id": {"$in": ["sample"]}}, None),
+    (show_pairs_db, {"a": "sample", "w": {"$gt": 0}}, None),
+    (show_pairs_db, {"a": {"$in": ["sample"]}, "b": {"$in": ["sample"]}, "w": {"$lte": 0}}, None),
+    (recommendation_users_db, {"user_id": "sample", "entries.id": {"$ne": "sample"}}, None),
+    (recommendation_users_db, {"entries.show_id": "sample"}, None),
+    # cascade.cascade_delete_show and cascade.sweep
+    (watchlist_db, {"show_id": "sample"}, None),
+    (watchlist_db, {"id": {"$in": ["sample"]}}, None),
+    (episodes_db, {"show_id": "sample"}, None),
+    (show_pairs_db, {"a": "sample"}, None),
+    (show_pairs_db, {"b": "sample"}, None),
+    (show_pairs_db, {"$or": [{"a": "sample"}, {"b": "sample"}]}, None),
+    (watch_progress_db, {"watchlist_id": {"$in": ["sample"]}}, None),
+    # jobs.MongoJobStore
+    (jobs_db, {"id": "sample", "status": "queued"}, None),
+    (jobs_db, {"status": "running", "heartbeat": {"$lt": 0}}, None),
+    (jobs_db, {"status": "queued", "$nor": [{"retry_at": {"$gt": 0}}]}, None),
+]
+
+
+# Returns an IndexModel that recreates an index as described by list_indexes().
+def index_model_from_spec(spec):
+    options = {key: value for key, value in spec.items() if key not in ("key", "v", "ns")}
+    return IndexModel(list(spec["key"].items()), **options)
+
+
+# Creates one index. An existing index with the same name or keys but an older definition is dropped first.
+# MongoDB does not allow two indexes on the same keys, so the new definition cannot be built next to the old one.
+# If it fails to build (e.g. a new unique index hits existing duplicates) the old index is restored.
+async def create_index(collection, model):
+    try:
+        await collection.create_indexes([model])
+        return
+    except OperationFailure as exc:
+        if exc.code not in INDEX_CONFLICT_CODES:
+            raise
+    name, keys = model.document["name"], list(model.document["key"].items())
+    logger.warning("Index %s on %s has a new definition; rebuilding it", name, collection.name)
+    previous = [
+        index async for index in await collection.list_indexes()
+        if index["name"] != "_id_" and (index["name"] == name or list(index["key"].items()) == keys)
+    ]
+    for index in previous:
+        await collection.drop_index(index["name"])
+    try:
+        await collection.create_indexes([model])
+    except OperationFailure:
+        logger.warning("Rebuilding index %s on %s failed; restoring the previous definition", name, collection.name)
+        await collection.create_indexes([index_model_from_spec(index) for index in previous])
+        raise
+
+
+# Creates every index in INDEXES. Existing indexes with the same definition are left untouched.
+# Returns the names of the indexes that could not be built (they are logged and skipped).
+async def ensure_indexes():
+    failed = []
+    for collection, models in INDEXES:
+        for model in models:
+            name = model.document["name"]
+            try:
+                await create_index(collection, model)
+            except OperationFailure as exc:
+                logger.error("Could not create index %s on %s, skipping it: %s", name, collection.name, exc)
+                failed.append(f"{collection.name}.{name}")
+    return failed
+
+
+# Returns the stage names used anywhere in a query plan (e.g. IXSCAN, FETCH, COLLSCAN).
+def plan_stages(plan):
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+# Runs explain() on every router query and raises RuntimeError if any of them uses a COLLSCAN, or an in-memory
+# SORT for a query that has a sort.
+async def check_query_plans(queries=None):
+    failures = []
+    for collection, query, sort in queries or ROUTER_QUERIES:
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explained = await cursor.explain()
+        winning_plan = explained.get("queryPlanner", {}).get("winningPlan", {})
+        stages = plan_stages(winning_plan)
+        if "COLLSCAN" in stages:
+            failures.append(f"{collection.name}: {query} sort={sort} (COLLSCAN)")
+        elif sort and "SORT" in stages:
+            failures.append(f"{collection.name}: {query} sort={sort} (in-memory SORT)")
+    if failures:
+        raise RuntimeError("Queries without a usable index:\n  " + "\n  ".join(failures))
+
+
+async def _main(check):
+    failed = await ensure_indexes()
+    print(f"Indexes created; could not build: {', '.join(failed)}" if failed else "Indexes created")
+    if check:
+        await check_query_plans()
+        print(f"All {len(ROUTER_QUERIES)} router queries use an index")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main("--check" in sys.argv[1:]))
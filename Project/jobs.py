@@ -0,0 +1,284 @@
+"""
+jobs.py
+
+This file provides a small background job queue for the Tracker API application.
+
+How it works:
+- Code registers a handler for a job type with `@register("type")`. A handler is an async function that receives
+  the job's params and a `JobContext` it uses to report progress.
+- `job_queue.enqueue(type, params)` stores a new job (status "queued") and returns it right away. The request that
+  enqueued it does not wait for it.
+- JOBS_WORKERS worker tasks, started by main.py's lifespan, run queued jobs one at a time each. A job's status
+  moves through "queued" -> "running" -> "done", and its `progress` counters are saved while it runs.
+- While a job runs, a timer saves its heartbeat every JOBS_LEASE_SECONDS / 3 seconds, whether or not the handler
+  reports progress.
+- A job that raises is retried after JOBS_RETRY_DELAY seconds (doubling each time) up to JOBS_MAX_ATTEMPTS times,
+  then marked "failed" with the error message. Handlers must therefore be safe to run again. The job's `retry_at`
+  holds the time of the next attempt.
+- Every JOBS_POLL_SECONDS each process also asks the store for pending jobs and queues the ones it is not already
+  waiting for, so jobs enqueued by another process, retries due after a restart and abandoned jobs get run.
+- Jobs are kept in a pluggable store:
+    - `MemoryJobStore` (the default) keeps them in this process; they are lost on restart. Under gunicorn the
+      default is `MongoJobStore` (see gunicorn.conf.py), because other workers could not see the jobs.
+    - `MongoJobStore` (JOBS_STORE=mongo) keeps them in jobs_db. On startup and on every poll a worker process
+      picks up queued jobs and jobs whose runner stopped sending heartbeats for JOBS_LEASE_SECONDS (e.g. after a
+      crash). A job is claimed with one atomic update, so with several processes each job still runs once at a time.
+
+Key Concepts:
+- `GET /jobs/{job_id}` (routes/jobs.py) returns a job's status and progress.
+- Jobs run inside the web process, so they should do bounded work per step (e.g. batched deletes) to leave
+  room for requests.
+
+Other modules can import `register` and `job_queue` to run their own work in the background.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from pymongo import ReturnDocument
+
+from database import jobs_db
+
+# "memory" (default) or "mongo" (persistent, shared by all workers; the default under gunicorn).
+JOBS_STORE = os.getenv("JOBS_STORE", "memory")
+# Jobs run at the same time in each process.
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", 1))
+# Attempts before a job is marked failed, and seconds before the first retry.
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", 5))
+JOBS_RETRY_DELAY = float(os.getenv("JOBS_RETRY_DELAY", 2))
+# A running job whose heartbeat is older than this many seconds is considered abandoned (mongo store).
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", 60))
+# Seconds between heartbeats of a running job.
+JOBS_HEARTBEAT_SECONDS = JOBS_LEASE_SECONDS / 3
+# Seconds between checks of the store for pending jobs.
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", 30))
+# Finished jobs remembered by the in-memory store.
+JOBS_HISTORY = int(os.getenv("JOBS_HISTORY", 1000))
+
+logger = logging.getLogger(__name__)
+
+# job type -> async handler(params, context)
+_handlers = {}
+
+
+# Decorator that registers the handler for a job type.
+def register(job_type):
+    def decorator(handler):
+        _handlers[job_type] = handler
+        return handler
+    return decorator
+
+
+# Interface every job store implements.
+class JobStore:
+    async def insert(self, job):
+        raise NotImplementedError
+
+    async def get(self, job_id):
+        raise NotImplementedError
+
+    async def update(self, job_id, fields):
+        raise NotImplementedError
+
+    # Atomically moves a queued job to "running" and returns it, or returns None if it is not queued.
+    async def claim(self, job_id):
+        raise NotImplementedError
+
+    # Returns the ids of jobs that should be (re)started now. Called on start and every JOBS_POLL_SECONDS.
+    async def pending(self):
+        return []
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self, history=JOBS_HISTORY):
+        self.history = history
+        self._jobs = OrderedDict()
+
+    async def insert(self, job):
+        self._jobs[job["id"]] = job
+        finished = [job_id for job_id, stored in self._jobs.items() if stored["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    async def get(self, job_id):
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def update(self, job_id, fields):
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields)
+
+    async def claim(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] != "queued":
+            return None
+        job.update(status="running", heartbeat=time.time())
+        return dict(job)
+
+    async def pending(self):
+        now = time.time()
+        return [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] == "queued" and (job.get("retry_at") or 0) <= now
+        ]
+
+
+class MongoJobStore(JobStore):
+    async def insert(self, job):
+        await jobs_db.insert_one(dict(job))
+
+    async def get(self, job_id):
+        return await jobs_db.find_one({"id": job_id}, {"_id": 0})
+
+    async def update(self, job_id, fields):
+        await jobs_db.update_one({"id": job_id}, {"$set": fields})
+
+    async def claim(self, job_id):
+        return await jobs_db.find_one_and_update(
+            {"id": job_id, "status": "queued"},
+            {"$set": {"status": "running", "heartbeat": time.time()}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def pending(self):
+        now = time.time()
+        # Running jobs without a recent heartbeat belong to a process that is gone: queue them again.
+        await jobs_db.update_many(
+            {"status": "running", "heartbeat": {"$lt": now - JOBS_LEASE_SECONDS}},
+            {"$set": {"status": "queued"}},
+        )
+        # Jobs waiting for a retry are left to the timer of the process that scheduled it until they are due.
+        due = {"status": "queued", "$nor": [{"retry_at": {"$gt": now}}]}
+        return [job["id"] async for job in jobs_db.find(due, {"_id": 0, "id": 1})]
+
+
+# Handed to a handler so it can report progress, e.g. `await context.add("episodes", 500)`.
+class JobContext:
+    def __init__(self, store, job):
+        self.store = store
+        self.job_id = job["id"]
+        self.progress = dict(job.get("progress") or {})
+
+    # Adds count to a progress counter and saves it (with a heartbeat).
+    async def add(self, key, count):
+        self.progress[key] = self.progress.get(key, 0) + count
+        await self.store.update(self.job_id, {"progress": self.progress, "heartbeat": time.time()})
+
+
+# Runs registered handlers for queued jobs on background tasks.
+class JobQueue:
+    def __init__(self, store, workers=JOBS_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._queue = None
+        self._queued = set()  # ids waiting in _queue, so a poll does not queue them twice
+        self._tasks = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._queued = set()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        await self.poll()
+        self._tasks.append(asyncio.create_task(self._poll_forever()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # Stores a new job and queues it. Returns the job document.
+    async def enqueue(self, job_type, params):
+        if job_type not in _handlers:
+            raise ValueError(f"No handler registered for job type {job_type!r}")
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "type": job_type,
+            "params": params,
+            "status": "queued",
+            "progress": {},
+            "attempts": 0,
+            "error": None,
+            "created_at": now,
+            "finished_at": None,
+        }
+        await self.store.insert(job)
+        if self._queue is not None:
+            self._put(job["id"])
+        return {key: value for key, value in job.items() if key != "_id"}
+
+    async def get(self, job_id):
+        return await self.store.get(job_id)
+
+    def _put(self, job_id):
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    # Queues the store's pending jobs (queued, due for a retry, or abandoned by another process).
+    async def poll(self):
+        for job_id in await self.store.pending():
+            self._put(job_id)
+
+    async def _poll_forever(self):
+        while True:
+            await asyncio.sleep(JOBS_POLL_SECONDS)
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Could not poll for pending jobs")
+
+    # Saves the job's heartbeat until cancelled, so its lease does not run out while the handler works.
+    async def _heartbeat(self, job_id):
+        while True:
+            await asyncio.sleep(JOBS_HEARTBEAT_SECONDS)
+            try:
+                await self.store.update(job_id, {"heartbeat": time.time()})
+            except Exception:
+                logger.exception("Could not save the heartbeat of job %s", job_id)
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("Job %s could not be run", job_id)
+
+    async def _run(self, job_id):
+        job = await self.store.claim(job_id)
+        if job is None:
+            return  # Already taken by another worker or process.
+        attempts = job["attempts"] + 1
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            await _handlers[job["type"]](job["params"], JobContext(self.store, job))
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed on attempt %d", job_id, job["type"], attempts)
+            if attempts >= JOBS_MAX_ATTEMPTS:
+                await self.store.update(job_id, {
+                    "status": "failed", "attempts": attempts, "error": str(exc), "finished_at": time.time(),
+                })
+                return
+            delay = JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+            await self.store.update(job_id, {
+                "status": "queued", "attempts": attempts, "error": str(exc), "retry_at": time.time() + delay,
+            })
+            asyncio.get_running_loop().call_later(delay, self._put, job_id)
+            return
+        finally:
+            heartbeat.cancel()
+        await self.store.update(job_id, {
+            "status": "done", "attempts": attempts, "error": None, "finished_at": time.time(),
+        })
+
+
+# The queue shared by the whole application.
+job_queue = JobQueue(MongoJobStore() if JOBS_STORE == "mongo" else MemoryJobStore())
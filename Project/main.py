@@ -4,9 +4,17 @@ main.py
 This file is the entry point for the Tracker API application. It uses FastAPI, a modern web framework for building APIs with Python.
 
 How it works:
-- Imports FastAPI and creates an app instance.
+- Imports FastAPI and creates an app instance with `create_app()` (an app factory). `app` is the instance used by
+  `uvicorn main:app`; multi-worker servers (gunicorn.conf.py) call `create_app()` in every worker.
+- The lifespan opens the MongoDB client when a worker starts and closes it when the worker shuts down, so no
+  connection is ever shared between forked worker processes (see database.py).
 - Imports routers from different modules, each handling a specific part of the application (users, shows, episodes, watchlist, watched).
 - Includes these routers in the main FastAPI app, making all their endpoints available in the API.
+- Serializes every response with orjson (ORJSONResponse is the default response class).
+- Starts the event broker that streams per-user change events (see events.py and routes/events.py).
+- Starts the background job workers (see jobs.py), e.g. for the cascading show deletes in cascade.py.
+- Records per-route latency, MongoDB command and hashing metrics and serves them on /metrics, see metrics.py.
+- Creates the MongoDB indexes on startup (and optionally verifies every router query uses one), see indexes.py.
 - Defines a root endpoint ("/") that returns a simple welcome message when accessed.
 - When you run this file, FastAPI starts a web server that listens for HTTP requests and routes them to the correct function based on the URL.
 
@@ -17,36 +25,86 @@ Key Concepts:
 Other modules can add more endpoints or features by creating new routers and including them in this file.
 """
 
+from contextlib import asynccontextmanager
+
+import config  # noqa: F401  (loads .env before any settings are read)
+
 # Importing FastAPI, a modern web framework for building APIs with Python
 from fastapi import FastAPI
 
+import metrics
+import database
+from auth import shutdown_hash_pool
+from events import event_broker
+from jobs import job_queue
+from indexes import INDEX_CHECK_PLANS, check_query_plans, ensure_indexes
+from responses import TimedORJSONResponse
+
 # Importing routers (collections of API endpoints) from different modules.
 # Each router handles a specific part of the application (users, shows, etc.)
-from routes import users, shows, episodes, watchlist, watched
+from routes import users, shows, episodes, watchlist, watched, events, jobs, admin
 
-# Creating an instance of the FastAPI application.
-# This 'app' object will be used to define routes and start the server.
-app = FastAPI()
 
-# Including the routers into the main FastAPI app.
-# This means all the endpoints defined in these routers will be available in the API.
-# For example, if users.router defines a '/users' endpoint, it will be accessible.
-app.include_router(users.router)      # Handles user-related endpoints (e.g., registration, login)
-app.include_router(shows.router)      # Handles TV show-related endpoints (e.g., list shows)
-app.include_router(episodes.router)   # Handles episode-related endpoints (e.g., list episodes)
-app.include_router(watchlist.router)  # Handles user's watchlist endpoints (e.g., add/remove shows)
-app.include_router(watched.router)    # Handles endpoints for marking shows/episodes as watched
+# Startup and shutdown logic for the application.
+# Everything before 'yield' runs once when the server (or a worker process) starts, before any request is handled.
+# Everything after 'yield' runs once when it shuts down.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.connect()
+    try:
+        await ensure_indexes()
+        if INDEX_CHECK_PLANS:
+            await check_query_plans()
+        await event_broker.start()
+        await job_queue.start()
+        yield
+        await job_queue.stop()
+        await event_broker.stop()
+    finally:
+        shutdown_hash_pool()
+        await database.close()
+
 
 # Defining the root endpoint ("/").
 # When someone visits the base URL of the API (e.g., http://localhost:8000/), this function runs.
-@app.get("/")
-def root():
+async def root():
     # Returns a simple JSON response with a message.
     # This acts as a home page or a health check for the API.
     return {"message": "Home Page Hai Yeh"}
 
+
+# Creates a new instance of the FastAPI application with every router included.
+# Nothing here connects to MongoDB or starts processes; that happens in the lifespan.
+def create_app():
+    # Responses are serialized with orjson, which is much faster than the standard json module.
+    app = FastAPI(lifespan=lifespan, default_response_class=TimedORJSONResponse)
+
+    # Timing every request (per route template) and exposing all metrics on /metrics.
+    if metrics.METRICS_ENABLED:
+        app.add_middleware(metrics.MetricsMiddleware)
+        app.include_router(metrics.router)
+
+    # Including the routers into the main FastAPI app.
+    # This means all the endpoints defined in these routers will be available in the API.
+    # For example, if users.router defines a '/users' endpoint, it will be accessible.
+    app.include_router(users.router)      # Handles user-related endpoints (e.g., registration, login)
+    app.include_router(shows.router)      # Handles TV show-related endpoints (e.g., list shows)
+    app.include_router(episodes.router)   # Handles episode-related endpoints (e.g., list episodes)
+    app.include_router(watchlist.router)  # Handles user's watchlist endpoints (e.g., add/remove shows)
+    app.include_router(watched.router)    # Handles endpoints for marking shows/episodes as watched
+    app.include_router(events.router)     # Handles the per-user server-sent events stream
+    app.include_router(jobs.router)       # Handles background job status (e.g. cascading show deletes)
+    app.include_router(admin.router)      # Handles admin-only endpoints (e.g. streaming exports)
+
+    app.add_api_route("/", root, methods=["GET"])
+    return app
+
+
+# The application instance used by `uvicorn main:app` (single process).
+app = create_app()
+
 # How this file works:
-# - When you run this file, FastAPI starts a web server.
+# - When you run this file with uvicorn (or gunicorn, see gunicorn.conf.py), FastAPI starts a web server.
 # - The server listens for HTTP requests and routes them to the correct function based on the URL.
 # - The routers organize the code, so each feature (users, shows, etc.) is in its own file.
 # - The root endpoint ("/") just returns a welcome message.
@@ -0,0 +1,257 @@
+"""
+metrics.py
+
+This file collects performance metrics for the Tracker API application and exposes them in Prometheus format.
+
+How it works:
+- `MetricsMiddleware` times every HTTP request and records it in a latency histogram labelled with the method, the
+  route template (e.g. "/shows/{show_id}", never the raw URL) and the status code.
+- `mongo_listener` is a PyMongo CommandListener registered on the client in database.py. It records the duration of
+  every MongoDB command per collection and command name, plus the number of documents each command returned.
+- auth.py records how long password hashing/verification and JWT verification take, and responses.py records how
+  long JSON rendering takes. Together these show where a slow request spent its time.
+- `GET /metrics` returns everything in the Prometheus text format, ready to be scraped.
+- Slow-request log: when SLOW_REQUEST_MS is set, every request slower than that is logged (logger "tracker.slow")
+  together with the MongoDB commands it ran, their durations and document counts. The commands are collected
+  per request through a context variable, so concurrent requests never mix.
+
+Key Concepts:
+- Histograms and counters are plain in-memory objects updated from the event loop thread; recording is a few
+  dictionary operations, cheap enough to run on every request and every command.
+- Metrics are per process. With several workers, each one reports its own numbers (Prometheus sums them).
+- METRICS_ENABLED=false turns off the middleware, the command listener and the endpoint.
+
+Other modules can import the metric objects below (or `Histogram`/`Counter`) to record their own measurements.
+"""
+
+import bisect
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import APIRouter, Response
+from pymongo import monitoring
+
+# Turns the whole metrics subsystem on or off.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Requests slower than this many milliseconds are logged with their MongoDB commands. 0 disables the log.
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 0))
+# At most this many MongoDB commands are kept per request for the slow-request log.
+SLOW_REQUEST_MAX_COMMANDS = 50
+
+# Latency buckets in seconds, from 0.5 ms to 10 s.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_log = logging.getLogger("tracker.slow")
+
+# All metrics, in the order they are rendered.
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# A Prometheus histogram with a fixed set of label names.
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+# A Prometheus counter with a fixed set of label names.
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount, *labels):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency.", ("collection", "command"))
+MONGO_DOCUMENTS_RETURNED = Counter(
+    "mongo_documents_returned_total", "Documents returned by MongoDB commands.", ("collection", "command"))
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total", "MongoDB commands that failed.", ("collection", "command"))
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds", "Password hashing and verification time, including the pool queue.",
+    ("operation",))
+TOKEN_VERIFY_SECONDS = Histogram(
+    "token_verification_duration_seconds", "JWT verification time by result (cached, decoded, rejected).",
+    ("result",))
+RESPONSE_RENDER_SECONDS = Histogram(
+    "response_render_duration_seconds", "Time spent serializing JSON response bodies.")
+
+
+# Renders every metric in the Prometheus text exposition format.
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ___________________________________MongoDB Commands________________________
+
+# The MongoDB commands run by the current request, or None when the slow-request log is off.
+_request_commands = ContextVar("request_commands", default=None)
+
+
+# Returns the number of documents in a command reply.
+def _documents_returned(reply):
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if "value" in reply:
+        return 0 if reply["value"] is None else 1
+    return 0
+
+
+# Records duration and documents returned for every MongoDB command.
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        # (connection, request_id) -> collection name, for commands that have started but not finished.
+        self._pending = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else event.database_name
+        self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "unknown")
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_SECONDS.observe(seconds, collection, event.command_name)
+        return collection, seconds
+
+    def succeeded(self, event):
+        collection, seconds = self._finish(event)
+        documents = _documents_returned(event.reply)
+        if documents:
+            MONGO_DOCUMENTS_RETURNED.inc(documents, collection, event.command_name)
+        commands = _request_commands.get()
+        if commands is not None and len(commands) < SLOW_REQUEST_MAX_COMMANDS:
+            commands.append({"collection": collection, "command": event.command_name,
+                             "ms": round(seconds * 1000, 2), "documents": documents})
+
+    def failed(self, event):
+        collection, seconds = self._finish(event)
+        MONGO_COMMAND_FAILURES.inc(1, collection, event.command_name)
+        commands = _request_commands.get()
+        if commands is not None and len(commands) < SLOW_REQUEST_MAX_COMMANDS:
+            commands.append({"collection": collection, "command": event.command_name,
+                             "ms": round(seconds * 1000, 2), "failed": True})
+
+
+# The listener database.py registers on the MongoDB client.
+mongo_listener = MongoCommandListener()
+
+
+# ___________________________________HTTP Requests________________________
+
+# ASGI middleware that times every HTTP request (and logs slow ones with their MongoDB commands).
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_and_capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        commands = [] if SLOW_REQUEST_MS else None
+        token = _request_commands.set(commands)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_and_capture)
+        finally:
+            seconds = time.perf_counter() - start
+            _request_commands.reset(token)
+            # The router stores the matched route in the scope; unmatched paths share one label.
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(seconds, scope["method"], path, status)
+            if commands is not None and seconds * 1000 >= SLOW_REQUEST_MS:
+                slow_log.warning(
+                    "slow request %s %s (%s) -> %s took %.1f ms, mongo: %s",
+                    scope["method"], scope["path"], path, status, seconds * 1000, commands,
+                )
+
+
+# Times a block of code into a histogram: `with timed(PASSWORD_HASH_SECONDS, "hash"): ...`
+@contextmanager
+def timed(histogram, *labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, *labels)
+
+
+# ___________________________________Endpoint________________________
+
+# Creating a router for the metrics endpoint.
+router = APIRouter()
+
+
+# Endpoint to read all metrics in the Prometheus text format.
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -6,6 +6,9 @@ It uses Pydantic, a library that helps validate and serialize data for FastAPI.
 
 How it works:
 - Each class represents a type of data used in the application (User, Show, Episode, Watchlist, WatchedEpisode).
+- Request-only models (like WatchedBatch) describe the body of endpoints that do not map to a single stored document.
+- Watch timestamps are Unix seconds between 1970 and the year 9999, so a millisecond timestamp is rejected with 422
+  instead of failing later (e.g. in the rollups, see rollups.py) after part of the write was applied.
 - These models define the structure and data types for requests and responses in the API.
 - FastAPI uses these models to automatically validate incoming data and generate documentation.
 
@@ -17,7 +20,15 @@ Key Concepts:
 Other modules can import these models to use as request bodies, response models, or for data validation.
 """
 
-from pydantic import BaseModel
+from typing import Annotated, List, Optional
+
+from pydantic import BaseModel, Field
+
+# Last second a datetime can represent (9999-12-31T23:59:59Z).
+MAX_TIMESTAMP = 253402300799
+
+# Unix time in seconds.
+Timestamp = Annotated[int, Field(ge=0, le=MAX_TIMESTAMP)]
 
 # Pydantic Models
 
@@ -55,4 +66,12 @@ class WatchedEpisode(BaseModel):
     id: str                  # Unique identifier for the watched episode entry
     watchlist_id: str        # ID of the related watchlist entry
     episode_id: str          # ID of the episode that was watched
-    watched_at: int          # Timestamp (e.g., Unix time) when the episode was
+    watched_at: Timestamp    # Timestamp (Unix time in seconds) when the episode was
+
+class WatchedBatch(BaseModel):
+    watchlist_id: str                          # ID of the related watchlist entry
+    watched_at: Timestamp                      # Timestamp (Unix time in seconds) stored on every new watched record
+    season_number: Optional[int] = None        # Mark this season (optionally only a range of it) as watched
+    from_episode: Optional[int] = None         # First episode number of the range (inclusive)
+    to_episode: Optional[int] = None           # Last episode number of the range (inclusive)
+    episode_ids: Optional[List[str]] = None    # Or: mark exactly these episodes as watched
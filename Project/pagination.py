@@ -0,0 +1,94 @@
+"""
+pagination.py
+
+This file provides keyset pagination and NDJSON streaming for the catalog list endpoints of the Tracker API application.
+
+How it works:
+- `fetch_page()` returns one page of documents ordered by their `id`, starting right after the `after` cursor.
+  It reads one extra document to know whether another page exists, and returns the id to continue from.
+- `stream_ndjson()` returns a StreamingResponse that sends documents one per line (NDJSON) straight from the
+  MongoDB cursor, so only one cursor batch is held in memory at a time.
+- `page_from_list()` does the same for a list that is already in memory (e.g. the cached first page of a show's episodes).
+- `set_next_cursor()` puts the cursor for the next page in the X-Next-Cursor response header.
+
+Key Concepts:
+- Keyset pagination (`id > after`) uses the unique `id` index, so every page costs the same no matter how deep
+  into the collection it is, unlike skip/offset pagination.
+- Clients request the next page with `?after=<X-Next-Cursor>&limit=<n>` until the header is missing.
+- Response bodies keep their existing shape; the cursor travels in a header.
+
+Other modules can import these helpers to paginate or stream any collection that has a unique `id` field.
+"""
+
+import bisect
+import os
+
+import orjson
+from fastapi import Query
+from fastapi.responses import StreamingResponse
+
+# Page size used when the client does not pass ?limit=.
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 100))
+# Largest page a client may ask for.
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 1000))
+# Number of documents MongoDB sends per cursor batch while streaming.
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 500))
+
+# Header that carries the cursor for the next page.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Reusable query parameter definitions for list endpoints.
+AfterQuery = Query(None, description="Return documents whose id comes after this cursor")
+LimitQuery = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of documents to return")
+StreamQuery = Query(False, description="Stream every matching document as NDJSON instead of one page")
+
+
+# Adds the keyset condition for the `after` cursor to a query.
+def keyset_query(query, after):
+    if after is None:
+        return query
+    return {**query, "id": {"$gt": after}}
+
+
+# Returns (documents, next_cursor) for one page of a collection ordered by id.
+# next_cursor is None when there are no more documents.
+async def fetch_page(collection, query, after=None, limit=None, projection=None):
+    limit = limit or DEFAULT_PAGE_SIZE
+    cursor = collection.find(keyset_query(query, after), projection or {"_id": 0})
+    docs = await cursor.sort("id", 1).limit(limit + 1).to_list(None)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, docs[-1]["id"]
+    return docs, None
+
+
+# Returns (documents, next_cursor) for one page of an id-ordered list that is already in memory.
+def page_from_list(docs, after=None, limit=None):
+    limit = limit or DEFAULT_PAGE_SIZE
+    start = 0
+    if after is not None:
+        start = bisect.bisect_right([doc["id"] for doc in docs], after)
+    page = docs[start:start + limit]
+    if start + limit < len(docs):
+        return page, page[-1]["id"]
+    return page, None
+
+
+# Sets the X-Next-Cursor header when there is another page.
+def set_next_cursor(response, next_cursor):
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
+# Streams every matching document (ordered by id) as one JSON object per line.
+# If limit is given, at most that many documents are sent.
+def stream_ndjson(collection, query, after=None, limit=None, projection=None):
+    async def generate():
+        cursor = collection.find(keyset_query(query, after), projection or {"_id": 0})
+        cursor = cursor.sort("id", 1).batch_size(STREAM_BATCH_SIZE)
+        if limit:
+            cursor = cursor.limit(limit)
+        async for doc in cursor:
+            yield orjson.dumps(doc, default=str) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
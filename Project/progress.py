@@ -0,0 +1,196 @@
+"""
+progress.py
+
+This file maintains a progress document for every watchlist entry in the Tracker API application.
+
+How it works:
+- Each document in watch_progress_db answers "how far along is this user in this show":
+    watchlist_id, user_id, show_id, episodes_watched, total_episodes, minutes_watched, last_watched_at
+- The write routes keep the documents up to date with single atomic updates ($inc / $max):
+    - watchlist.py creates the document when a show is added and deletes it when the show is removed.
+    - watched.py adds (or subtracts) the episode count and minutes when episodes are marked (or unmarked) as watched.
+    - episodes.py adjusts total_episodes of every entry for a show when episodes are added or deleted.
+      When an episode's duration is edited, minutes_watched changes for every entry that watched it; when a
+      watched episode is deleted, its watched records are removed and the entries' watched counters go down.
+- `rebuild()` recomputes documents from watchlist_db, watched_episodes_db and episodes_db. It backfills entries
+  that existed before progress tracking and repairs any drift.
+
+Key Concepts:
+- Reading progress is one indexed query on watch_progress_db instead of scanning every watched record and episode.
+- If a progress document is missing when an episode is marked as watched, it is created on the spot.
+- Run the rebuild by hand with:
+      python progress.py rebuild                 # every watchlist entry
+      python progress.py rebuild --user USER_ID  # one user's entries
+
+Other modules can import these functions to keep progress documents in sync with their writes.
+"""
+
+import argparse
+import asyncio
+
+from pymongo import ReplaceOne
+
+from database import episodes_db, watchlist_db, watched_episodes_db, watch_progress_db
+
+# Watchlist entries processed per round trip during a rebuild.
+REBUILD_BATCH_SIZE = 500
+
+
+# Creates an empty progress document for a new watchlist entry.
+async def init_progress(watchlist):
+    total = await episodes_db.count_documents({"show_id": watchlist["show_id"]})
+    await watch_progress_db.update_one(
+        {"watchlist_id": watchlist["id"]},
+        {"$setOnInsert": {
+            "watchlist_id": watchlist["id"],
+            "user_id": watchlist["user_id"],
+            "show_id": watchlist["show_id"],
+            "episodes_watched": 0,
+            "total_episodes": total,
+            "minutes_watched": 0,
+            "last_watched_at": None,
+        }},
+        upsert=True,
+    )
+
+
+# Deletes the progress document of a removed watchlist entry.
+async def drop_progress(watchlist_id):
+    await watch_progress_db.delete_one({"watchlist_id": watchlist_id})
+
+
+# Adds newly watched episodes (documents with duration_minutes) to a watchlist entry's progress.
+async def record_watched(watchlist, episodes, watched_at):
+    if not episodes:
+        return
+    update = {
+        "$inc": {
+            "episodes_watched": len(episodes),
+            "minutes_watched": sum(episode.get("duration_minutes", 0) for episode in episodes),
+        },
+        "$max": {"last_watched_at": watched_at},
+    }
+    result = await watch_progress_db.update_one({"watchlist_id": watchlist["id"]}, update)
+    if result.matched_count == 0:
+        # Entry created before progress tracking existed: create its document, then apply the update.
+        await init_progress(watchlist)
+        await watch_progress_db.update_one({"watchlist_id": watchlist["id"]}, update)
+
+
+# Subtracts an unwatched episode (document with duration_minutes) from a watchlist entry's progress.
+# last_watched_at is left as is; `rebuild()` recomputes it.
+async def record_unwatched(watchlist_id, episode):
+    await watch_progress_db.update_one(
+        {"watchlist_id": watchlist_id},
+        {"$inc": {"episodes_watched": -1, "minutes_watched": -(episode or {}).get("duration_minutes", 0)}},
+    )
+
+
+# Changes total_episodes for every watchlist entry of a show (delta can be negative).
+async def adjust_total(show_id, delta):
+    if delta:
+        await watch_progress_db.update_many({"show_id": show_id}, {"$inc": {"total_episodes": delta}})
+
+
+# Yields, in batches, the watchlist ids that have a watched record of episode_id.
+async def _watchers(episode_id):
+    batch = []
+    async for record in watched_episodes_db.find({"episode_id": episode_id}, {"_id": 0, "watchlist_id": 1}):
+        batch.append(record["watchlist_id"])
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Applies a change of an episode's duration to minutes_watched of every entry that watched it.
+async def adjust_watched_minutes(episode_id, delta):
+    if not delta:
+        return
+    async for watchlist_ids in _watchers(episode_id):
+        await watch_progress_db.update_many({"watchlist_id": {"$in": watchlist_ids}}, {"$inc": {"minutes_watched": delta}})
+
+
+# Removes a deleted episode (document with id and duration_minutes) from the progress of every entry that watched
+# it, and deletes its watched records.
+async def remove_watched_episode(episode):
+    async for watchlist_ids in _watchers(episode["id"]):
+        await watch_progress_db.update_many(
+            {"watchlist_id": {"$in": watchlist_ids}},
+            {"$inc": {"episodes_watched": -1, "minutes_watched": -episode.get("duration_minutes", 0)}},
+        )
+    await watched_episodes_db.delete_many({"episode_id": episode["id"]})
+
+
+# Recomputes progress documents for every watchlist entry matching `query` and returns how many were written.
+async def rebuild(query=None):
+    rebuilt = 0
+    batch = []
+    async for watchlist in watchlist_db.find(query or {}, {"_id": 0, "id": 1, "user_id": 1, "show_id": 1}):
+        batch.append(watchlist)
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            rebuilt += await _rebuild_batch(batch)
+            batch = []
+    if batch:
+        rebuilt += await _rebuild_batch(batch)
+    return rebuilt
+
+
+async def _rebuild_batch(watchlists):
+    watchlist_ids = [watchlist["id"] for watchlist in watchlists]
+    show_ids = list({watchlist["show_id"] for watchlist in watchlists})
+
+    totals = {
+        row["_id"]: row["total"]
+        async for row in await episodes_db.aggregate([
+            {"$match": {"show_id": {"$in": show_ids}}},
+            {"$group": {"_id": "$show_id", "total": {"$sum": 1}}},
+        ])
+    }
+    watched = {
+        row["_id"]: row
+        async for row in await watched_episodes_db.aggregate([
+            {"$match": {"watchlist_id": {"$in": watchlist_ids}}},
+            {"$lookup": {"from": episodes_db.name, "localField": "episode_id", "foreignField": "id",
+                         "as": "episode"}},
+            {"$group": {
+                "_id": "$watchlist_id",
+                "episodes_watched": {"$sum": 1},
+                "minutes_watched": {"$sum": {"$ifNull": [{"$first": "$episode.duration_minutes"}, 0]}},
+                "last_watched_at": {"$max": "$watched_at"},
+            }},
+        ])
+    }
+
+    operations = []
+    for watchlist in watchlists:
+        row = watched.get(watchlist["id"], {})
+        operations.append(ReplaceOne(
+            {"watchlist_id": watchlist["id"]},
+            {
+                "watchlist_id": watchlist["id"],
+                "user_id": watchlist.get("user_id"),
+                "show_id": watchlist["show_id"],
+                "episodes_watched": row.get("episodes_watched", 0),
+                "total_episodes": totals.get(watchlist["show_id"], 0),
+                "minutes_watched": row.get("minutes_watched", 0),
+                "last_watched_at": row.get("last_watched_at"),
+            },
+            upsert=True,
+        ))
+    await watch_progress_db.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Backfill or repair watchlist progress documents.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user", help="Only rebuild this user's watchlist entries")
+    args = parser.parse_args()
+    rebuilt = await rebuild({"user_id": args.user} if args.user else None)
+    print(f"Rebuilt {rebuilt} progress documents")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,329 @@
+"""
+recommendations.py
+
+This file precomputes "users who added this show also added" recommendations for the Tracker API application.
+
+How it works:
+- Every watchlist entry links a user to a show with a weight: the entry's rating (unrated entries count as 1).
+  A user's entries for the same show add up. With X the users-by-shows matrix of these weights, C = Xᵀ·X is the
+  show-by-show co-occurrence matrix: C[a][b] sums weight(a) * weight(b) over every user who has both shows, and
+  C[a][a] is the show's own weight.
+- Similarity is cosine: C[a][b] / sqrt(C[a][a] * C[b][b]), so popular shows do not top every list.
+- `rebuild()` is the offline job. It reads watchlist_db once, builds X and C as sparse matrices with NumPy/SciPy
+  and writes:
+    - show_pairs_db: one document per co-occurring pair (a, b, w = C[a][b]), in both directions
+    - similar_shows_db: one document per show: show_id, weight (= C[a][a]) and the top-K similar shows
+    - recommendation_users_db: one document per user with the entries counted above (id, show_id, weight)
+  All are written to scratch collections and renamed over the live ones, so readers never see a half-built table.
+- watchlist.py calls `on_entry_added()` / `on_entry_removed()` as background tasks after a response is sent. They
+  apply the entry's change to the affected pairs with $inc and refresh the top-K lists of the show and its
+  co-occurring shows.
+- cascade.py calls `remove_show()` when a show is deleted: its pairs (both directions) are deleted and it is
+  pulled from the similar lists of every show it co-occurred with and from the users' counted entries.
+- `GET /shows/{show_id}/similar` reads the show's similar_shows_db document: a single indexed read.
+
+Key Concepts:
+- NumPy and SciPy are only needed for the rebuild job and are imported when it runs.
+- Incremental updates apply exactly the change an entry makes to X, so pair and show weights match a rebuild.
+  An update first adds the entry to (or pulls it from) the user's recommendation_users_db document in one atomic
+  operation and pairs it only with the entries that document held before. Two entries added at the same time are
+  therefore paired once, by whichever comes second, and an entry that is already counted (or already removed) is
+  skipped, so a repeated background task changes nothing. Entries added before recommendation_users_db existed
+  are only known to it after a rebuild, so run one after upgrading.
+  A top-K list can miss a show that would only have entered it because another show dropped out; the next rebuild
+  repairs that. Run it periodically, e.g.:
+      python recommendations.py rebuild              # once
+      python recommendations.py rebuild --every 3600 # every hour
+- RECOMMENDATIONS_TOP_K (default 20) sets how many similar shows are kept per show.
+
+Other modules can import these functions to keep recommendations up to date or to read them.
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import os
+
+from pymongo import DeleteMany, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from database import db, recommendation_users_db, show_pairs_db, similar_shows_db, watchlist_db
+from indexes import INDEXES
+
+# Similar shows kept per show.
+RECOMMENDATIONS_TOP_K = int(os.getenv("RECOMMENDATIONS_TOP_K", 20))
+# Documents written per round trip during a rebuild.
+WRITE_BATCH_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
+
+# The weight a watchlist entry contributes: its rating, with unrated (0 or negative) entries counting as 1.
+def entry_weight(entry):
+    return max(entry.get("rating") or 0, 1)
+
+
+def _top(scores, limit):
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [{"show_id": show_id, "score": round(score, 4)} for show_id, score in ranked]
+
+
+# ___________________________________Offline Rebuild________________________
+
+async def _write_collection(target, documents):
+    scratch = db[f"{target.name}_rebuild"]
+    await scratch.drop()
+    models = dict((collection.name, indexes) for collection, indexes in INDEXES)[target.name]
+    await scratch.create_indexes(models)
+    batch = []
+    for document in documents:
+        batch.append(InsertOne(document))
+        if len(batch) >= WRITE_BATCH_SIZE:
+            await scratch.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await scratch.bulk_write(batch, ordered=False)
+    await scratch.rename(target.name, dropTarget=True)
+
+
+# Recomputes every pair weight and top-K list from watchlist_db. Returns the number of shows and pairs written.
+async def rebuild(top_k=RECOMMENDATIONS_TOP_K):
+    try:
+        import numpy as np
+        from scipy import sparse
+    except ImportError as exc:
+        raise RuntimeError("The recommendations rebuild needs numpy and scipy (pip install numpy scipy)") from exc
+
+    user_index, show_index = {}, {}
+    rows, cols, weights = [], [], []
+    counted = {}
+    async for entry in watchlist_db.find({}, {"_id": 0, "id": 1, "user_id": 1, "show_id": 1, "rating": 1}):
+        rows.append(user_index.setdefault(entry["user_id"], len(user_index)))
+        cols.append(show_index.setdefault(entry["show_id"], len(show_index)))
+        weights.append(entry_weight(entry))
+        counted.setdefault(entry["user_id"], []).append(_counted_entry(entry))
+    show_ids = list(show_index)
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(weights, dtype=np.float64), (rows, cols)), shape=(len(user_index), len(show_ids))
+    )
+    cooccurrence = (matrix.T @ matrix).tocsr()
+    diagonal = cooccurrence.diagonal()
+    norms = np.sqrt(diagonal)
+
+    similar = []
+    pair_count = 0
+    for a, show_id in enumerate(show_ids):
+        start, end = cooccurrence.indptr[a], cooccurrence.indptr[a + 1]
+        neighbours = cooccurrence.indices[start:end]
+        values = cooccurrence.data[start:end]
+        keep = neighbours != a
+        neighbours, values = neighbours[keep], values[keep]
+        pair_count += len(neighbours)
+        scores = values / (norms[a] * norms[neighbours])
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            neighbours, scores = neighbours[best], scores[best]
+        similar.append({
+            "show_id": show_id,
+            "weight": float(diagonal[a]),
+            "similar": _top({show_ids[b]: float(score) for b, score in zip(neighbours, scores)}, top_k),
+        })
+
+    def pairs():
+        coo = cooccurrence.tocoo()
+        for a, b, weight in zip(coo.row, coo.col, coo.data):
+            if a != b:
+                yield {"a": show_ids[a], "b": show_ids[b], "w": float(weight)}
+
+    await _write_collection(show_pairs_db, pairs())
+    await _write_collection(similar_shows_db, similar)
+    await _write_collection(
+        recommendation_users_db, ({"user_id": user_id, "entries": entries} for user_id, entries in counted.items())
+    )
+    return {"shows": len(similar), "pairs": pair_count}
+
+
+# ___________________________________Incremental Updates________________________
+
+def _counted_entry(entry):
+    return {"id": entry["id"], "show_id": entry["show_id"], "w": entry_weight(entry)}
+
+
+# Adds the entry to the user's counted entries and returns the entries counted before it,
+# or None if it is already counted.
+async def _claim_added(entry):
+    while True:
+        try:
+            before = await recommendation_users_db.find_one_and_update(
+                {"user_id": entry["user_id"], "entries.id": {"$ne": entry["id"]}},
+                {"$push": {"entries": _counted_entry(entry)}},
+                projection={"_id": 0, "entries": 1},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+            return (before or {}).get("entries", [])
+        except DuplicateKeyError:
+            # No document matched: either the entry is counted already, or another task created the user's
+            # document first (then the next attempt matches it).
+            if await recommendation_users_db.count_documents({"user_id": entry["user_id"], "entries.id": entry["id"]}):
+                return None
+
+
+# Pulls the entry from the user's counted entries and returns (the entry as counted, the entries left),
+# or (None, None) if it is not counted.
+async def _claim_removed(entry):
+    before = await recommendation_users_db.find_one_and_update(
+        {"user_id": entry["user_id"], "entries.id": entry["id"]},
+        {"$pull": {"entries": {"id": entry["id"]}}},
+        projection={"_id": 0, "entries": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        return None, None
+    counted = next(item for item in before["entries"] if item["id"] == entry["id"])
+    return counted, [item for item in before["entries"] if item["id"] != entry["id"]]
+
+
+# Adds (sign=1) or removes (sign=-1) one watchlist entry's contribution and refreshes the affected top-K lists.
+# The entry is paired with the user's entries counted before it, not with whatever watchlist_db holds right now,
+# so concurrent updates for the same user never count a pair twice.
+async def _apply_entry(entry, sign):
+    if sign > 0:
+        counted, previous = _counted_entry(entry), await _claim_added(entry)
+    else:
+        counted, previous = await _claim_removed(entry)
+    if previous is None:
+        return
+    show_id = counted["show_id"]
+    weight = counted["w"]
+
+    # The user's other shows, each with the weight it contributes, and the weight of their other entries for
+    # this same show (X[user][show] is the sum of all of them).
+    others = {}
+    same_show = 0
+    for other in previous:
+        if other["show_id"] == show_id:
+            same_show += other["w"]
+        else:
+            others[other["show_id"]] = others.get(other["show_id"], 0) + other["w"]
+
+    operations = []
+    for other_id, other_weight in others.items():
+        delta = sign * weight * other_weight
+        operations.append(UpdateOne({"a": show_id, "b": other_id}, {"$inc": {"w": delta}}, upsert=True))
+        operations.append(UpdateOne({"a": other_id, "b": show_id}, {"$inc": {"w": delta}}, upsert=True))
+    if operations:
+        touched = [show_id, *others]
+        operations.append(DeleteMany({"a": {"$in": touched}, "b": {"$in": touched}, "w": {"$lte": 0}}))
+        await show_pairs_db.bulk_write(operations, ordered=True)
+    await similar_shows_db.update_one(
+        {"show_id": show_id},
+        # C[a][a] = X[user][a]² summed over users: (same_show + weight)² - same_show² for this user.
+        {"$inc": {"weight": sign * (weight * weight + 2 * weight * same_show)}, "$setOnInsert": {"similar": []}},
+        upsert=True,
+    )
+    await _refresh(show_id, others)
+
+
+# Recomputes the top-K list of show_id and updates its entry in the lists of the shows in `others`.
+async def _refresh(show_id, others):
+    pair_weights = {
+        pair["b"]: pair["w"]
+        async for pair in show_pairs_db.find({"a": show_id, "w": {"$gt": 0}}, {"_id": 0, "b": 1, "w": 1})
+    }
+    ids = list({show_id, *pair_weights, *others})
+    documents = {
+        document["show_id"]: document
+        async for document in similar_shows_db.find({"show_id": {"$in": ids}}, {"_id": 0})
+    }
+
+    def norm(other_id):
+        return math.sqrt(max(documents.get(other_id, {}).get("weight", 0), 0))
+
+    def score(other_id):
+        denominator = norm(show_id) * norm(other_id)
+        return pair_weights.get(other_id, 0) / denominator if denominator else 0
+
+    own_scores = {other_id: score(other_id) for other_id in pair_weights}
+    operations = [UpdateOne(
+        {"show_id": show_id},
+        {"$set": {"similar": _top({k: v for k, v in own_scores.items() if v > 0}, RECOMMENDATIONS_TOP_K)}},
+    )]
+    for other_id in others:
+        scores = {item["show_id"]: item["score"] for item in documents.get(other_id, {}).get("similar", [])}
+        scores.pop(show_id, None)
+        if score(other_id) > 0:
+            scores[show_id] = score(other_id)
+        operations.append(UpdateOne(
+            {"show_id": other_id}, {"$set": {"similar": _top(scores, RECOMMENDATIONS_TOP_K)}}
+        ))
+    await similar_shows_db.bulk_write(operations, ordered=False)
+
+
+# Background task for a new watchlist entry.
+async def on_entry_added(entry):
+    try:
+        await _apply_entry(entry, 1)
+    except Exception:
+        logger.exception("Failed to update recommendations for watchlist entry %s", entry.get("id"))
+
+
+# Background task for a removed watchlist entry (the document as it was before deletion).
+async def on_entry_removed(entry):
+    try:
+        await _apply_entry(entry, -1)
+    except Exception:
+        logger.exception("Failed to update recommendations for watchlist entry %s", entry.get("id"))
+
+
+# Background task for an edited watchlist entry. Only a new show or rating changes the recommendations.
+async def on_entry_changed(before, after):
+    if before["show_id"] != after["show_id"] or entry_weight(before) != entry_weight(after):
+        await on_entry_removed(before)
+        await on_entry_added(after)
+
+
+# Removes a deleted show from the pair table and from the similar lists of every show it co-occurred with.
+async def remove_show(show_id):
+    pull = {"$pull": {"similar": {"show_id": show_id}}}
+    batch = []
+    async for pair in show_pairs_db.find({"b": show_id}, {"_id": 0, "a": 1}):
+        batch.append(pair["a"])
+        if len(batch) >= WRITE_BATCH_SIZE:
+            await similar_shows_db.update_many({"show_id": {"$in": batch}}, pull)
+            batch = []
+    if batch:
+        await similar_shows_db.update_many({"show_id": {"$in": batch}}, pull)
+    await show_pairs_db.delete_many({"$or": [{"a": show_id}, {"b": show_id}]})
+    await similar_shows_db.delete_one({"show_id": show_id})
+    await recommendation_users_db.update_many(
+        {"entries.show_id": show_id}, {"$pull": {"entries": {"show_id": show_id}}}
+    )
+
+
+# ___________________________________Reading________________________
+
+# Returns up to `limit` shows similar to show_id, most similar first.
+async def get_similar(show_id, limit=RECOMMENDATIONS_TOP_K):
+    document = await similar_shows_db.find_one(
+        {"show_id": show_id}, {"_id": 0, "similar": {"$slice": limit}}
+    )
+    return (document or {}).get("similar", [])
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Rebuild the precomputed similar-shows table.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--every", type=float, help="Keep running and rebuild every this many seconds")
+    args = parser.parse_args()
+    while True:
+        print(f"Rebuilt recommendations: {await rebuild()}")
+        if not args.every:
+            break
+        await asyncio.sleep(args.every)
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,175 @@
+"""
+repository.py
+
+This file is the data-access layer for mutations in the Tracker API application.
+It sits between the routers and database.py.
+
+How it works:
+- Each mutation is a single conditional MongoDB operation. Ownership is part of the filter (e.g. {"id": ..., "user_id": ...}),
+  so there is no separate "does it exist / do I own it" query and no race window between checking and writing.
+- find_one_and_update / find_one_and_delete return the document as it was before the change, so callers can still
+  react to what changed (e.g. invalidate caches or update progress counters) without an extra read.
+- Results are mapped to HTTP errors the same way everywhere:
+    - 404 when nothing matched (the document does not exist, or it belongs to another user)
+    - 409 when an insert or update collides with an existing id
+
+Key Concepts:
+- Not-found and not-owned both return 404, so a user cannot probe for other users' ids.
+- Watched records are matched on their own user_id. Records written before user_id was stored on them can be
+  backfilled with:  python repository.py backfill-owners
+- An episode is watched at most once per watchlist entry (unique index on watchlist_id + episode_id). Duplicates
+  recorded before that index existed can be removed, keeping the earliest record, with:
+      python repository.py dedupe-watched
+  followed by `python progress.py rebuild` and `python rollups.py rebuild`.
+- A user has at most one watchlist entry per show (unique index on user_id + show_id).
+
+Other modules can import these functions instead of calling the collections directly for writes.
+"""
+
+import asyncio
+import sys
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from database import episodes_db, watchlist_db, watched_episodes_db
+
+
+# ___________________________________Generic helpers________________________
+
+# Inserts a document; raises 409 if a unique index (e.g. on id) already has it.
+async def insert_unique(collection, document, conflict_detail):
+    try:
+        await collection.insert_one(document)
+    except DuplicateKeyError as exc:
+        raise HTTPException(status_code=409, detail=conflict_detail) from exc
+
+
+# Returns the matching document, or raises 404.
+async def find_one_or_404(collection, query, detail):
+    document = await collection.find_one(query, {"_id": 0})
+    if document is None:
+        raise HTTPException(status_code=404, detail=detail)
+    return document
+
+
+# Applies $set to the matching document and returns it as it was before the update, or raises 404.
+# Raises 409 if the new values collide with another document on a unique index (e.g. a changed id).
+async def update_one_or_404(collection, query, fields, detail, conflict_detail):
+    try:
+        before = await collection.find_one_and_update(
+            query, {"$set": fields}, projection={"_id": 0}, return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError as exc:
+        raise HTTPException(status_code=409, detail=conflict_detail) from exc
+    if before is None:
+        raise HTTPException(status_code=404, detail=detail)
+    return before
+
+
+# Deletes the matching document and returns it, or raises 404.
+async def delete_one_or_404(collection, query, detail):
+    deleted = await collection.find_one_and_delete(query, projection={"_id": 0})
+    if deleted is None:
+        raise HTTPException(status_code=404, detail=detail)
+    return deleted
+
+
+# ___________________________________Watchlist________________________
+
+WATCHLIST_NOT_FOUND = "Watchlist entry not found"
+# The id is taken, or the user already has an entry for the show (unique index on user_id + show_id).
+WATCHLIST_CONFLICT = "Watchlist entry already exists or show already in watchlist"
+
+
+async def add_watchlist_entry(entry):
+    await insert_unique(watchlist_db, entry, WATCHLIST_CONFLICT)
+
+
+async def get_owned_watchlist(watchlist_id, user_id):
+    return await find_one_or_404(watchlist_db, {"id": watchlist_id, "user_id": user_id}, WATCHLIST_NOT_FOUND)
+
+
+# The entry keeps its id and owner whatever the request body says.
+async def update_watchlist_entry(watchlist_id, user_id, fields):
+    fields = {**fields, "id": watchlist_id, "user_id": user_id}
+    return await update_one_or_404(
+        watchlist_db, {"id": watchlist_id, "user_id": user_id}, fields, WATCHLIST_NOT_FOUND, WATCHLIST_CONFLICT
+    )
+
+
+async def delete_watchlist_entry(watchlist_id, user_id):
+    return await delete_one_or_404(watchlist_db, {"id": watchlist_id, "user_id": user_id}, WATCHLIST_NOT_FOUND)
+
+
+# ___________________________________Episodes________________________
+
+EPISODE_NOT_FOUND = "Episode not found"
+EPISODE_CONFLICT = "Episode already exists"
+
+
+EPISODE_MOVED = "An episode cannot be moved to another show"
+
+
+# The show is part of the filter: progress counters and rollups are kept per show, so an update cannot move an
+# episode. Raises 422 if the episode exists under another show.
+async def update_episode(episode_id, show_id, fields):
+    try:
+        return await update_one_or_404(
+            episodes_db, {"id": episode_id, "show_id": show_id}, fields, EPISODE_NOT_FOUND, EPISODE_CONFLICT
+        )
+    except HTTPException as exc:
+        if exc.status_code == 404 and await episodes_db.count_documents({"id": episode_id}, limit=1):
+            raise HTTPException(status_code=422, detail=EPISODE_MOVED) from exc
+        raise
+
+
+async def delete_episode(episode_id):
+    return await delete_one_or_404(episodes_db, {"id": episode_id}, EPISODE_NOT_FOUND)
+
+
+# ___________________________________Watched Episodes________________________
+
+WATCHED_NOT_FOUND = "Watched Episode not found"
+
+
+async def delete_watched_episode(watched_id, watchlist_id, user_id):
+    return await delete_one_or_404(
+        watched_episodes_db, {"id": watched_id, "watchlist_id": watchlist_id, "user_id": user_id}, WATCHED_NOT_FOUND
+    )
+
+
+# Copies user_id from each watchlist entry onto its watched records that do not have one yet.
+async def backfill_watched_owners():
+    updated = 0
+    async for entry in watchlist_db.find({}, {"_id": 0, "id": 1, "user_id": 1}):
+        result = await watched_episodes_db.update_many(
+            {"watchlist_id": entry["id"], "user_id": {"$exists": False}}, {"$set": {"user_id": entry["user_id"]}}
+        )
+        updated += result.modified_count
+    return updated
+
+
+# Deletes repeated watched records of the same episode in the same watchlist entry, keeping the earliest one.
+async def dedupe_watched_episodes():
+    pipeline = [
+        {"$sort": {"watched_at": 1}},
+        {"$group": {"_id": {"watchlist_id": "$watchlist_id", "episode_id": "$episode_id"},
+                    "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    deleted = 0
+    async for group in await watched_episodes_db.aggregate(pipeline, allowDiskUse=True):
+        result = await watched_episodes_db.delete_many({"_id": {"$in": group["ids"][1:]}})
+        deleted += result.deleted_count
+    return deleted
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["backfill-owners"]:
+        print(f"Backfilled user_id on {asyncio.run(backfill_watched_owners())} watched records")
+    elif sys.argv[1:] == ["dedupe-watched"]:
+        print(f"Deleted {asyncio.run(dedupe_watched_episodes())} duplicate watched records")
+    else:
+        sys.exit("usage: python repository.py backfill-owners | dedupe-watched")
@@ -0,0 +1,62 @@
+"""
+responses.py
+
+This file provides fast JSON responses and field projection for the read endpoints of the Tracker API application.
+
+How it works:
+- `json_response()` wraps data in an ORJSONResponse. Returning a Response object from a route makes FastAPI send it
+  as is, skipping `jsonable_encoder` and response validation. This is only used for documents read from our own
+  database, which are already plain JSON-compatible dicts and lists.
+- `parse_fields()` turns `?fields=title,genre` into a MongoDB projection, so only the requested fields are read from
+  the database and sent. Unknown field names are rejected with 422. `id` is always included (it is the page cursor).
+- `project()` applies the same field selection to documents that are already in memory (e.g. from the catalog cache).
+- `TimedORJSONResponse` is ORJSONResponse plus a timer around rendering, so serialization cost shows up in /metrics.
+
+Key Concepts:
+- orjson serializes several times faster than the standard library json module, which matters for large lists.
+- main.py also makes TimedORJSONResponse the default response class for every other route.
+
+Other modules can import these helpers to return trusted data quickly or support `?fields=`.
+"""
+
+from fastapi import HTTPException, Query
+from fastapi.responses import ORJSONResponse
+
+from metrics import RESPONSE_RENDER_SECONDS, timed
+
+# Reusable query parameter definition for endpoints that support field selection.
+FieldsQuery = Query(None, description="Comma-separated list of fields to return, e.g. title,genre")
+
+
+# ORJSONResponse that records how long rendering the body takes.
+class TimedORJSONResponse(ORJSONResponse):
+    def render(self, content):
+        with timed(RESPONSE_RENDER_SECONDS):
+            return super().render(content)
+
+
+# Returns an ORJSONResponse for trusted, already JSON-compatible data (skips FastAPI's encoding step).
+def json_response(content, status_code=200, headers=None):
+    return TimedORJSONResponse(content, status_code=status_code, headers=headers)
+
+
+# Turns "title,genre" into {"_id": 0, "id": 1, "title": 1, "genre": 1}. Returns None when fields is empty.
+# model is the Pydantic model whose fields may be requested.
+def parse_fields(fields, model):
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    projection = {"_id": 0, "id": 1}
+    for name in requested:
+        projection[name] = 1
+    return projection
+
+
+# Applies a projection from parse_fields() to an in-memory document.
+def project(document, projection):
+    if projection is None:
+        return document
+    return {name: document[name] for name in projection if name != "_id" and name in document}
@@ -0,0 +1,232 @@
+"""
+rollups.py
+
+This file maintains pre-aggregated watch-history rollups per user for the Tracker API application.
+
+How it works:
+- Each document in watch_rollups_db sums up one user's watching in one time bucket:
+    user_id, period, bucket, episodes, minutes, genres ({genre: episodes})
+  period is "day", "week", "month" or "year" and bucket names the time span in UTC:
+    day "2026-10-17", week "2026-W42" (ISO week), month "2026-10", year "2026"
+- watched.py calls `record_watched_rollups()` / `record_unwatched_rollups()` on every add, batch and remove. Each
+  call is one unordered bulk_write of four $inc upserts (one per period), so a watch event costs one round trip.
+- `read_stats()` answers "how much did this user watch in this bucket" with at most two indexed queries: the bucket
+  itself plus its breakdown (a year's 12 months, a month's days or a week's 7 days). The cost does not depend on
+  how long the user's history is.
+- `rebuild()` recomputes the rollups from watched_episodes_db, episodes_db and shows_db. It backfills history
+  recorded before rollups existed and repairs drift (e.g. after an episode's duration was edited).
+
+Key Concepts:
+- Minutes come from Episode.duration_minutes and genres from the show's genre at the time the episode is marked.
+- Genre names are used as field names inside `genres`, so "." and "$" are replaced with "_".
+- Run the rebuild by hand (ideally while few users are marking episodes) with:
+      python rollups.py rebuild                 # every user
+      python rollups.py rebuild --user USER_ID  # one user
+
+Other modules can import these functions to keep rollups in sync with their writes or to read them.
+"""
+
+import argparse
+import asyncio
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+from pymongo import ReplaceOne, UpdateOne
+
+from cache import catalog_cache
+from database import episodes_db, shows_db, users_db, watched_episodes_db, watch_rollups_db
+
+PERIODS = ("day", "week", "month", "year")
+# Genres returned by the stats endpoint, most watched first.
+TOP_GENRES = 5
+# Users processed per round trip during a rebuild.
+REBUILD_BATCH_SIZE = 200
+
+
+# Returns {period: bucket} for a Unix timestamp (UTC).
+def buckets_for(watched_at):
+    moment = datetime.fromtimestamp(watched_at, tz=timezone.utc)
+    iso_year, iso_week, _ = moment.isocalendar()
+    return {
+        "day": moment.strftime("%Y-%m-%d"),
+        "week": f"{iso_year}-W{iso_week:02d}",
+        "month": moment.strftime("%Y-%m"),
+        "year": moment.strftime("%Y"),
+    }
+
+
+# Returns (child period, child buckets) that break a bucket down, e.g. a year into its 12 months.
+def breakdown_of(period, bucket):
+    if period == "year":
+        return "month", [f"{bucket}-{month:02d}" for month in range(1, 13)]
+    if period == "month":
+        first = date.fromisoformat(f"{bucket}-01")
+        days = []
+        day = first
+        while day.month == first.month:
+            days.append(day.isoformat())
+            day += timedelta(days=1)
+        return "day", days
+    if period == "week":
+        first = datetime.strptime(f"{bucket}-1", "%G-W%V-%u").date()
+        return "day", [(first + timedelta(days=offset)).isoformat() for offset in range(7)]
+    return None, []
+
+
+def genre_key(genre):
+    return (genre or "Unknown").replace(".", "_").replace("$", "_")
+
+
+def _operations(user_id, watched_at, episodes, minutes, genre):
+    return [
+        UpdateOne(
+            {"user_id": user_id, "period": period, "bucket": bucket},
+            {"$inc": {"episodes": episodes, "minutes": minutes, f"genres.{genre_key(genre)}": episodes}},
+            upsert=True,
+        )
+        for period, bucket in buckets_for(watched_at).items()
+    ]
+
+
+async def _show_genre(show_id):
+    show = await catalog_cache.get_show(show_id)
+    return (show or {}).get("genre")
+
+
+# Adds newly watched episodes (documents with duration_minutes) of a watchlist entry's show to the user's rollups.
+async def record_watched_rollups(watchlist, episodes, watched_at):
+    if not episodes:
+        return
+    minutes = sum(episode.get("duration_minutes", 0) for episode in episodes)
+    genre = await _show_genre(watchlist["show_id"])
+    await watch_rollups_db.bulk_write(
+        _operations(watchlist["user_id"], watched_at, len(episodes), minutes, genre), ordered=False
+    )
+
+
+# Subtracts a removed watched record (with its episode document) from the user's rollups.
+# If the episode no longer exists its minutes and genre are unknown, so nothing is subtracted
+# (`rebuild()` recomputes the rollups from what is left).
+async def record_unwatched_rollups(user_id, watched, episode):
+    if not episode or "show_id" not in episode:
+        return
+    genre = await _show_genre(episode["show_id"])
+    await watch_rollups_db.bulk_write(
+        _operations(user_id, watched["watched_at"], -1, -episode.get("duration_minutes", 0), genre), ordered=False
+    )
+
+
+def _summary(document, bucket):
+    document = document or {}
+    genres = Counter(document.get("genres") or {})
+    return {
+        "bucket": bucket,
+        "episodes": document.get("episodes", 0),
+        "minutes": document.get("minutes", 0),
+        "top_genres": [{"genre": genre, "episodes": count}
+                       for genre, count in genres.most_common(TOP_GENRES) if count > 0],
+    }
+
+
+# Returns the totals of one bucket plus its breakdown (e.g. "2026" and its months).
+async def read_stats(user_id, period, bucket):
+    child_period, child_buckets = breakdown_of(period, bucket)
+    total = await watch_rollups_db.find_one(
+        {"user_id": user_id, "period": period, "bucket": bucket}, {"_id": 0}
+    )
+    children = {}
+    if child_period:
+        async for row in watch_rollups_db.find(
+            {"user_id": user_id, "period": child_period, "bucket": {"$in": child_buckets}}, {"_id": 0}
+        ):
+            children[row["bucket"]] = row
+    return {
+        "user_id": user_id,
+        "period": period,
+        **_summary(total, bucket),
+        "breakdown": [
+            {key: value for key, value in _summary(children.get(child), child).items() if key != "top_genres"}
+            for child in child_buckets
+        ],
+    }
+
+
+# Recomputes the rollups of every user matching `query` and returns how many users were processed.
+async def rebuild(query=None):
+    rebuilt = 0
+    batch = []
+    async for user in users_db.find(query or {}, {"_id": 0, "id": 1}):
+        batch.append(user["id"])
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            rebuilt += await _rebuild_batch(batch)
+            batch = []
+    if batch:
+        rebuilt += await _rebuild_batch(batch)
+    return rebuilt
+
+
+async def _rebuild_batch(user_ids):
+    # Per user, day and genre: episodes and minutes. Days are whole UTC days since the epoch.
+    rows = await watched_episodes_db.aggregate([
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$lookup": {"from": episodes_db.name, "localField": "episode_id", "foreignField": "id", "as": "episode"}},
+        {"$set": {"episode": {"$first": "$episode"}}},
+        {"$lookup": {"from": shows_db.name, "localField": "episode.show_id", "foreignField": "id", "as": "show"}},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "day": {"$floor": {"$divide": ["$watched_at", 86400]}},
+                "genre": {"$first": "$show.genre"},
+            },
+            "episodes": {"$sum": 1},
+            "minutes": {"$sum": {"$ifNull": ["$episode.duration_minutes", 0]}},
+        }},
+    ])
+
+    totals = defaultdict(lambda: {"episodes": 0, "minutes": 0, "genres": Counter()})
+    async for row in rows:
+        key = row["_id"]
+        for period, bucket in buckets_for(int(key["day"]) * 86400).items():
+            total = totals[(key["user_id"], period, bucket)]
+            total["episodes"] += row["episodes"]
+            total["minutes"] += row["minutes"]
+            total["genres"][genre_key(key.get("genre"))] += row["episodes"]
+
+    # Buckets that exist now but have no watched records left. They are read before writing, so a bucket that a
+    # live watch event creates during the rebuild is not swept.
+    stale = [
+        row["_id"]
+        async for row in watch_rollups_db.find(
+            {"user_id": {"$in": user_ids}}, {"_id": 1, "user_id": 1, "period": 1, "bucket": 1}
+        )
+        if (row["user_id"], row["period"], row["bucket"]) not in totals
+    ]
+    # Replace each bucket in place instead of wiping and re-inserting: a concurrent $inc upsert from
+    # record_watched_rollups() then cannot cause a duplicate key error or leave the user's rollups half-deleted.
+    operations = [
+        ReplaceOne(
+            {"user_id": user_id, "period": period, "bucket": bucket},
+            {"user_id": user_id, "period": period, "bucket": bucket, "episodes": total["episodes"],
+             "minutes": total["minutes"], "genres": dict(total["genres"])},
+            upsert=True,
+        )
+        for (user_id, period, bucket), total in totals.items()
+    ]
+    if operations:
+        await watch_rollups_db.bulk_write(operations, ordered=False)
+    if stale:
+        await watch_rollups_db.delete_many({"_id": {"$in": stale}})
+    return len(user_ids)
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Backfill or repair watch-history rollups.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user", help="Only rebuild this user's rollups")
+    args = parser.parse_args()
+    rebuilt = await rebuild({"id": args.user} if args.user else None)
+    print(f"Rebuilt rollups for {rebuilt} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
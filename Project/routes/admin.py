@@ -0,0 +1,57 @@
+"""
+admin.py
+
+This file defines the admin endpoints of the Tracker API application.
+
+How it works:
+- Uses FastAPI's APIRouter for the endpoints. Every endpoint requires the ADMIN_TOKEN bearer token (see auth.py)
+  and does not exist while ADMIN_TOKEN is unset.
+- `GET /admin/export/{collection}` streams one collection (users, shows, episodes, watchlist or watched) as
+  gzip-compressed NDJSON, optionally only one user's data (`?user_id=`). The response is the same file
+  `python transfer.py export` writes, so it can be saved as `<collection>.ndjson.gz` and loaded with
+  `python transfer.py import`. Request several collections at once to export them in parallel.
+
+Key Concepts:
+- Documents are streamed from the cursor and compressed block by block, so memory use does not grow with the
+  size of the collection (see transfer.py).
+- The throughput of every export is logged when it finishes.
+
+Other modules can import this router to include the admin endpoints in the main FastAPI app.
+"""
+
+import logging
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from auth import require_admin
+from transfer import COLLECTIONS, gzip_chunks, user_queries
+
+logger = logging.getLogger(__name__)
+
+# Creating a router for the admin endpoints; all of them need the admin token.
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+# Endpoint to download a collection (or one user's part of it) as gzip-compressed NDJSON.
+@router.get("/admin/export/{collection}")
+async def export_collection(collection: str, user_id: str = Query(None)):
+    if collection not in COLLECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    query = (await user_queries(user_id))[collection] if user_id else None
+
+    async def blocks():
+        start = time.perf_counter()
+        stats = {"documents": 0}
+        async for block in gzip_chunks(collection, query, stats):
+            yield block
+        seconds = time.perf_counter() - start
+        logger.info("Exported %d %s documents in %.1f s (%.0f docs/s)",
+                    stats["documents"], collection, seconds, stats["documents"] / seconds if seconds else 0)
+
+    return StreamingResponse(
+        blocks(),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{collection}.ndjson.gz"'},
+    )
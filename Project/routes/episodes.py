@@ -5,22 +5,41 @@ This file defines the API endpoints related to episode management for the Tracke
 
 How it works:
 - Uses FastAPI's APIRouter to group all episode-related endpoints together.
-- Imports the episodes_db and shows_db collections from the database module to interact with episode and show data in MongoDB.
+- Imports the episodes_db collection from the database module to interact with episode data in MongoDB.
 - Imports the Episode model from the models module to validate and structure episode data.
 - Provides endpoints for adding, listing, updating, and deleting episodes, as well as listing episodes for a specific show.
+- Provides a bulk endpoint that ingests a JSON array or NDJSON stream of episodes in chunked, unordered writes (see bulk.py).
 
 Key Concepts:
 - Endpoints use Pydantic models to validate incoming data and structure responses.
 - All episode data is stored and retrieved from the MongoDB collection.
 - Endpoints are grouped using a router for better organization and modularity.
 - Includes logic to ensure episodes are only added to valid shows and only lists episodes for series-type shows.
+- Updates and deletes are single conditional operations from repository.py and return 404 when the episode is missing.
+- Episode writes adjust total_episodes in the watchlist progress documents of the show (see progress.py).
+- Show lookups and per-show episode lists are read through the catalog cache, and every write invalidates it (see cache.py).
+- Read endpoints return database documents directly with orjson and accept `?fields=` to read and send only
+  some fields (see responses.py).
+- GET /shows/{show_id}/episodes carries an ETag and Cache-Control; If-None-Match gets a 304 without reading any
+  episodes. Every write bumps the version counters the ETags are built from (see etags.py).
+- Lists are paginated with a keyset cursor (`?after=&limit=`) or streamed as NDJSON (`?stream=true`), see pagination.py.
 
 Other modules can import this router to include episode-related endpoints in the main FastAPI app."""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import ValidationError
 
-from database import shows_db, episodes_db
+from bulk import ChunkedInserter, read_items
+from cache import catalog_cache
+from database import episodes_db
+from etags import bump_versions, conditional_get, episodes_key, show_key
 from models import Episode
+from pagination import (
+	DEFAULT_PAGE_SIZE, AfterQuery, LimitQuery, StreamQuery, fetch_page, page_from_list, set_next_cursor, stream_ndjson,
+)
+from progress import adjust_total, adjust_watched_minutes, remove_watched_episode
+from responses import FieldsQuery, json_response, parse_fields, project
+import repository
 
 # Creating a router for episode-related endpoints.
 router = APIRouter()
@@ -29,74 +48,140 @@ router = APIRouter()
 # ____________________________________Episodes__________________________
 
 # Endpoint to get all episodes.
-# Returns a list of all episodes in the database.
+# Returns one page of episodes ordered by id; the cursor for the next page is sent in the X-Next-Cursor header.
+# With ?stream=true every episode is streamed as NDJSON instead.
 @router.get("/episodes")
-def get_episode() :
-	return list(episodes_db.find({}, {"_id" : 0}))
+async def get_episode(after: str = AfterQuery, limit: int = LimitQuery, stream: bool = StreamQuery, fields: str = FieldsQuery) :
+	projection = parse_fields(fields, Episode)
+	if stream :
+		return stream_ndjson(episodes_db, {}, after, limit, projection)
+	episodes, next_cursor = await fetch_page(episodes_db, {}, after, limit, projection)
+	response = json_response(episodes)
+	set_next_cursor(response, next_cursor)
+	return response
 
 
 # Endpoint to add an episode to a specific show.
 # Accepts an Episode object and show_id, adds the episode if the show exists.
+# Returns 409 if an episode with the same ID already exists, and 422 if its show_id is not the show in the URL.
 @router.post("/shows/{show_id}/episodes")
-def add_episodes(episode: Episode, show_id: str) :
-	key = show_id
-	if shows_db.find_one({"id" : key}) :
-		episodes_db.insert_one({
+async def add_episodes(episode: Episode, show_id: str) :
+	if episode.show_id != show_id :
+		raise HTTPException(status_code=422, detail="show_id does not match the show in the URL")
+	if await catalog_cache.get_show(show_id) :
+		await repository.insert_unique(episodes_db, {
 			"id" : episode.id,
 			"show_id" : episode.show_id,
 			"season_number" : episode.season_number,
 			"episode_number" : episode.episode_number,
 			"title" : episode.title,
 			"duration_minutes" : episode.duration_minutes,
-		})
+		}, "Episode already exists")
+		await catalog_cache.invalidate_episodes(show_id)
+		await bump_versions(episodes_key(show_id))
+		await adjust_total(show_id, 1)
 		return {"Message" : "Episode added successfully"}
 	return {"Error" : "Episode not added"}
 
 
+# Endpoint to add many episodes to a specific show in one call.
+# Accepts a JSON array of Episode objects, or an NDJSON stream (Content-Type: application/x-ndjson).
+# The show is checked once; episodes are written in unordered chunks and per-item errors are returned.
+@router.post("/shows/{show_id}/episodes/bulk", openapi_extra={"requestBody": {"required": True, "content": {
+	"application/json" : {"schema" : {"type" : "array", "items" : {"$ref" : "#/components/schemas/Episode"}}},
+	"application/x-ndjson" : {"schema" : {"type" : "string", "description" : "One Episode object per line"}},
+}}})
+async def bulk_add_episodes(show_id: str, request: Request) :
+	if not await catalog_cache.get_show(show_id) :
+		return {"Error" : "Show not found"}
+	
+	inserter = ChunkedInserter(episodes_db)
+	async for position, item in read_items(request) :
+		if isinstance(item, ValueError) :
+			inserter.reject(position, None, str(item))
+			continue
+		try :
+			episode = Episode(**item)
+		except (TypeError, ValidationError) as exc :
+			inserter.reject(position, item.get("id") if isinstance(item, dict) else None, str(exc))
+			continue
+		if episode.show_id != show_id :
+			inserter.reject(position, episode.id, "show_id does not match the show in the URL")
+			continue
+		await inserter.add(position, episode.dict())
+	
+	result = await inserter.finish()
+	if result["inserted"] :
+		await catalog_cache.invalidate_episodes(show_id)
+		await bump_versions(episodes_key(show_id))
+		await adjust_total(show_id, result["inserted"])
+	return {"Message" : "Bulk ingest finished", **result}
+
+
 # Endpoint to get a list of episodes for a specific show.
 # Only works if the show exists and is of type "Series".
+# Paginated like GET /episodes, and also supports ?stream=true. The first page comes from the catalog cache,
+# later pages (?after=) and larger ones are read with a keyset query, so memory does not grow with the show.
 @router.get("/shows/{show_id}/episodes")
-def get_list(show_id: str) :
-	if not shows_db.find_one({"id" : show_id}) :
-		return {"Error" : "Show not found"}
-	
-	show = shows_db.find_one({"id" : show_id})
+async def get_list(show_id: str, request: Request, after: str = AfterQuery, limit: int = LimitQuery, stream: bool = StreamQuery, fields: str = FieldsQuery) :
+	projection = parse_fields(fields, Episode)
+	conditional = await conditional_get(request, show_key(show_id), episodes_key(show_id))
+	if conditional.not_modified and not stream :
+		return conditional.not_modified
+	show = await catalog_cache.get_show(show_id, conditional.versions[show_key(show_id)])
 	if not show:
 		return {"Error" : "Show not found"}
 	if show["type"] != "Series" :
 		return {"Error" : "Not a series"}
 	
-	result = []
-	for ep in episodes_db.find({"show_id" : show_id}, {"_id" : 0}) :
-		result.append(ep)
+	if stream :
+		return stream_ndjson(episodes_db, {"show_id" : show_id}, after, limit, projection)
+	if after is None and (limit or DEFAULT_PAGE_SIZE) <= DEFAULT_PAGE_SIZE :
+		# Only the first page is cached; it holds DEFAULT_PAGE_SIZE + 1 episodes at most.
+		episodes = await catalog_cache.get_episodes(show_id, conditional.versions[episodes_key(show_id)])
+		result, next_cursor = page_from_list(episodes, after, limit)
+		result = [project(ep, projection) for ep in result]
+	else :
+		result, next_cursor = await fetch_page(episodes_db, {"show_id" : show_id}, after, limit, projection)
 	if result :
-		return {"Episodes" : result}
+		# If-None-Match: * only matches once the show is known to have episodes.
+		if conditional.not_modified_if_exists() :
+			return conditional.not_modified
+		response = json_response({"Episodes" : result})
+		set_next_cursor(response, next_cursor)
+		return conditional.apply(response)
 	
 	return {"Error" : "Episodes not found"}
 
 
 # Endpoint to update an episode's details.
-# Accepts an episode_id and an updated Episode object, updates the episode if found.
+# Accepts an episode_id and an updated Episode object, updates the episode if found (404 otherwise).
+# The id and show_id cannot change (422): watched records, progress and rollups refer to them.
+# A changed duration is applied to minutes_watched of everyone who watched the episode.
 @router.put("/episodes/{episode_id}")
-def update_episode(episode_id: str, updated: Episode) :
-	if episodes_db.find_one({"id" : episode_id}) :
-		episodes_db.update_one({"id" : episode_id}, {"$set" : {
-			"id" : updated.id,
-			"show_id" : updated.show_id,
-			"season_number" : updated.season_number,
-			"episode_number" : updated.episode_number,
-			"title" : updated.title,
-			"duration_minutes" : updated.duration_minutes
-		}})
-		return {"Message" : "Episode updated successfully"}
-	return {"Error" : "Episode not found"}
+async def update_episode(episode_id: str, updated: Episode) :
+	if updated.id != episode_id :
+		raise HTTPException(status_code=422, detail="An episode's id cannot be changed")
+	existing = await repository.update_episode(episode_id, updated.show_id, {
+		"season_number" : updated.season_number,
+		"episode_number" : updated.episode_number,
+		"title" : updated.title,
+		"duration_minutes" : updated.duration_minutes
+	})
+	await catalog_cache.invalidate_episodes(updated.show_id)
+	await bump_versions(episodes_key(updated.show_id))
+	await adjust_watched_minutes(episode_id, updated.duration_minutes - existing.get("duration_minutes", 0))
+	return {"Message" : "Episode updated successfully"}
 
 
 # Endpoint to delete an episode.
-# Accepts an episode_id, deletes the episode if found.
+# Accepts an episode_id, deletes the episode if found (404 otherwise).
+# Its watched records are removed and the watchers' progress counters go down accordingly.
 @router.delete("/episodes/{episode_id}")
-def delete_episode(episode_id: str) :
-	if episodes_db.find_one({"id" : episode_id}) :
-		episodes_db.delete_one({"id" : episode_id})
-		return {"Message" : "Episode deleted successfully"}
-	return {"Error" : "Episode not found"}
+async def delete_episode(episode_id: str) :
+	existing = await repository.delete_episode(episode_id)
+	await catalog_cache.invalidate_episodes(existing["show_id"])
+	await bump_versions(episodes_key(existing["show_id"]))
+	await adjust_total(existing["show_id"], -1)
+	await remove_watched_episode(existing)
+	return {"Message" : "Episode deleted successfully"}
@@ -0,0 +1,130 @@
+"""
+events.py
+
+This file defines the server-sent events (SSE) endpoint of the Tracker API application.
+
+How it works:
+- Uses FastAPI's APIRouter for the endpoint.
+- `GET /events/{user_id}` keeps the connection open and sends the user's change events (see events.py in the
+  project folder) as they happen, in the `text/event-stream` format browsers read with EventSource.
+- Each message carries `id:`, `event:` (the event type) and `data:` (JSON). After a reconnect the client's
+  Last-Event-ID header (or `?last_event_id=`) makes the stream replay the events it missed first.
+- A comment line is sent every EVENTS_KEEPALIVE seconds, so proxies do not close an idle connection.
+- `POST /events/{user_id}/ticket` (with the usual Authorization header) returns a stream ticket: a random string
+  that opens the stream once, within EVENTS_TICKET_SECONDS. Tickets are stored in stream_tickets_db (only their
+  SHA-256 digest), so any worker can redeem them, and a TTL index removes unused ones.
+
+Key Concepts:
+- Only the user themself can open their stream. The token can be sent in the Authorization header or, for
+  EventSource (which cannot set headers), replaced by `?ticket=`. The JWT itself is never put in the URL, where it
+  would end up in access logs and browser history; a logged ticket is already used or about to expire.
+- A ticket opens one connection. When EventSource reports an error, the client fetches a new ticket and opens a
+  new EventSource, passing the last event id it saw as `?last_event_id=`.
+- A "reset" event means the missed events could not be replayed: the client should re-fetch its watchlist and
+  watched episodes once, then keep listening.
+
+Other modules can import this router to include the events endpoint in the main FastAPI app.
+"""
+
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+
+from auth import get_logged_in_user
+from database import stream_tickets_db
+from events import event_broker
+
+# Seconds between keepalive comments on an idle stream.
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", 15))
+# Milliseconds the browser waits before reconnecting.
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", 3000))
+# Seconds a stream ticket can be used for.
+EVENTS_TICKET_SECONDS = int(os.getenv("EVENTS_TICKET_SECONDS", 30))
+
+# Like auth.token_extractor, but lets a stream ticket in the query string stand in for the header.
+optional_token = OAuth2PasswordBearer(tokenUrl="/users/login", auto_error=False)
+
+# Creating a router for the events endpoint.
+router = APIRouter()
+
+
+# Formats one event in the SSE wire format.
+def format_event(event):
+    lines = []
+    if event["id"] is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append("data: " + orjson.dumps(event["data"]).decode())
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+def _ticket_digest(ticket):
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+# Returns the user a ticket was issued to and deletes it, or None if it is unknown, used or expired.
+async def redeem_ticket(ticket):
+    document = await stream_tickets_db.find_one_and_delete(
+        {"_id": _ticket_digest(ticket), "expires_at": {"$gt": datetime.utcnow()}}
+    )
+    return document["user_id"] if document else None
+
+
+# Endpoint to get a single-use ticket for opening the user's event stream without a header.
+@router.post("/events/{user_id}/ticket")
+async def create_stream_ticket(user_id: str, logged_in_user: str = Depends(get_logged_in_user)):
+    if logged_in_user != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed to read another user's events")
+    ticket = secrets.token_urlsafe(32)
+    await stream_tickets_db.insert_one({
+        "_id": _ticket_digest(ticket),
+        "user_id": user_id,
+        "expires_at": datetime.utcnow() + timedelta(seconds=EVENTS_TICKET_SECONDS),
+    })
+    return {"ticket": ticket, "expires_in": EVENTS_TICKET_SECONDS}
+
+
+# Endpoint to receive a user's watchlist, watched and progress changes as server-sent events.
+# Accepts Last-Event-ID (header or query) to resume after a reconnect.
+@router.get("/events/{user_id}")
+async def stream_events(
+    user_id: str,
+    request: Request,
+    ticket: str = Query(None),
+    last_event_id: str = Query(None),
+    last_event_id_header: str = Header(None, alias="Last-Event-ID"),
+    header_token: str = Depends(optional_token),
+):
+    if header_token:
+        stream_user = await get_logged_in_user(header_token)
+    elif ticket:
+        stream_user = await redeem_ticket(ticket)
+        if stream_user is None:
+            raise HTTPException(status_code=401, detail="Ticket is invalid, used or expired")
+    else:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if stream_user != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed to read another user's events")
+
+    subscription = await event_broker.subscribe(user_id, last_event_id_header or last_event_id)
+
+    async def messages():
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n".encode()
+            while not await request.is_disconnected():
+                event = await subscription.next(EVENTS_KEEPALIVE)
+                yield b": keepalive\n\n" if event is None else format_event(event)
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        messages(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
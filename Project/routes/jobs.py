@@ -0,0 +1,32 @@
+"""
+jobs.py
+
+This file defines the background job endpoint of the Tracker API application.
+
+How it works:
+- Uses FastAPI's APIRouter for the endpoint.
+- `GET /jobs/{job_id}` returns a job enqueued by another endpoint (for example the cascading delete started by
+  DELETE /shows/{show_id}), see jobs.py in the project folder.
+
+Key Concepts:
+- `status` is "queued", "running", "done" or "failed"; `progress` counts the documents handled so far and
+  `error` holds the last failure message.
+
+Other modules can import this router to include the job endpoint in the main FastAPI app.
+"""
+
+from fastapi import APIRouter, HTTPException
+
+from jobs import job_queue
+
+# Creating a router for the job endpoint.
+router = APIRouter()
+
+
+# Endpoint to get the status and progress of a background job.
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -8,6 +8,15 @@ How it works:
 - Imports the shows_db collection from the database module to interact with show data in MongoDB.
 - Imports the Show model from the models module to validate and structure show data.
 - Provides endpoints for adding new shows, listing all shows, and retrieving details for a specific show.
+- Single shows are read through the catalog cache, and every write invalidates it (see cache.py).
+- Provides relevance-ranked search with facet counts and filters (see search.py); writes keep the search index in sync.
+- Read endpoints return database documents directly with orjson and accept `?fields=` to read and send only
+  some fields (see responses.py).
+- GET responses carry an ETag and Cache-Control; If-None-Match gets a 304 without reading any shows. Every write
+  bumps the version counters the ETags are built from (see etags.py).
+- Lists are paginated with a keyset cursor (`?after=&limit=`) or streamed as NDJSON (`?stream=true`), see pagination.py.
+- Similar shows ("users who added this also added") are read from a precomputed table (see recommendations.py).
+- Deleting a show enqueues a background job that removes its episodes and watchlist data (see cascade.py).
 
 Key Concepts:
 - Endpoints use Pydantic models to validate incoming data and structure responses.
@@ -17,51 +26,129 @@ Key Concepts:
 Other modules can import this router to include show-related endpoints in the main FastAPI app.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from pymongo.errors import DuplicateKeyError
+from cache import catalog_cache
+from cascade import DELETE_SHOW_JOB
 from database import shows_db
+from etags import SHOWS_KEY, bump_versions, conditional_get, episodes_key, show_key
+from jobs import job_queue
 from models import Show
+from repository import insert_unique
+from recommendations import RECOMMENDATIONS_TOP_K, get_similar
+from pagination import AfterQuery, LimitQuery, StreamQuery, fetch_page, set_next_cursor, stream_ndjson
+from responses import FieldsQuery, json_response, parse_fields, project
+from search import filter_query, search_index, search_shows
 
 # Creating a router for show-related endpoints.
 router = APIRouter()
 
 # Endpoint to add a new show.
 # Accepts a Show object, stores it in the database, and returns a success message.
+# Returns 409 if a show with the same ID already exists.
 @router.post("/shows/add")
-def add_show(show: Show):
-    shows_db.insert_one(show.dict())
+async def add_show(show: Show):
+    await insert_unique(shows_db, show.dict(), "Show already exists")
+    await catalog_cache.invalidate_show(show.id)
+    await bump_versions(SHOWS_KEY, show_key(show.id))
+    search_index.on_upsert(show.dict())
     return {"message": "Show added successfully"}
 
 # Endpoint to list all shows.
-# Retrieves all shows from the database and returns them as a list.
+# Returns one page of shows ordered by id; the cursor for the next page is sent in the X-Next-Cursor header.
+# With ?stream=true every show is streamed as NDJSON instead.
 @router.get("/shows")
-def list_shows():
-    shows = list(shows_db.find({}, {"_id": 0}))
-    return {"shows": shows}
+async def list_shows(request: Request, after: str = AfterQuery, limit: int = LimitQuery, stream: bool = StreamQuery, fields: str = FieldsQuery):
+    projection = parse_fields(fields, Show)
+    if stream:
+        return stream_ndjson(shows_db, {}, after, limit, projection)
+    conditional = await conditional_get(request, SHOWS_KEY)
+    # The show list always exists, so If-None-Match: * matches it too.
+    if conditional.not_modified_if_exists():
+        return conditional.not_modified
+    shows, next_cursor = await fetch_page(shows_db, {}, after, limit, projection)
+    response = json_response({"shows": shows})
+    set_next_cursor(response, next_cursor)
+    return conditional.apply(response)
+
+# Endpoint to search shows by title and description.
+# Results are ranked by relevance and can be filtered by genre, type and release year range.
+# Also returns how many matching shows there are per genre, type and release year (facets).
+# Without q there is nothing to rank: the filtered catalog is paged by id (keyset cursor in X-Next-Cursor, `after`)
+# with no total or facets, instead of counting and faceting every show on each request. `skip` only applies to
+# ranked results, so skip > 0 without q returns 422 rather than the first page again; `total` is null in this mode.
+# Declared before /shows/{show_id} so "search" is not taken as a show ID.
+@router.get("/shows/search")
+async def search(
+    q: str = "",
+    genre: str = None,
+    type: str = None,
+    year_from: int = None,
+    year_to: int = None,
+    limit: int = Query(20, ge=1, le=100),
+    skip: int = Query(0, ge=0, le=10000),
+    after: str = AfterQuery,
+):
+    if not q.strip():
+        if skip:
+            raise HTTPException(status_code=422, detail="skip requires q; page with the X-Next-Cursor value in after")
+        shows, next_cursor = await fetch_page(shows_db, filter_query(genre, type, year_from, year_to), after, limit)
+        response = json_response({"total": None, "results": shows, "facets": {}})
+        set_next_cursor(response, next_cursor)
+        return response
+    return json_response(await search_shows(q, genre, type, year_from, year_to, limit, skip))
 
 # Endpoint to get details of a specific show by its ID.
 # Returns show details if found, otherwise raises an error.
 @router.get("/shows/{show_id}")
-def get_show(show_id: str):
-    show = shows_db.find_one({"id": show_id}, {"_id": 0})
+async def get_show(show_id: str, request: Request, fields: str = FieldsQuery):
+    projection = parse_fields(fields, Show)
+    conditional = await conditional_get(request, show_key(show_id))
+    if conditional.not_modified:
+        return conditional.not_modified
+    show = await catalog_cache.get_show(show_id, conditional.versions[show_key(show_id)])
     if show:
-        return show
+        if conditional.not_modified_if_exists():
+            return conditional.not_modified
+        return conditional.apply(json_response(project(show, projection)))
     raise HTTPException(status_code=404, detail="Show not found")
 
+# Endpoint to get shows similar to a show, based on which shows users add to their watchlists together.
+# Returns show IDs with a similarity score (0-1), most similar first, from the precomputed table in one read.
+@router.get("/shows/{show_id}/similar")
+async def get_similar_shows(show_id: str, limit: int = Query(10, ge=1, le=RECOMMENDATIONS_TOP_K)):
+    return json_response({"show_id": show_id, "similar": await get_similar(show_id, limit)})
+
 # Endpoint to update an existing show's details.
 # Accepts a show ID and a Show object with updated data.
 # Returns a success message if the show is updated, otherwise raises an error.
+# Returns 409 if the new ID belongs to another show.
 @router.put("/shows/{show_id}")
-def update_show(show_id: str, updated_show: Show):
-    result = shows_db.update_one({"id": show_id}, {"$set": updated_show.dict()})
+async def update_show(show_id: str, updated_show: Show):
+    try:
+        result = await shows_db.update_one({"id": show_id}, {"$set": updated_show.dict()})
+    except DuplicateKeyError as exc:
+        raise HTTPException(status_code=409, detail="Show already exists") from exc
+    await catalog_cache.invalidate_show(show_id, updated_show.id)
+    await bump_versions(SHOWS_KEY, show_key(show_id), show_key(updated_show.id))
+    if result.matched_count:
+        search_index.on_delete(show_id)
+        search_index.on_upsert(updated_show.dict())
     if result.modified_count:
         return {"message": "Show updated successfully"}
     raise HTTPException(status_code=404, detail="Show not found")
 
 # Endpoint to delete a show by its ID.
-# Removes the show from the database and returns a success message.
+# Removes the show from the database right away and returns the id of the background job that removes its
+# episodes, watchlist entries and watched records (see cascade.py); poll GET /jobs/{job_id} for its progress.
 @router.delete("/shows/{show_id}")
-def delete_show(show_id: str):
-    result = shows_db.delete_one({"id": show_id})
+async def delete_show(show_id: str):
+    result = await shows_db.delete_one({"id": show_id})
+    await catalog_cache.invalidate_show(show_id)
+    await catalog_cache.invalidate_episodes(show_id)
+    await bump_versions(SHOWS_KEY, show_key(show_id), episodes_key(show_id))
+    search_index.on_delete(show_id)
     if result.deleted_count:
-        return {"message": "Show deleted successfully"}
+        job = await job_queue.enqueue(DELETE_SHOW_JOB, {"show_id": show_id})
+        return {"message": "Show deleted successfully", "job_id": job["id"]}
     raise HTTPException(status_code=404, detail="Show not found")
@@ -13,6 +13,7 @@ How it works:
 Key Concepts:
 - Registration endpoint hashes the user's password before storing it and returns a JWT token upon success.
 - Login endpoint checks the username and password, and returns a JWT token if credentials are valid.
+  If the stored hash uses an outdated bcrypt cost it is transparently re-hashed.
 - Authentication endpoint verifies user credentials and returns a verification message.
 - All sensitive operations use hashed passwords and JWT tokens for security.
 
@@ -21,23 +22,34 @@ Other modules can import this router to include user-related endpoints in the ma
 
 from fastapi import APIRouter, Form, HTTPException
 
-from auth import hash_password, verify_password, create_token
+from auth import hash_password, verify_and_update_password, create_token
 from database import users_db
 from models import User
+from repository import insert_unique
 
 # Creating a router for user-related endpoints.
 router = APIRouter()
 
+# Verifies a password against the stored user document.
+# If the stored hash was made with an outdated bcrypt cost, it is replaced with a fresh hash.
+async def check_password(db_user, password):
+    valid, new_hash = await verify_and_update_password(password, db_user["password"])
+    if valid and new_hash:
+        await users_db.update_one({"id": db_user["id"]}, {"$set": {"password": new_hash}})
+    return valid
+
 # Endpoint for user registration.
 # Accepts a User object, hashes the password, stores the user in the database, and returns a JWT token.
+# Returns 409 if the username or user ID is already taken.
 @router.post("/users/register")
-def register(user: User):
-    users_db.insert_one({
+async def register(user: User):
+    hashed = await hash_password(user.password)
+    await insert_unique(users_db, {
         "id": user.id,
         "username": user.username,
         "email": user.email,
-        "password": hash_password(user.password)
-    })
+        "password": hashed
+    }, "Username or user ID already registered")
     # Added nosec here as it was being flagged by Bandit as a False Positive
     token = create_token({"sub": user.id})# nosec
     return {"message": "Registered", "access_token": token}# nosec
@@ -45,9 +57,9 @@ def register(user: User):
 # Endpoint for user login.
 # Accepts username and password as form data, verifies credentials, and returns a JWT token if valid.
 @router.post("/users/login")
-def login(username: str = Form(...), password: str = Form(...)):
-    user = users_db.find_one({"username": username})
-    if user and verify_password(password, user["password"]):
+async def login(username: str = Form(...), password: str = Form(...)):
+    user = await users_db.find_one({"username": username})
+    if user and await check_password(user, password):
         token = create_token({"sub": user["id"]})
         return {"access_token": token, "token_type": "bearer"}
     raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -55,8 +67,8 @@ def login(username: str = Form(...), password: str = Form(...)):
 # Endpoint for user authentication (verification).
 # Accepts a User object, verifies credentials, and returns a verification message.
 @router.post("/users/authenticate")
-def authenticate(user: User):
-    db_user = users_db.find_one({"username": user.username})
-    if db_user and verify_password(user.password, db_user["password"]):
+async def authenticate(user: User):
+    db_user = await users_db.find_one({"username": user.username})
+    if db_user and await check_password(db_user, user.password):
         return {"Message": "User Verified"}
     return {"Error": "User Not Verified"}
@@ -5,10 +5,11 @@ This file defines the API endpoints related to tracking watched episodes for the
 
 How it works:
 - Uses FastAPI's APIRouter to group all watched-episode-related endpoints together.
-- Imports the watched_episodes_db and watchlist_db collections from the database module to interact with watched episode and watchlist data in MongoDB.
+- Imports the watched_episodes_db and episodes_db collections from the database module to interact with watched episode and episode data in MongoDB.
 - Imports the WatchedEpisode model from the models module to validate and structure watched episode data.
 - Uses authentication to ensure users can only modify their own watched episodes.
 - Provides endpoints for marking episodes as watched, listing all watched episodes for a user, and removing watched records.
+- Provides a batch endpoint that marks a whole season, an episode range, or a list of episodes as watched in one call.
 
 Key Concepts:
 - Endpoints use Pydantic models to validate incoming data and structure responses.
@@ -16,15 +17,39 @@ Key Concepts:
 - Endpoints are grouped using a router for better organization and modularity.
 - Only authenticated users can add or remove watched episodes from their own watchlist.
 - Allows users to track which episodes they have watched and manage their watched history.
+- Watched records store the owner's user_id, so a user's history can be listed with one indexed query.
+- Every add/remove also updates the watchlist entry's progress counters (see progress.py).
+- Ownership checks and deletes go through repository.py and return 404 when the watchlist entry or record
+  is missing or belongs to another user.
+- The list endpoint returns database documents directly with orjson (see responses.py).
+- An episode is recorded at most once per watchlist entry (unique index on watchlist_id + episode_id): adding it
+  again returns 409, and batch marking uses upserts on that key, so retrying a batch never creates duplicates.
+  Only a duplicate on that key counts as "already watched"; an episode whose batch id "<watchlist_id>:<episode_id>"
+  is already used by another record is stored under a random id instead.
+- Every add/remove also updates the user's day/week/month/year rollups (see rollups.py), which the stats
+  endpoint reads instead of the full history.
+- Every add/remove publishes change events (the records and the entry's new progress) to the user's event stream
+  (see events.py), so other devices do not need to poll.
 
 Other modules can import this router to include watched-episode-related endpoints in the main FastAPI app.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+import time
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 from auth import get_logged_in_user
-from database import watchlist_db, watched_episodes_db
-from models import WatchedEpisode
+from bulk import DUPLICATE_KEY
+from database import episodes_db, watched_episodes_db
+from events import publish, publish_progress
+from models import WatchedBatch, WatchedEpisode
+from progress import record_unwatched, record_watched
+from responses import json_response
+from rollups import buckets_for, read_stats, record_unwatched_rollups, record_watched_rollups
+import repository
 
 # Creating a router for watched-episode-related endpoints.
 router = APIRouter()
@@ -32,31 +57,158 @@ router = APIRouter()
 
 # Endpoint to mark an episode as watched.
 # Accepts a WatchedEpisode object and stores it in the database.
-# Only allows if the user owns the watchlist.
+# Only allows if the user owns the watchlist. Returns 404 if the episode is not part of the watchlist entry's show
+# and 409 if the record id exists or the episode is already watched.
 @router.post("/watched/add")
-def add_watched_episode(watched: WatchedEpisode, user_id: str = Depends(get_logged_in_user)):
-    if not watchlist_db.find_one({"id": watched.watchlist_id, "user_id": user_id}):
-        return {"Error": "Unauthorized access to watchlist"}
-    watched_episodes_db.insert_one(watched.dict())
+async def add_watched_episode(watched: WatchedEpisode, user_id: str = Depends(get_logged_in_user)):
+    watchlist = await repository.get_owned_watchlist(watched.watchlist_id, user_id)
+    # The episode must belong to the entry's show, otherwise progress and genre counts would go to the wrong show.
+    episode = await episodes_db.find_one(
+        {"id": watched.episode_id, "show_id": watchlist["show_id"]}, {"_id": 0, "duration_minutes": 1}
+    )
+    if episode is None:
+        raise HTTPException(status_code=404, detail="Episode not found")
+    await repository.insert_unique(watched_episodes_db, {**watched.dict(), "user_id": user_id}, "Watched Episode already exists or episode already watched")
+    await record_watched(watchlist, [episode], watched.watched_at)
+    await record_watched_rollups(watchlist, [episode], watched.watched_at)
+    await publish(user_id, "watched.added", {"watchlist_id": watched.watchlist_id, "records": [watched.dict()]})
+    await publish_progress(user_id, watched.watchlist_id)
     return {"Message": "Added to Watched Episodes of User successfully"}
 
 
+# Key of the unique index that allows one watched record per episode and watchlist entry.
+WATCHED_EPISODE_KEY = {"watchlist_id": 1, "episode_id": 1}
+
+
+def _batch_id(watchlist_id, episode_id):
+    return f"{watchlist_id}:{episode_id}"
+
+
+# True if a bulk write error means the episode is already watched in this entry (and not e.g. an id clash).
+def _already_watched(error):
+    return error.get("code") == DUPLICATE_KEY and (
+        error.get("keyPattern") == WATCHED_EPISODE_KEY or "index: watchlist_episode" in error.get("errmsg", "")
+    )
+
+
+# Upserts one watched record per episode in one unordered bulk_write; existing records are left alone, so retries
+# are harmless. Returns (records created, episodes whose record id was already taken by another record).
+# With retry=False an id clash is raised instead of returned.
+async def _upsert_watched(watchlist_id, episodes, watched_at, user_id, record_id, retry=True):
+    records = [
+        {"id": record_id(watchlist_id, episode["id"]), "watchlist_id": watchlist_id, "episode_id": episode["id"],
+         "watched_at": watched_at}
+        for episode in episodes
+    ]
+    operations = [
+        UpdateOne(
+            {"watchlist_id": watchlist_id, "episode_id": record["episode_id"]},
+            {"$setOnInsert": {**record, "user_id": user_id}},
+            upsert=True,
+        )
+        for record in records
+    ]
+    clashes = []
+    try:
+        result = await watched_episodes_db.bulk_write(operations, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as exc:
+        # Records a concurrent request inserted first are already watched; any other error is not.
+        for error in exc.details.get("writeErrors", []):
+            if _already_watched(error):
+                continue
+            if error.get("code") != DUPLICATE_KEY or not retry:
+                raise
+            clashes.append(episodes[error["index"]])
+        upserted = {item["index"]: item["_id"] for item in exc.details.get("upserted", [])}
+    # upserted is keyed by operation index, which is also the index into `records`.
+    return [records[index] for index in sorted(upserted)], clashes
+
+
+# Endpoint to mark many episodes as watched in one call.
+# Accepts a WatchedBatch: a season (optionally from_episode..to_episode of it) or an explicit list of episode_ids.
+# Checks ownership once, resolves the episodes in one query and writes them in one idempotent bulk_write.
+@router.post("/watched/batch")
+async def add_watched_batch(batch: WatchedBatch, user_id: str = Depends(get_logged_in_user)):
+    watchlist = await repository.get_owned_watchlist(batch.watchlist_id, user_id)
+
+    query = {"show_id": watchlist["show_id"]}
+    if batch.episode_ids:
+        query["id"] = {"$in": batch.episode_ids}
+    elif batch.season_number is not None:
+        query["season_number"] = batch.season_number
+        episode_range = {}
+        if batch.from_episode is not None:
+            episode_range["$gte"] = batch.from_episode
+        if batch.to_episode is not None:
+            episode_range["$lte"] = batch.to_episode
+        if episode_range:
+            query["episode_number"] = episode_range
+    else:
+        raise HTTPException(status_code=422, detail="Provide season_number or episode_ids")
+
+    episodes = await episodes_db.find(query, {"_id": 0, "id": 1, "duration_minutes": 1}).to_list(None)
+    if not episodes:
+        raise HTTPException(status_code=404, detail="No matching episodes")
+
+    records, clashes = await _upsert_watched(batch.watchlist_id, episodes, batch.watched_at, user_id, _batch_id)
+    if clashes:
+        # Another record already uses the batch id "<watchlist_id>:<episode_id>" (ids sent to /watched/add are
+        # chosen by the client): record these episodes under random ids instead of dropping them.
+        retried, _ = await _upsert_watched(
+            batch.watchlist_id, clashes, batch.watched_at, user_id, lambda *_: uuid.uuid4().hex, retry=False
+        )
+        records += retried
+    watched_ids = {record["episode_id"] for record in records}
+    added = [episode for episode in episodes if episode["id"] in watched_ids]
+    await record_watched(watchlist, added, batch.watched_at)
+    await record_watched_rollups(watchlist, added, batch.watched_at)
+    if added:
+        await publish(user_id, "watched.added", {"watchlist_id": batch.watchlist_id, "records": records})
+        await publish_progress(user_id, batch.watchlist_id)
+    return {
+        "Message": "Episodes marked as watched",
+        "matched": len(episodes),
+        "added": len(added),
+        "already_watched": len(episodes) - len(added),
+    }
+
+
 # Endpoint to list all watched episodes for a specific user.
 # Returns a list of watched episodes for the given user_id.
 @router.get("/watched/{user_id}")
-def list_watched_episodes(user_id: str):
-    watched = list(watched_episodes_db.find({"user_id": user_id}, {"_id": 0}))
-    return {"watched_episodes": watched}
+async def list_watched_episodes(user_id: str):
+    watched = await watched_episodes_db.find({"user_id": user_id}, {"_id": 0}).to_list(None)
+    return json_response({"watched_episodes": watched})
+
+
+# Endpoint to read a user's watch statistics for one day, week, month or year.
+# Returns episodes, minutes and top genres for the bucket plus a breakdown (a year by month, a month or week by day).
+# bucket defaults to the current one, e.g. period=year gives "this year in review".
+@router.get("/watched/{user_id}/stats")
+async def get_watch_stats(
+    user_id: str,
+    period: str = Query("year", pattern="^(day|week|month|year)$"),
+    bucket: str = Query(None, description="e.g. 2026, 2026-10, 2026-W42 or 2026-10-17"),
+):
+    if bucket is None:
+        bucket = buckets_for(time.time())[period]
+    try:
+        stats = await read_stats(user_id, period, bucket)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid {period} bucket: {bucket}") from exc
+    return json_response(stats)
 
 
 # Endpoint to remove a watched episode record.
 # Accepts a watched episode ID and deletes the record if found.
 # Only allows if the user owns the watchlist.
 @router.delete("/watched/{watched_id}/{watchlist_id}")
-def remove_watched_episode(watched_id: str, watchlist_id: str, user_id: str = Depends(get_logged_in_user)):
-    if not watchlist_db.find_one({"id": watchlist_id, "user_id": user_id}):
-        return {"Error": "Unauthorized access to watchlist"}
-    result = watched_episodes_db.delete_one({"id": watched_id})
-    if result.deleted_count == 1:
-        return {"message": "Watched episode removed"}
-    raise HTTPException(status_code=404, detail="Watched Episode not found")
+async def remove_watched_episode(watched_id: str, watchlist_id: str, user_id: str = Depends(get_logged_in_user)):
+    removed = await repository.delete_watched_episode(watched_id, watchlist_id, user_id)
+    episode = await episodes_db.find_one({"id": removed["episode_id"]}, {"_id": 0, "show_id": 1, "duration_minutes": 1})
+    await record_unwatched(removed["watchlist_id"], episode)
+    await record_unwatched_rollups(user_id, removed, episode)
+    await publish(user_id, "watched.removed", {"id": watched_id, "watchlist_id": watchlist_id})
+    await publish_progress(user_id, watchlist_id)
+    return {"message": "Watched episode removed"}
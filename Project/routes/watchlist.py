@@ -15,16 +15,30 @@ Key Concepts:
 - All watchlist data is stored and retrieved from the MongoDB collection.
 - Endpoints are grouped using a router for better organization and modularity.
 - Only authenticated users can add, update, or remove shows from their own watchlist.
+- Writes go through repository.py: ownership is part of each single write, a missing or foreign entry returns 404
+  and adding an entry whose id already exists returns 409.
 - Allows users to track which shows they want to watch and manage their watchlist.
+- The dashboard endpoint returns watchlist entries already joined with their show's metadata.
+- The up-next endpoint finds the next unwatched episode of every show a user is watching with a single aggregation.
+- Read endpoints return database documents directly with orjson (see responses.py).
+- Every entry has a progress document (episodes/minutes watched) that is created and removed with it (see progress.py).
+- Adding, editing or removing an entry updates the similar-shows table in a background task after the response is
+  sent (see recommendations.py).
+- Every write publishes a change event to the user's event stream (see events.py).
 
 Other modules can import this router to include watchlist-related endpoints in the main FastAPI app.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
 
 from auth import get_logged_in_user
-from database import watchlist_db
+from database import episodes_db, shows_db, watchlist_db, watched_episodes_db, watch_progress_db
+from events import publish, publish_progress
 from models import Watchlist
+from progress import drop_progress, init_progress, rebuild
+from recommendations import on_entry_added, on_entry_changed, on_entry_removed
+from responses import json_response
+import repository
 
 # Creating a router for watchlist-related endpoints.
 router = APIRouter()
@@ -33,35 +47,110 @@ router = APIRouter()
 # Accepts a Watchlist object and stores it in the database.
 # Only allows if the user is authenticated.
 @router.post("/watchlist/add")
-def add_to_watchlist(watchlist: Watchlist, user_id: str = Depends(get_logged_in_user)):
-    if watchlist_db.find_one({"id": watchlist.id, "user_id": user_id}):
-        return {"Error": "Show already in watchlist"}
-    watchlist_db.insert_one({**watchlist.dict(), "user_id": user_id})
+async def add_to_watchlist(watchlist: Watchlist, background_tasks: BackgroundTasks, user_id: str = Depends(get_logged_in_user)):
+    entry = {**watchlist.dict(), "user_id": user_id}
+    await repository.add_watchlist_entry(entry)
+    await init_progress(entry)
+    background_tasks.add_task(on_entry_added, entry)
+    await publish(user_id, "watchlist.added", entry)
     return {"Message": "Show added to watchlist"}
 
 # Endpoint to list all watchlist items for a specific user.
 # Returns a list of watchlist entries for the given user_id.
 @router.get("/watchlist/{user_id}")
-def list_watchlist(user_id: str):
-    items = list(watchlist_db.find({"user_id": user_id}, {"_id": 0}))
-    return {"watchlist": items}
+async def list_watchlist(user_id: str):
+    items = await watchlist_db.find({"user_id": user_id}, {"_id": 0}).to_list(None)
+    return json_response({"watchlist": items})
+
+# Endpoint to get progress for every show in a user's watchlist.
+# Returns episodes watched, total episodes, minutes watched and last watched time per watchlist entry.
+@router.get("/watchlist/{user_id}/progress")
+async def get_progress(user_id: str):
+    progress = await watch_progress_db.find({"user_id": user_id}, {"_id": 0}).to_list(None)
+    return json_response({"progress": progress})
+
+# Endpoint to get a user's watchlist joined with show details (title, genre, type, release_year).
+# Optionally filtered by status, and sorted by rating (highest first unless order=asc).
+# Ties are ordered by id, and order=asc is the exact reverse, so both directions read the same index.
+@router.get("/watchlist/{user_id}/dashboard")
+async def get_dashboard(user_id: str, status: str = None, order: str = Query("desc", pattern="^(asc|desc)$")):
+    query = {"user_id": user_id}
+    if status is not None:
+        query["status"] = status
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"rating": -1, "id": 1} if order == "desc" else {"rating": 1, "id": -1}},
+        {"$lookup": {
+            "from": shows_db.name,
+            "localField": "show_id",
+            "foreignField": "id",
+            "pipeline": [{"$project": {"_id": 0, "title": 1, "genre": 1, "type": 1, "release_year": 1}}],
+            "as": "show",
+        }},
+        {"$project": {"_id": 0, "show": {"$ifNull": [{"$first": "$show"}, None]},
+                      "id": 1, "user_id": 1, "show_id": 1, "status": 1, "rating": 1, "notes": 1}},
+    ]
+    entries = await (await watchlist_db.aggregate(pipeline)).to_list(None)
+    return json_response({"dashboard": entries})
+
+# Endpoint to get the next episode to watch for every show a user is currently watching.
+# Runs one aggregation: watchlist entries -> their watched episodes -> the first unwatched episode
+# of each show by season and episode number. next_episode is null when the user is caught up.
+@router.get("/watchlist/{user_id}/up-next")
+async def get_up_next(user_id: str, status: str = "watching"):
+    pipeline = [
+        {"$match": {"user_id": user_id, "status": status}},
+        {"$lookup": {
+            "from": watched_episodes_db.name,
+            "localField": "id",
+            "foreignField": "watchlist_id",
+            "pipeline": [{"$project": {"_id": 0, "episode_id": 1}}],
+            "as": "watched",
+        }},
+        {"$lookup": {
+            "from": episodes_db.name,
+            "localField": "show_id",
+            "foreignField": "show_id",
+            "let": {"watched_ids": "$watched.episode_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$not": {"$in": ["$id", "$$watched_ids"]}}}},
+                {"$sort": {"season_number": 1, "episode_number": 1}},
+                {"$limit": 1},
+                {"$project": {"_id": 0}},
+            ],
+            "as": "next_episode",
+        }},
+        {"$project": {
+            "_id": 0,
+            "watchlist_id": "$id",
+            "show_id": 1,
+            "status": 1,
+            "next_episode": {"$ifNull": [{"$first": "$next_episode"}, None]},
+        }},
+    ]
+    up_next = await (await watchlist_db.aggregate(pipeline)).to_list(None)
+    return json_response({"up_next": up_next})
 
 # Endpoint to update a watchlist entry.
 # Accepts a watchlist_id and an updated Watchlist object, updates the entry if found and owned by the user.
 @router.put("/watchlist/{watchlist_id}")
-def update_watchlist(watchlist_id: str, updated: Watchlist, user_id: str = Depends(get_logged_in_user)):
-    if not watchlist_db.find_one({"id": watchlist_id, "user_id": user_id}):
-        return {"Error": "Unauthorized access to watchlist"}
-    watchlist_db.update_one({"id": watchlist_id}, {"$set": updated.dict()})
+async def update_watchlist(watchlist_id: str, updated: Watchlist, background_tasks: BackgroundTasks, user_id: str = Depends(get_logged_in_user)):
+    existing = await repository.update_watchlist_entry(watchlist_id, user_id, updated.dict())
+    entry = {**updated.dict(), "id": watchlist_id, "user_id": user_id}
+    if updated.show_id != existing["show_id"]:
+        await rebuild({"id": watchlist_id})
+    background_tasks.add_task(on_entry_changed, existing, entry)
+    await publish(user_id, "watchlist.updated", entry)
+    if updated.show_id != existing["show_id"]:
+        await publish_progress(user_id, watchlist_id)
     return {"Message": "Watchlist entry updated"}
 
 # Endpoint to remove a show from the user's watchlist.
 # Accepts a watchlist_id and deletes the entry if found and owned by the user.
 @router.delete("/watchlist/{watchlist_id}")
-def remove_from_watchlist(watchlist_id: str, user_id: str = Depends(get_logged_in_user)):
-    if not watchlist_db.find_one({"id": watchlist_id, "user_id": user_id}):
-        return {"Error": "Unauthorized access to watchlist"}
-    result = watchlist_db.delete_one({"id": watchlist_id})
-    if result.deleted_count == 1:
-        return {"Message": "Show removed from watchlist"}
-    raise HTTPException(status_code=404, detail="Watchlist entry not found")
+async def remove_from_watchlist(watchlist_id: str, background_tasks: BackgroundTasks, user_id: str = Depends(get_logged_in_user)):
+    removed = await repository.delete_watchlist_entry(watchlist_id, user_id)
+    await drop_progress(watchlist_id)
+    background_tasks.add_task(on_entry_removed, removed)
+    await publish(user_id, "watchlist.removed", {"id": watchlist_id})
+    return {"Message": "Show removed from watchlist"}
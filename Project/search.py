@@ -0,0 +1,241 @@
+"""
+search.py
+
+This file provides full-text and faceted search over the show catalog of the Tracker API application.
+
+How it works:
+- `search_shows()` ranks shows by relevance of `q` to their title and description, applies the genre / type /
+  release-year filters, and returns one page of results plus facet counts (genre, type, release_year) for all matches.
+- With MongoDB, this is one aggregation that uses the text index on shows_db (title weighted 10x over description)
+  and a $facet stage for the counts.
+- Without a text index (or with SEARCH_BACKEND=memory), an in-process inverted index is used instead.
+  It is built from shows_db on first use, kept up to date by the write routes in shows.py, and rebuilt in the
+  background every SEARCH_INDEX_REFRESH seconds so writes made by other workers show up.
+
+Key Concepts:
+- SEARCH_BACKEND: "auto" (default: MongoDB, falling back to memory if the text index is missing), "mongo" or "memory".
+- Scores are comparable within one response only.
+- Very common words (the, and, of, ...) are ignored by both backends.
+
+Other modules can import `search_shows` and `search_index` to search the catalog or keep the fallback index in sync.
+"""
+
+import asyncio
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+
+from pymongo.errors import OperationFailure
+
+from database import shows_db
+
+# Which backend to use: "auto", "mongo" or "memory".
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto").lower()
+# Seconds after which the in-memory index is rebuilt in the background.
+SEARCH_INDEX_REFRESH = float(os.getenv("SEARCH_INDEX_REFRESH", 300))
+
+# How much more a word in the title counts than a word in the description.
+TITLE_WEIGHT = 10
+DESCRIPTION_WEIGHT = 1
+
+# MongoDB error code returned for a $text query when the collection has no text index.
+INDEX_NOT_FOUND = 27
+
+FACETS = ("genre", "type", "release_year")
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were will with".split()
+)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+# Splits text into lowercase words, dropping stop words.
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall((text or "").lower()) if token not in STOP_WORDS]
+
+
+# Builds the MongoDB filter for the facet filters.
+def filter_query(genre=None, show_type=None, year_from=None, year_to=None):
+    query = {}
+    if genre is not None:
+        query["genre"] = genre
+    if show_type is not None:
+        query["type"] = show_type
+    years = {}
+    if year_from is not None:
+        years["$gte"] = year_from
+    if year_to is not None:
+        years["$lte"] = year_to
+    if years:
+        query["release_year"] = years
+    return query
+
+
+# Turns {"value": count} into a list sorted by count (highest first).
+def facet_list(counts):
+    return [{"value": value, "count": count} for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))]
+
+
+# ___________________________________In-memory inverted index________________________
+
+# Inverted index over show titles and descriptions, used when MongoDB has no text index.
+class InvertedIndex:
+    def __init__(self):
+        self.shows = {}                       # show id -> show document (without _id)
+        self.postings = defaultdict(dict)     # word -> {show id: weighted term frequency}
+        self.built_at = None
+        self._lock = asyncio.Lock()
+        self._refreshing = False
+
+    # Adds or replaces one show.
+    def upsert(self, show):
+        self.remove(show["id"])
+        self.shows[show["id"]] = show
+        weights = Counter()
+        for token in tokenize(show.get("title")):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(show.get("description")):
+            weights[token] += DESCRIPTION_WEIGHT
+        for token, weight in weights.items():
+            self.postings[token][show["id"]] = weight
+
+    # Removes one show (no-op if it is not indexed).
+    def remove(self, show_id):
+        show = self.shows.pop(show_id, None)
+        if show is None:
+            return
+        for token in set(tokenize(show.get("title")) + tokenize(show.get("description"))):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(show_id, None)
+                if not posting:
+                    del self.postings[token]
+
+    # Loads every show from MongoDB into a fresh index and swaps it in.
+    async def build(self):
+        fresh = InvertedIndex()
+        async for show in shows_db.find({}, {"_id": 0}):
+            fresh.upsert(show)
+        self.shows, self.postings, self.built_at = fresh.shows, fresh.postings, time.monotonic()
+
+    # Builds the index on first use and schedules a background rebuild when it is older than SEARCH_INDEX_REFRESH.
+    async def ready(self):
+        if self.built_at is None:
+            async with self._lock:
+                if self.built_at is None:
+                    await self.build()
+        elif time.monotonic() - self.built_at > SEARCH_INDEX_REFRESH and not self._refreshing:
+            self._refreshing = True
+            asyncio.create_task(self._refresh())
+
+    async def _refresh(self):
+        try:
+            await self.build()
+        finally:
+            self._refreshing = False
+
+    # Write hooks used by shows.py. They only apply once the index has been built.
+    def on_upsert(self, show):
+        if self.built_at is not None:
+            self.upsert(show)
+
+    def on_delete(self, show_id):
+        if self.built_at is not None:
+            self.remove(show_id)
+
+    # Returns (total, results, facets) for a query.
+    def search(self, q, filters, limit, skip):
+        tokens = tokenize(q)
+        if tokens:
+            scores = Counter()
+            total_shows = len(self.shows) or 1
+            for token in set(tokens):
+                posting = self.postings.get(token, {})
+                if not posting:
+                    continue
+                idf = math.log(1 + total_shows / len(posting))
+                for show_id, weight in posting.items():
+                    scores[show_id] += weight * idf
+            candidates = scores.keys()
+        elif q and q.strip():
+            # Only stop words: nothing to match on.
+            scores, candidates = {}, ()
+        else:
+            scores, candidates = {}, self.shows.keys()
+
+        matches = [self.shows[show_id] for show_id in candidates if _matches(self.shows[show_id], filters)]
+        facets = {name: facet_list(Counter(show.get(name) for show in matches)) for name in FACETS}
+        if tokens:
+            matches.sort(key=lambda show: (-scores[show["id"]], show["id"]))
+        else:
+            matches.sort(key=lambda show: show["id"])
+        page = [
+            {**show, "score": round(scores[show["id"]], 4)} if tokens else show
+            for show in matches[skip:skip + limit]
+        ]
+        return len(matches), page, facets
+
+
+# Returns True if a show passes the facet filters built by filter_query().
+def _matches(show, filters):
+    for field, condition in filters.items():
+        value = show.get(field)
+        if isinstance(condition, dict):
+            if value is None:
+                return False
+            if "$gte" in condition and value < condition["$gte"]:
+                return False
+            if "$lte" in condition and value > condition["$lte"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+# The fallback index shared by all requests in this worker.
+search_index = InvertedIndex()
+
+
+# ___________________________________Search________________________
+
+# Runs the search with MongoDB's text index.
+async def _search_mongo(q, filters, limit, skip):
+    match = dict(filters)
+    tokens = tokenize(q)
+    if q and q.strip() and not tokens:
+        return 0, [], {name: [] for name in FACETS}
+    if tokens:
+        match["$text"] = {"$search": " ".join(tokens)}
+        ordering = [{"$sort": {"score": -1, "id": 1}}]
+    else:
+        ordering = [{"$sort": {"id": 1}}]
+
+    pipeline = [{"$match": match}]
+    if tokens:
+        pipeline.append({"$addFields": {"score": {"$meta": "textScore"}}})
+    pipeline.append({"$facet": {
+        "results": ordering + [{"$skip": skip}, {"$limit": limit}, {"$project": {"_id": 0}}],
+        "total": [{"$count": "count"}],
+        **{name: [{"$group": {"_id": f"${name}", "count": {"$sum": 1}}}] for name in FACETS},
+    }})
+    result = (await (await shows_db.aggregate(pipeline)).to_list(None))[0]
+    total = result["total"][0]["count"] if result["total"] else 0
+    facets = {name: facet_list({row["_id"]: row["count"] for row in result[name]}) for name in FACETS}
+    return total, result["results"], facets
+
+
+# Searches the catalog and returns {"total", "results", "facets"}.
+async def search_shows(q="", genre=None, show_type=None, year_from=None, year_to=None, limit=20, skip=0):
+    filters = filter_query(genre, show_type, year_from, year_to)
+    if SEARCH_BACKEND != "memory":
+        try:
+            total, results, facets = await _search_mongo(q, filters, limit, skip)
+            return {"total": total, "results": results, "facets": facets}
+        except OperationFailure as exc:
+            if exc.code != INDEX_NOT_FOUND or SEARCH_BACKEND == "mongo":
+                raise
+    await search_index.ready()
+    total, results, facets = search_index.search(q, filters, limit, skip)
+    return {"total": total, "results": results, "facets": facets}
@@ -0,0 +1,83 @@
+"""
+conftest.py
+
+Shared setup for the tests in this folder.
+
+How it works:
+- Makes the Project folder importable, so tests can import the app modules (pagination, search, rollups, ...).
+- The `fake_db` fixture replaces every MongoDB collection the project modules use with an in-memory one
+  (see fake_mongo.py), so no test needs a running MongoDB.
+- The `entry` fixture adds on top of it a series (show "s1", episodes "e1".."e3" of 30 minutes) and user "u1"'s
+  watchlist entry "wl" for it, through the routes.
+
+Run them from the Project folder with:
+    python -m pytest tests
+"""
+
+import asyncio
+import importlib
+import os
+import pkgutil
+import sys
+
+import pytest
+
+from fake_mongo import FakeDatabase
+
+# Make `import pagination`, `import search`, ... work when pytest is run from any folder.
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+
+# Swaps the collections (and the database object) that project modules imported from database.py for fakes,
+# with the indexes from indexes.py (so unique indexes are enforced).
+# The catalog cache and the ETag version counters are emptied too, so no state leaks between tests.
+@pytest.fixture
+def fake_db(monkeypatch):
+    import database
+    from cache import MemoryBackend, catalog_cache
+    import etags
+    from indexes import INDEXES
+
+    # Import every router (and so every module they use) first: a module imported later would keep the fake of
+    # whichever test imported it.
+    import routes
+    for info in pkgutil.iter_modules(routes.__path__):
+        importlib.import_module(f"routes.{info.name}")
+
+    fake = FakeDatabase()
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None) or ""
+        if not path.startswith(PROJECT_DIR) or os.sep + "tests" + os.sep in path:
+            continue
+        for name, value in list(vars(module).items()):
+            if isinstance(value, database.LazyCollection):
+                monkeypatch.setattr(module, name, fake[value.name])
+            elif isinstance(value, database.LazyDatabase):
+                monkeypatch.setattr(module, name, fake)
+    for collection, models in INDEXES:
+        asyncio.run(fake[collection.name].create_indexes(models))
+    catalog_cache.set_backend(MemoryBackend())
+    monkeypatch.setattr(etags, "_known_versions", type(etags._known_versions)())
+    return fake
+
+
+# A series with three 30-minute episodes in user "u1"'s watchlist (entry "wl").
+@pytest.fixture
+def entry(fake_db):
+    from fastapi import BackgroundTasks
+
+    from models import Episode, Show, Watchlist
+    from routes import episodes, shows, watchlist
+
+    show = {"id": "s1", "title": "Dark", "description": "", "genre": "Drama", "release_year": 2017, "type": "Series"}
+    asyncio.run(shows.add_show(Show(**show)))
+    for number in range(1, 4):
+        asyncio.run(episodes.add_episodes(Episode(
+            id=f"e{number}", show_id="s1", season_number=1, episode_number=number, title=f"Episode {number}",
+            duration_minutes=30,
+        ), "s1"))
+    entry = Watchlist(id="wl", user_id="u1", show_id="s1", status="watching", rating=0, notes="")
+    asyncio.run(watchlist.add_to_watchlist(entry, BackgroundTasks(), "u1"))
+    return fake_db
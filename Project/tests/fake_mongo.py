@@ -0,0 +1,572 @@
+"""
+fake_mongo.py
+
+An in-memory stand-in for the async MongoDB collections used by the Tracker API application, for tests.
+
+How it works:
+- `FakeDatabase` hands out `FakeCollection`s by name (`database["shows_db"]`). Collections keep their documents in
+  the database under their name, so two objects for the same name see the same data and `rename()` works the way
+  the recommendations rebuild expects.
+- `FakeCollection` implements the subset of PyMongo's async collection API the application uses: find / find_one,
+  the insert / update / replace / delete calls, find_one_and_update / find_one_and_delete, bulk_write, count_documents,
+  index management and a small aggregation pipeline ($match, $lookup, $set, $group, $sort, $limit).
+- Unique indexes are enforced: a write that breaks one raises DuplicateKeyError (or BulkWriteError from bulk_write)
+  with the index's keyPattern in its details, like a real server.
+- The `fake_db` fixture in conftest.py swaps every collection the project modules imported from database.py for a
+  fake one, for the duration of one test.
+
+Key Concepts:
+- Only the query, update and expression operators the application sends are supported; anything else raises
+  NotImplementedError so a test cannot pass by accident.
+"""
+
+import copy
+import itertools
+
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+_MISSING = object()
+_object_ids = itertools.count(1)
+
+
+class Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+# ___________________________________Documents________________________
+
+# Returns the values at a dotted path. Arrays along the way are searched element by element.
+def _values(document, path):
+    values = [document]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict) and part in value:
+                found.append(value[part])
+            elif isinstance(value, list):
+                found.extend(item[part] for item in value if isinstance(item, dict) and part in item)
+        values = found
+    return values
+
+
+def _get(document, path, default=None):
+    values = _values(document, path)
+    return values[0] if values else default
+
+
+def _set(document, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[last] = value
+
+
+def _unset(document, path):
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.get(part, {})
+    document.pop(last, None)
+
+
+def _compare(left, right, operator):
+    try:
+        return {"$gt": left > right, "$gte": left >= right, "$lt": left < right, "$lte": left <= right}[operator]
+    except TypeError:
+        return False
+
+
+def _condition_matches(values, condition):
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        for operator, operand in condition.items():
+            if operator == "$in":
+                ok = any(_expand(values, value) for value in operand)
+            elif operator == "$nin":
+                ok = not any(_expand(values, value) for value in operand)
+            elif operator == "$ne":
+                ok = not _expand(values, operand)
+            elif operator == "$eq":
+                ok = _expand(values, operand)
+            elif operator in ("$gt", "$gte", "$lt", "$lte"):
+                ok = any(_compare(value, operand, operator) for value in values)
+            elif operator == "$exists":
+                ok = bool(values) == bool(operand)
+            else:
+                raise NotImplementedError(operator)
+            if not ok:
+                return False
+        return True
+    return _expand(values, condition)
+
+
+# True if value equals one of values, or an element of an array among them.
+def _expand(values, value):
+    for candidate in values:
+        if candidate == value or (isinstance(candidate, list) and value in candidate):
+            return True
+    return value is None and not values
+
+
+def matches(document, query):
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, part) for part in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(key)
+        elif not _condition_matches(_values(document, key), condition):
+            return False
+    return True
+
+
+def project(document, projection):
+    if projection is None:
+        return copy.deepcopy(document)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    include_id = projection.get("_id", 1)
+    if any(value == 1 for value in fields.values()):
+        result = {key: copy.deepcopy(document[key]) for key in fields if key in document}
+    else:
+        result = {key: copy.deepcopy(value) for key, value in document.items() if fields.get(key, 1) != 0}
+        for key, value in fields.items():
+            if isinstance(value, dict) and "$slice" in value and isinstance(result.get(key), list):
+                result[key] = result[key][:value["$slice"]]
+    if include_id and "_id" in document:
+        result["_id"] = document["_id"]
+    elif not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _apply_update(document, update, inserting):
+    if not any(key.startswith("$") for key in update):
+        preserved = document.get("_id")
+        document.clear()
+        document.update(copy.deepcopy(update))
+        if preserved is not None:
+            document["_id"] = preserved
+        return
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            current = _get(document, path, _MISSING)
+            if operator == "$set":
+                _set(document, path, copy.deepcopy(value))
+            elif operator == "$setOnInsert":
+                if inserting:
+                    _set(document, path, copy.deepcopy(value))
+            elif operator == "$unset":
+                _unset(document, path)
+            elif operator == "$inc":
+                _set(document, path, (0 if current is _MISSING else current) + value)
+            elif operator == "$max":
+                if current is _MISSING or current is None or _compare(value, current, "$gt"):
+                    _set(document, path, value)
+            elif operator == "$min":
+                if current is _MISSING or current is None or _compare(value, current, "$lt"):
+                    _set(document, path, value)
+            elif operator == "$push":
+                _set(document, path, (current if current is not _MISSING else []) + [copy.deepcopy(value)])
+            elif operator == "$addToSet":
+                items = current if current is not _MISSING else []
+                if value not in items:
+                    _set(document, path, items + [copy.deepcopy(value)])
+            elif operator == "$pull":
+                if current is not _MISSING:
+                    _set(document, path, [item for item in current if not _pull_matches(item, value)])
+            else:
+                raise NotImplementedError(operator)
+
+
+def _pull_matches(item, condition):
+    if isinstance(condition, dict):
+        if isinstance(item, dict) and not any(key.startswith("$") for key in condition):
+            return matches(item, condition)
+        return _condition_matches([item], condition)
+    return item == condition
+
+
+# The document an upsert starts from: the equality conditions of its filter.
+def _seed(query):
+    document = {}
+    for key, condition in query.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(condition, dict) and any(operator.startswith("$") for operator in condition):
+            continue
+        _set(document, key, copy.deepcopy(condition))
+    return document
+
+
+def _sort_key(fields):
+    def key(document):
+        parts = []
+        for field, direction in fields:
+            value = _get(document, field)
+            parts.append(_Ordered(value, direction))
+        return parts
+    return key
+
+
+# Orders None before everything else and lets each field have its own direction.
+class _Ordered:
+    def __init__(self, value, direction):
+        self.value = value
+        self.direction = direction
+
+    def __lt__(self, other):
+        left, right = (self.value, other.value) if self.direction > 0 else (other.value, self.value)
+        if left is None or right is None:
+            return left is None and right is not None
+        return left < right
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _sort_fields(key, direction=1):
+    if isinstance(key, str):
+        return [(key, direction)]
+    if isinstance(key, dict):
+        return list(key.items())
+    return list(key)
+
+
+# ___________________________________Aggregation________________________
+
+def _evaluate(expression, document):
+    if isinstance(expression, str) and expression.startswith("$"):
+        values = _values(document, expression[1:])
+        if len(values) == 1:
+            return values[0]
+        return values or None
+    if isinstance(expression, dict) and len(expression) == 1:
+        operator, operand = next(iter(expression.items()))
+        if operator == "$first":
+            value = _evaluate(operand, document)
+            return value[0] if isinstance(value, list) and value else (None if isinstance(value, list) else value)
+        if operator == "$ifNull":
+            value = _evaluate(operand[0], document)
+            return _evaluate(operand[1], document) if value is None else value
+        if operator == "$divide":
+            left, right = (_evaluate(part, document) for part in operand)
+            return left / right
+        if operator == "$floor":
+            return int(_evaluate(operand, document) // 1)
+    if isinstance(expression, dict):
+        return {key: _evaluate(value, document) for key, value in expression.items()}
+    return expression
+
+
+def _group(documents, stage):
+    groups = {}
+    for document in documents:
+        key = _evaluate(stage["_id"], document)
+        marker = repr(key)
+        group = groups.setdefault(marker, {"_id": key})
+        for field, accumulator in stage.items():
+            if field == "_id":
+                continue
+            (operator, operand), = accumulator.items()
+            value = _evaluate(operand, document)
+            if operator == "$sum":
+                group[field] = group.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+            elif operator == "$max":
+                if value is not None and (group.get(field) is None or value > group[field]):
+                    group[field] = value
+                group.setdefault(field, None)
+            elif operator == "$first":
+                group.setdefault(field, value)
+            elif operator == "$push":
+                group.setdefault(field, []).append(value)
+            else:
+                raise NotImplementedError(operator)
+    return list(groups.values())
+
+
+# ___________________________________Cursor________________________
+
+class FakeCursor:
+    def __init__(self, load):
+        self._load = load
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        self._sort = _sort_fields(key, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _documents(self):
+        documents = self._load()
+        if self._sort:
+            documents = sorted(documents, key=_sort_key(self._sort))
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return documents
+
+    async def to_list(self, length=None):
+        documents = self._documents()
+        return documents[:length] if length else documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self._documents():
+            yield document
+
+
+# ___________________________________Collection________________________
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+
+    @property
+    def documents(self):
+        return self.database.data.setdefault(self.name, [])
+
+    @property
+    def indexes(self):
+        return self.database.indexes.setdefault(self.name, {"_id_": {"key": {"_id": 1}, "name": "_id_", "v": 2}})
+
+    # ____ helpers ____
+
+    def _matching(self, query):
+        return [document for document in self.documents if matches(document, query)]
+
+    def _check_unique(self, candidate, ignore=None):
+        for index in self.indexes.values():
+            if not index.get("unique"):
+                continue
+            fields = list(index["key"])
+            value = [_get(candidate, field) for field in fields]
+            for document in self.documents:
+                if document is ignore or document is candidate:
+                    continue
+                if [_get(document, field) for field in fields] == value:
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: {self.name} index: {index['name']}",
+                        11000,
+                        {"index": 0, "code": 11000, "keyPattern": dict(index["key"]),
+                         "keyValue": dict(zip(fields, value))},
+                    )
+
+    def _insert(self, document):
+        document = copy.deepcopy(document)
+        document.setdefault("_id", next(_object_ids))
+        self._check_unique(document)
+        self.documents.append(document)
+        return document["_id"]
+
+    def _update(self, query, update, upsert=False, many=False):
+        targets = self._matching(query)
+        if not many:
+            targets = targets[:1]
+        modified = 0
+        for document in targets:
+            updated = copy.deepcopy(document)
+            _apply_update(updated, update, inserting=False)
+            if updated != document:
+                self._check_unique(updated, ignore=document)
+                document.clear()
+                document.update(updated)
+                modified += 1
+        upserted_id = None
+        if not targets and upsert:
+            document = _seed(query)
+            _apply_update(document, update, inserting=True)
+            upserted_id = self._insert(document)
+        return Result(matched_count=len(targets), modified_count=modified, upserted_id=upserted_id)
+
+    def _delete(self, query, many=False):
+        targets = self._matching(query)
+        if not many:
+            targets = targets[:1]
+        for document in targets:
+            self.documents.remove(document)
+        return Result(deleted_count=len(targets))
+
+    # ____ reads ____
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(lambda: [project(document, projection) for document in self._matching(query)])
+
+    async def find_one(self, query=None, projection=None):
+        found = self._matching(query)
+        return project(found[0], projection) if found else None
+
+    async def count_documents(self, query, limit=0):
+        count = len(self._matching(query))
+        return min(count, limit) if limit else count
+
+    async def aggregate(self, pipeline, **kwargs):
+        documents = [copy.deepcopy(document) for document in self.documents]
+        for stage in pipeline:
+            (operator, spec), = stage.items()
+            if operator == "$match":
+                documents = [document for document in documents if matches(document, spec)]
+            elif operator == "$lookup":
+                foreign = self.database[spec["from"]].documents
+                for document in documents:
+                    local = _values(document, spec["localField"])
+                    document[spec["as"]] = [
+                        copy.deepcopy(other) for other in foreign
+                        if any(value in local for value in _values(other, spec["foreignField"]))
+                    ]
+            elif operator in ("$set", "$addFields"):
+                for document in documents:
+                    for field, expression in spec.items():
+                        _set(document, field, _evaluate(expression, document))
+            elif operator == "$group":
+                documents = _group(documents, spec)
+            elif operator == "$sort":
+                documents = sorted(documents, key=_sort_key(_sort_fields(spec)))
+            elif operator == "$limit":
+                documents = documents[:spec]
+            else:
+                raise NotImplementedError(operator)
+        return FakeCursor(lambda: documents)
+
+    # ____ writes ____
+
+    async def insert_one(self, document):
+        return Result(inserted_id=self._insert(document))
+
+    async def insert_many(self, documents, ordered=True):
+        return await self.bulk_write([InsertOne(document) for document in documents], ordered=ordered)
+
+    async def update_one(self, query, update, upsert=False):
+        return self._update(query, update, upsert)
+
+    async def update_many(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=True)
+
+    async def replace_one(self, query, replacement, upsert=False):
+        return self._update(query, replacement, upsert)
+
+    async def delete_one(self, query):
+        return self._delete(query)
+
+    async def delete_many(self, query):
+        return self._delete(query, many=True)
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=ReturnDocument.BEFORE,
+                                  upsert=False):
+        found = self._matching(query)
+        before = copy.deepcopy(found[0]) if found else None
+        result = self._update(query, update, upsert)
+        if return_document == ReturnDocument.AFTER:
+            if found:
+                return project(found[0], projection)
+            if result.upserted_id is not None:
+                return await self.find_one({"_id": result.upserted_id}, projection)
+            return None
+        return project(before, projection) if before is not None else None
+
+    async def find_one_and_delete(self, query, projection=None):
+        found = self._matching(query)
+        if not found:
+            return None
+        self.documents.remove(found[0])
+        return project(found[0], projection)
+
+    async def bulk_write(self, operations, ordered=True):
+        errors, upserted = [], []
+        counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0}
+        for position, operation in enumerate(operations):
+            try:
+                if isinstance(operation, InsertOne):
+                    self._insert(operation._doc)
+                    counts["nInserted"] += 1
+                elif isinstance(operation, (UpdateOne, UpdateMany, ReplaceOne)):
+                    result = self._update(operation._filter, operation._doc, bool(operation._upsert),
+                                          many=isinstance(operation, UpdateMany))
+                    counts["nMatched"] += result.matched_count
+                    counts["nModified"] += result.modified_count
+                    if result.upserted_id is not None:
+                        upserted.append({"index": position, "_id": result.upserted_id})
+                elif isinstance(operation, (DeleteOne, DeleteMany)):
+                    counts["nRemoved"] += self._delete(operation._filter, many=isinstance(operation, DeleteMany)).deleted_count
+                else:
+                    raise NotImplementedError(type(operation).__name__)
+            except DuplicateKeyError as exc:
+                errors.append({**exc.details, "index": position, "errmsg": str(exc)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "upserted": upserted, **counts})
+        return Result(
+            inserted_count=counts["nInserted"], matched_count=counts["nMatched"],
+            modified_count=counts["nModified"], deleted_count=counts["nRemoved"],
+            upserted_count=len(upserted), upserted_ids={item["index"]: item["_id"] for item in upserted},
+        )
+
+    # ____ indexes and collections ____
+
+    async def create_indexes(self, models):
+        for model in models:
+            spec = dict(model.document)
+            spec["key"] = dict(spec["key"])
+            for index in self.indexes.values():
+                same_name, same_keys = index["name"] == spec["name"], list(index["key"].items()) == list(spec["key"].items())
+                if (same_name or same_keys) and {**index, "v": 2} != {**spec, "v": 2}:
+                    raise OperationFailure(f"Index {spec['name']} conflicts with {index['name']}", 85)
+            if spec.get("unique"):
+                fields = list(spec["key"])
+                seen = set()
+                for document in self.documents:
+                    value = repr([_get(document, field) for field in fields])
+                    if value in seen:
+                        raise OperationFailure(f"E11000 duplicate key error building {spec['name']}", 11000)
+                    seen.add(value)
+            self.indexes[spec["name"]] = {**spec, "v": 2}
+        return [model.document["name"] for model in models]
+
+    async def list_indexes(self):
+        return FakeCursor(lambda: [copy.deepcopy(index) for index in self.indexes.values()])
+
+    async def drop_index(self, name):
+        del self.indexes[name]
+
+    async def drop(self):
+        self.database.data.pop(self.name, None)
+        self.database.indexes.pop(self.name, None)
+
+    async def rename(self, new_name, dropTarget=False):
+        self.database.data[new_name] = self.database.data.pop(self.name, [])
+        self.database.indexes[new_name] = self.database.indexes.pop(self.name, None) or {}
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.data = {}
+        self.indexes = {}
+
+    def __getitem__(self, name):
+        return FakeCollection(self, name)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return FakeCollection(self, name)
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import auth
+from auth import clear_token_cache, create_token, get_logged_in_user, revoke_token, token_digest
+
+
+@pytest.fixture(autouse=True)
+def empty_token_cache(monkeypatch):
+    monkeypatch.setattr(auth, "_verified_tokens", type(auth._verified_tokens)())
+    monkeypatch.setattr(auth, "_revoked_tokens", {})
+
+
+def login(token):
+    return asyncio.run(get_logged_in_user(token))
+
+
+def test_verified_token_is_cached_until_it_expires():
+    token = create_token({"sub": "u1"})
+    assert login(token) == "u1"
+    user_id, exp = auth._verified_tokens[token_digest(token)]
+    assert user_id == "u1" and exp > time.time()
+    assert login(token) == "u1"
+
+
+def test_cached_token_is_not_decoded_again(monkeypatch):
+    token = create_token({"sub": "u1"})
+    login(token)
+    monkeypatch.setattr(auth.jwt, "decode", lambda *args, **kwargs: pytest.fail("token decoded again"))
+    assert login(token) == "u1"
+
+
+def test_expired_cache_entry_is_dropped_and_the_token_rejected():
+    token = jwt.encode({"sub": "u1", "exp": int(time.time()) - 10}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+    auth._verified_tokens[token_digest(token)] = ("u1", time.time() - 10)
+    with pytest.raises(HTTPException) as error:
+        login(token)
+    assert error.value.status_code == 401
+    assert token_digest(token) not in auth._verified_tokens
+
+
+def test_token_with_a_bad_signature_is_rejected_and_not_cached():
+    token = jwt.encode({"sub": "u1"}, "another key", algorithm=auth.ALGORITHM)
+    with pytest.raises(HTTPException):
+        login(token)
+    assert not auth._verified_tokens
+
+
+def test_revoked_token_is_rejected_even_when_cached():
+    token = create_token({"sub": "u1"})
+    login(token)
+    revoke_token(token)
+    with pytest.raises(HTTPException) as error:
+        login(token)
+    assert error.value.status_code == 401
+
+
+def test_cache_drops_the_least_recently_used_token(monkeypatch):
+    monkeypatch.setattr(auth, "TOKEN_CACHE_SIZE", 2)
+    first, second, third = (create_token({"sub": user_id}) for user_id in ("u1", "u2", "u3"))
+    login(first)
+    login(second)
+    login(first)
+    login(third)
+    assert list(auth._verified_tokens) == [token_digest(first), token_digest(third)]
+
+
+def test_clear_token_cache():
+    login(create_token({"sub": "u1"}))
+    clear_token_cache()
+    assert not auth._verified_tokens
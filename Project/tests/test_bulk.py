@@ -0,0 +1,50 @@
+import asyncio
+
+from bulk import read_items
+
+
+# Minimal stand-in for a Starlette request: headers, a chunked body stream and the whole body.
+class FakeRequest:
+    def __init__(self, content_type, *chunks):
+        self.headers = {"content-type": content_type}
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def body(self):
+        return b"".join(self.chunks)
+
+
+def read(request):
+    async def collect():
+        return [item async for item in read_items(request)]
+
+    return asyncio.run(collect())
+
+
+def test_json_array():
+    assert read(FakeRequest("application/json", b'[{"id": "e1"}, {"id": "e2"}]')) == [(0, {"id": "e1"}), (1, {"id": "e2"})]
+
+
+def test_json_body_that_is_not_an_array():
+    [(position, error)] = read(FakeRequest("application/json", b'{"id": "e1"}'))
+    assert position == 0 and isinstance(error, ValueError)
+
+
+def test_invalid_json_body():
+    [(position, error)] = read(FakeRequest("application/json", b"[{"))
+    assert position == 0 and "Invalid JSON body" in str(error)
+
+
+def test_ndjson_lines_split_across_chunks():
+    request = FakeRequest("application/x-ndjson", b'{"id": "e1"}\n{"id"', b': "e2"}\n\n{"id": "e3"}')
+    assert read(request) == [(0, {"id": "e1"}), (1, {"id": "e2"}), (2, {"id": "e3"})]
+
+
+def test_ndjson_invalid_line_is_reported_at_its_position():
+    items = read(FakeRequest("application/jsonl", b'{"id": "e1"}\nnot json\n{"id": "e3"}\n'))
+    assert [position for position, _ in items] == [0, 1, 2]
+    assert isinstance(items[1][1], ValueError)
+    assert items[2][1] == {"id": "e3"}
@@ -0,0 +1,63 @@
+import asyncio
+
+from fastapi import BackgroundTasks
+
+import recommendations
+from cascade import cascade_delete_show, sweep
+from models import Show, WatchedBatch, Watchlist
+from routes import shows, watched, watchlist
+
+
+def count(fake_db, collection, query):
+    return asyncio.run(fake_db[collection].count_documents(query))
+
+
+def add_second_show(fake_db):
+    show = {"id": "s2", "title": "Dark 2", "description": "", "genre": "Drama", "release_year": 2019, "type": "Movie"}
+    asyncio.run(shows.add_show(Show(**show)))
+    entry = Watchlist(id="wl2", user_id="u1", show_id="s2", status="watching", rating=4, notes="")
+    asyncio.run(watchlist.add_to_watchlist(entry, BackgroundTasks(), "u1"))
+    for document in asyncio.run(fake_db["watchlist_db"].find({}, {"_id": 0}).to_list(None)):
+        asyncio.run(recommendations.on_entry_added(document))
+
+
+def test_deleting_a_show_removes_everything_that_belongs_to_it(entry):
+    add_second_show(entry)
+    asyncio.run(watched.add_watched_batch(WatchedBatch(watchlist_id="wl", watched_at=100, season_number=1), "u1"))
+    assert count(entry, "show_pairs_db", {"a": "s1"}) == 1
+
+    asyncio.run(entry["shows_db"].delete_one({"id": "s1"}))
+    asyncio.run(cascade_delete_show({"show_id": "s1"}))
+
+    assert count(entry, "watchlist_db", {"show_id": "s1"}) == 0
+    assert count(entry, "watched_episodes_db", {"watchlist_id": "wl"}) == 0
+    assert count(entry, "watch_progress_db", {"watchlist_id": "wl"}) == 0
+    assert count(entry, "episodes_db", {"show_id": "s1"}) == 0
+    assert count(entry, "show_pairs_db", {"$or": [{"a": "s1"}, {"b": "s1"}]}) == 0
+    assert count(entry, "similar_shows_db", {"similar.show_id": "s1"}) == 0
+    assert count(entry, "recommendation_users_db", {"entries.show_id": "s1"}) == 0
+    # The other show is untouched.
+    assert count(entry, "watchlist_db", {"show_id": "s2"}) == 1
+    assert count(entry, "watch_progress_db", {"watchlist_id": "wl2"}) == 1
+
+
+def test_cascade_can_run_again_after_a_partial_run(entry):
+    asyncio.run(entry["shows_db"].delete_one({"id": "s1"}))
+    asyncio.run(entry["episodes_db"].delete_one({"id": "e1"}))
+    asyncio.run(cascade_delete_show({"show_id": "s1"}))
+    asyncio.run(cascade_delete_show({"show_id": "s1"}))
+    assert count(entry, "episodes_db", {}) == 0
+
+
+def test_sweep_removes_data_of_shows_deleted_without_a_cascade(entry):
+    asyncio.run(watched.add_watched_batch(WatchedBatch(watchlist_id="wl", watched_at=100, season_number=1), "u1"))
+    asyncio.run(entry["shows_db"].delete_one({"id": "s1"}))
+
+    counts = asyncio.run(sweep(dry_run=True))
+    assert counts["orphan_shows"] == 1
+    assert count(entry, "episodes_db", {}) == 3
+
+    asyncio.run(sweep())
+    assert count(entry, "episodes_db", {}) == 0
+    assert count(entry, "watchlist_db", {}) == 0
+    assert count(entry, "watched_episodes_db", {}) == 0
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from models import Episode, Show
+from routes import episodes, shows
+
+
+def make_episode(episode_id, show_id="s1", **fields):
+    return {"id": episode_id, "show_id": show_id, "season_number": 1, "episode_number": int(episode_id[1:]),
+            "title": f"Episode {episode_id}", "duration_minutes": 30, **fields}
+
+
+@pytest.fixture
+def series(fake_db):
+    show = {"id": "s1", "title": "Dark", "description": "", "genre": "Drama", "release_year": 2017, "type": "Series"}
+    asyncio.run(shows.add_show(Show(**show)))
+    return fake_db
+
+
+def test_add_episode(series):
+    asyncio.run(episodes.add_episodes(Episode(**make_episode("e1")), "s1"))
+    assert asyncio.run(series["episodes_db"].count_documents({"show_id": "s1"})) == 1
+
+
+def test_add_episode_for_another_show_returns_422(series):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(episodes.add_episodes(Episode(**make_episode("e1", show_id="unchecked")), "s1"))
+    assert error.value.status_code == 422
+    assert asyncio.run(series["episodes_db"].count_documents({})) == 0
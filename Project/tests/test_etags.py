@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from etags import etag_matches, is_wildcard
+from routes import episodes, shows
+
+ETAG = '"v1-2"'
+
+
+def test_missing_header_does_not_match():
+    assert not etag_matches(None, ETAG)
+    assert not etag_matches("", ETAG)
+
+
+def test_exact_match():
+    assert etag_matches('"v1-2"', ETAG)
+
+
+def test_other_etag_does_not_match():
+    assert not etag_matches('"v1-3"', ETAG)
+
+
+def test_any_etag_in_a_list_matches():
+    assert etag_matches('"v0-1", "v1-2"', ETAG)
+    assert etag_matches('"v0-1","v1-2"', ETAG)
+
+
+def test_weak_etag_matches():
+    assert etag_matches('W/"v1-2"', ETAG)
+
+
+def test_wildcard_is_reported_separately():
+    assert not etag_matches("*", ETAG)
+    assert is_wildcard("*")
+    assert is_wildcard('"v0-1", *')
+    assert not is_wildcard(ETAG)
+
+
+def request(path, if_none_match="*"):
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"",
+                    "headers": [(b"if-none-match", if_none_match.encode())]})
+
+
+def test_wildcard_on_an_existing_show_returns_304(entry):
+    response = asyncio.run(shows.get_show("s1", request("/shows/s1"), fields=None))
+    assert response.status_code == 304
+
+
+def test_wildcard_on_a_missing_show_returns_404(fake_db):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(shows.get_show("missing", request("/shows/missing"), fields=None))
+    assert error.value.status_code == 404
+
+
+def test_wildcard_on_the_show_list_returns_304(fake_db):
+    response = asyncio.run(shows.list_shows(request("/shows"), after=None, limit=None, stream=False, fields=None))
+    assert response.status_code == 304
+
+
+def test_wildcard_on_episodes_of_a_missing_show_is_not_a_304(fake_db):
+    response = asyncio.run(episodes.get_list(
+        "missing", request("/shows/missing/episodes"), after=None, limit=None, stream=False, fields=None
+    ))
+    assert response == {"Error": "Show not found"}
+
+
+def test_wildcard_on_episodes_of_an_existing_show_returns_304(entry):
+    response = asyncio.run(episodes.get_list(
+        "s1", request("/shows/s1/episodes"), after=None, limit=None, stream=False, fields=None
+    ))
+    assert response.status_code == 304
+
+
+def test_current_etag_returns_304(entry):
+    first = asyncio.run(shows.get_show("s1", request("/shows/s1", ""), fields=None))
+    again = asyncio.run(shows.get_show("s1", request("/shows/s1", first.headers["ETag"]), fields=None))
+    assert first.status_code == 200 and again.status_code == 304
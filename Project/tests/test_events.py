@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from events import InMemoryBroker
+from routes import events as event_routes
+
+
+def collect(broker, user_id, last_event_id=None, count=10):
+    async def read():
+        subscription = await broker.subscribe(user_id, last_event_id)
+        received = []
+        while len(received) < count:
+            event = await subscription.next(0.01)
+            if event is None:
+                break
+            received.append(event)
+        subscription.close()
+        return received
+    return read
+
+
+async def publish(broker, user_id, *types):
+    for event_type in types:
+        await broker.publish(user_id, event_type, {})
+    return [event["id"] for event in broker._history[user_id]]
+
+
+def test_subscriber_resumes_after_the_last_event_it_saw():
+    async def run():
+        broker = InMemoryBroker()
+        ids = await publish(broker, "u1", "a", "b", "c")
+        return ids, await collect(broker, "u1", ids[0])()
+    ids, received = asyncio.run(run())
+    assert [event["id"] for event in received] == ids[1:]
+
+
+def test_unknown_last_event_id_sends_a_reset():
+    async def run():
+        broker = InMemoryBroker(buffer_size=2)
+        ids = await publish(broker, "u1", "a")
+        await publish(broker, "u1", "b", "c")
+        return await collect(broker, "u1", ids[0])()
+    received = asyncio.run(run())
+    assert [event["type"] for event in received] == ["reset"]
+
+
+def test_events_published_during_replay_are_sent_once():
+    async def run():
+        broker = InMemoryBroker()
+        ids = await publish(broker, "u1", "a", "b")
+        subscription = await broker.subscribe("u1", ids[0])
+        # Delivered live while "b" is still in the backlog, as when a publish races a resume.
+        subscription.deliver(broker._history["u1"][-1])
+        await broker.publish("u1", "c", {})
+        received = [await subscription.next(0.01) for _ in range(3)]
+        subscription.close()
+        return received
+    received = asyncio.run(run())
+    assert [event["type"] for event in received[:2]] == ["b", "c"]
+    assert received[2] is None
+
+
+def test_events_of_other_users_are_not_delivered():
+    async def run():
+        broker = InMemoryBroker()
+        await publish(broker, "u1", "a")
+        ids = await publish(broker, "u2", "b")
+        await publish(broker, "u1", "c")
+        return await collect(broker, "u2", ids[0])()
+    assert asyncio.run(run()) == []
+
+
+def stream_request(user_id):
+    return Request({"type": "http", "method": "GET", "path": f"/events/{user_id}", "query_string": b"",
+                    "headers": []})
+
+
+def open_stream(user_id, ticket=None, header_token=None):
+    return event_routes.stream_events(
+        user_id, stream_request(user_id), ticket=ticket, last_event_id=None, last_event_id_header=None,
+        header_token=header_token,
+    )
+
+
+def test_ticket_opens_the_stream_once(fake_db):
+    ticket = asyncio.run(event_routes.create_stream_ticket("u1", "u1"))["ticket"]
+
+    response = asyncio.run(open_stream("u1", ticket=ticket))
+    assert response.media_type == "text/event-stream"
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(open_stream("u1", ticket=ticket))
+    assert error.value.status_code == 401
+
+
+def test_expired_ticket_is_rejected(fake_db):
+    ticket = asyncio.run(event_routes.create_stream_ticket("u1", "u1"))["ticket"]
+    asyncio.run(fake_db["stream_tickets_db"].update_many(
+        {}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    ))
+    assert asyncio.run(event_routes.redeem_ticket(ticket)) is None
+
+
+def test_only_the_digest_of_a_ticket_is_stored(fake_db):
+    ticket = asyncio.run(event_routes.create_stream_ticket("u1", "u1"))["ticket"]
+    stored = asyncio.run(fake_db["stream_tickets_db"].find_one({}))
+    assert stored["_id"] != ticket and stored["user_id"] == "u1"
+
+
+def test_ticket_for_another_user_is_refused(fake_db):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(event_routes.create_stream_ticket("u2", "u1"))
+    assert error.value.status_code == 403
+
+    ticket = asyncio.run(event_routes.create_stream_ticket("u1", "u1"))["ticket"]
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(open_stream("u2", ticket=ticket))
+    assert error.value.status_code == 403
+
+
+def test_stream_without_credentials_returns_401(fake_db):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(open_stream("u1"))
+    assert error.value.status_code == 401
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from indexes import create_index
+
+UNIQUE = IndexModel([("watchlist_id", ASCENDING), ("episode_id", ASCENDING)], name="watchlist_episode", unique=True)
+PLAIN = IndexModel([("watchlist_id", ASCENDING), ("episode_id", ASCENDING)], name="watchlist_episode")
+
+
+def index_names(collection):
+    async def read():
+        return {index["name"]: index async for index in await collection.list_indexes()}
+
+    return asyncio.run(read())
+
+
+def test_existing_index_with_the_same_definition_is_kept(fake_db):
+    collection = fake_db["watched_episodes_db"]
+    asyncio.run(create_index(collection, UNIQUE))
+    asyncio.run(create_index(collection, UNIQUE))
+    assert index_names(collection)["watchlist_episode"]["unique"] is True
+
+
+def test_changed_definition_is_rebuilt(fake_db):
+    collection = fake_db["watched_episodes_db"]
+    asyncio.run(create_index(collection, PLAIN))
+    asyncio.run(create_index(collection, UNIQUE))
+    assert index_names(collection)["watchlist_episode"]["unique"] is True
+
+
+def test_failed_rebuild_restores_the_previous_index(fake_db):
+    collection = fake_db["watched_episodes_db"]
+    asyncio.run(create_index(collection, PLAIN))
+    for record_id in ("w1", "w2"):
+        asyncio.run(collection.insert_one({"id": record_id, "watchlist_id": "l1", "episode_id": "e1"}))
+
+    with pytest.raises(OperationFailure):
+        asyncio.run(create_index(collection, UNIQUE))
+
+    previous = index_names(collection)["watchlist_episode"]
+    assert previous["key"] == {"watchlist_id": 1, "episode_id": 1}
+    assert not previous.get("unique")
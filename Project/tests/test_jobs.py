@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import pytest
+
+import jobs
+from jobs import JobQueue, MemoryJobStore, MongoJobStore, register
+
+calls = {}
+
+
+@register("test.flaky")
+async def flaky(params, context):
+    calls[params["key"]] = calls.get(params["key"], 0) + 1
+    if calls[params["key"]] <= params["failures"]:
+        raise RuntimeError(f"attempt {calls[params['key']]} failed")
+    await context.add("steps", 1)
+
+
+@register("test.slow")
+async def slow(params, context):
+    await asyncio.sleep(params["seconds"])
+
+
+@pytest.fixture(autouse=True)
+def fast_timers(monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_RETRY_DELAY", 0.01)
+    monkeypatch.setattr(jobs, "JOBS_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(jobs, "JOBS_HEARTBEAT_SECONDS", 0.01)
+    monkeypatch.setattr(jobs, "JOBS_MAX_ATTEMPTS", 3)
+
+
+async def wait_for(queue, job_id, statuses=("done", "failed"), timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = await queue.get(job_id)
+        if job and job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish: {await queue.get(job_id)}")
+
+
+def run_job(store, job_type, params):
+    async def run():
+        queue = JobQueue(store)
+        await queue.start()
+        try:
+            job = await queue.enqueue(job_type, params)
+            return await wait_for(queue, job["id"])
+        finally:
+            await queue.stop()
+    return asyncio.run(run())
+
+
+def test_failed_job_is_retried_until_it_succeeds():
+    job = run_job(MemoryJobStore(), "test.flaky", {"key": "retry", "failures": 2})
+    assert job["status"] == "done" and job["attempts"] == 3
+    assert job["progress"] == {"steps": 1}
+
+
+def test_job_fails_after_the_last_attempt():
+    job = run_job(MemoryJobStore(), "test.flaky", {"key": "fail", "failures": 10})
+    assert job["status"] == "failed" and job["attempts"] == 3
+    assert job["error"] == "attempt 3 failed"
+    assert calls["fail"] == 3
+
+
+def test_unknown_job_type_is_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(JobQueue(MemoryJobStore()).enqueue("test.unknown", {}))
+
+
+def test_heartbeat_is_saved_while_a_handler_runs_without_progress():
+    store = MemoryJobStore()
+    beats = []
+    update = store.update
+
+    async def record(job_id, fields):
+        if "heartbeat" in fields:
+            beats.append(fields["heartbeat"])
+        await update(job_id, fields)
+
+    store.update = record
+    assert run_job(store, "test.slow", {"seconds": 0.1})["status"] == "done"
+    assert len(beats) >= 3
+
+
+def job_document(job_id, **fields):
+    return {"id": job_id, "type": "test.flaky", "params": {"key": job_id, "failures": 0}, "status": "queued",
+            "progress": {}, "attempts": 0, "error": None, "created_at": 0, "finished_at": None, **fields}
+
+
+def test_mongo_store_requeues_running_jobs_whose_lease_ran_out(fake_db):
+    now = time.time()
+    asyncio.run(fake_db["jobs_db"].insert_many([
+        job_document("abandoned", status="running", heartbeat=now - jobs.JOBS_LEASE_SECONDS - 1),
+        job_document("alive", status="running", heartbeat=now),
+        job_document("waiting", retry_at=now + 60),
+        job_document("due", retry_at=now - 1),
+        job_document("new"),
+        job_document("finished", status="done"),
+    ]))
+
+    assert sorted(asyncio.run(MongoJobStore().pending())) == ["abandoned", "due", "new"]
+    assert asyncio.run(fake_db["jobs_db"].find_one({"id": "abandoned"}))["status"] == "queued"
+    assert asyncio.run(fake_db["jobs_db"].find_one({"id": "alive"}))["status"] == "running"
+
+
+def test_running_queue_picks_up_jobs_stored_by_another_process(fake_db):
+    async def run():
+        queue = JobQueue(MongoJobStore())
+        await queue.start()
+        try:
+            # Enqueued elsewhere after this queue started, and one abandoned by a crashed process.
+            await fake_db["jobs_db"].insert_one(job_document("elsewhere"))
+            await fake_db["jobs_db"].insert_one(job_document("crashed", status="running", heartbeat=0))
+            return [await wait_for(queue, job_id) for job_id in ("elsewhere", "crashed")]
+        finally:
+            await queue.stop()
+
+    assert [job["status"] for job in asyncio.run(run())] == ["done", "done"]
+
+
+def test_a_job_is_queued_once_however_often_it_is_polled():
+    async def run():
+        store = MemoryJobStore()
+        queue = JobQueue(store, workers=0)
+        await queue.start()
+        try:
+            await queue.enqueue("test.slow", {"seconds": 0})
+            await queue.poll()
+            await queue.poll()
+            return queue._queue.qsize()
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,32 @@
+from pagination import DEFAULT_PAGE_SIZE, page_from_list
+
+DOCS = [{"id": letter} for letter in "abcde"]
+
+
+def test_first_page_returns_cursor_of_last_document():
+    assert page_from_list(DOCS, limit=2) == (DOCS[:2], "b")
+
+
+def test_after_cursor_continues_from_next_document():
+    assert page_from_list(DOCS, after="b", limit=2) == (DOCS[2:4], "d")
+
+
+def test_last_page_has_no_cursor():
+    assert page_from_list(DOCS, after="d", limit=2) == (DOCS[4:], None)
+
+
+def test_page_that_ends_exactly_at_the_list_end_has_no_cursor():
+    assert page_from_list(DOCS, limit=5) == (DOCS, None)
+    assert page_from_list(DOCS, after="c", limit=2) == (DOCS[3:], None)
+
+
+def test_after_cursor_that_is_not_in_the_list():
+    assert page_from_list(DOCS, after="bb", limit=10) == (DOCS[2:], None)
+    assert page_from_list(DOCS, after="z") == ([], None)
+
+
+def test_default_limit():
+    docs = [{"id": f"{n:05d}"} for n in range(DEFAULT_PAGE_SIZE + 1)]
+    page, cursor = page_from_list(docs)
+    assert len(page) == DEFAULT_PAGE_SIZE
+    assert cursor == docs[DEFAULT_PAGE_SIZE - 1]["id"]
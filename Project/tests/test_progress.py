@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import progress
+from models import Episode, WatchedBatch, WatchedEpisode
+from routes import episodes, watched
+
+
+def read_progress(fake_db):
+    return asyncio.run(fake_db["watch_progress_db"].find_one({"watchlist_id": "wl"}, {"_id": 0}))
+
+
+def assert_matches_rebuild(fake_db):
+    incremental = read_progress(fake_db)
+    asyncio.run(progress.rebuild())
+    assert read_progress(fake_db) == incremental
+
+
+def test_new_entry_counts_the_show_episodes(entry):
+    assert read_progress(entry)["total_episodes"] == 3
+    assert read_progress(entry)["episodes_watched"] == 0
+
+
+def test_watched_and_unwatched_episodes_update_the_counters(entry):
+    asyncio.run(watched.add_watched_episode(WatchedEpisode(id="w1", watchlist_id="wl", episode_id="e1", watched_at=100), "u1"))
+    asyncio.run(watched.add_watched_batch(WatchedBatch(watchlist_id="wl", watched_at=200, episode_ids=["e2", "e3"]), "u1"))
+    assert read_progress(entry)["episodes_watched"] == 3
+    assert read_progress(entry)["minutes_watched"] == 90
+    assert read_progress(entry)["last_watched_at"] == 200
+
+    asyncio.run(watched.remove_watched_episode("w1", "wl", "u1"))
+    assert read_progress(entry)["episodes_watched"] == 2
+    assert read_progress(entry)["minutes_watched"] == 60
+    assert_matches_rebuild(entry)
+
+
+def test_duration_edit_and_episode_delete_update_watchers(entry):
+    asyncio.run(watched.add_watched_batch(WatchedBatch(watchlist_id="wl", watched_at=100, season_number=1), "u1"))
+    edited = Episode(id="e1", show_id="s1", season_number=1, episode_number=1, title="Pilot", duration_minutes=50)
+    asyncio.run(episodes.update_episode("e1", edited))
+    assert read_progress(entry)["minutes_watched"] == 110
+
+    asyncio.run(episodes.delete_episode("e2"))
+    assert read_progress(entry)["episodes_watched"] == 2
+    assert read_progress(entry)["total_episodes"] == 2
+    assert read_progress(entry)["minutes_watched"] == 80
+    assert_matches_rebuild(entry)
+
+
+@pytest.mark.parametrize("changes", [{"id": "e9"}, {"show_id": "s2"}])
+def test_update_cannot_change_the_episode_id_or_show(entry, changes):
+    fields = {"id": "e1", "show_id": "s1", "season_number": 1, "episode_number": 1, "title": "Pilot",
+              "duration_minutes": 30, **changes}
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(episodes.update_episode("e1", Episode(**fields)))
+    assert error.value.status_code == 422
+    assert asyncio.run(entry["episodes_db"].find_one({"id": "e1"}))["show_id"] == "s1"
+    assert read_progress(entry)["total_episodes"] == 3
+
+
+def test_update_of_a_missing_episode_returns_404(entry):
+    missing = Episode(id="e9", show_id="s1", season_number=1, episode_number=9, title="", duration_minutes=30)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(episodes.update_episode("e9", missing))
+    assert error.value.status_code == 404
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import recommendations
+
+ENTRIES = [
+    {"id": "wl1", "user_id": "u1", "show_id": "s1", "rating": 5},
+    {"id": "wl2", "user_id": "u1", "show_id": "s2", "rating": 3},
+    {"id": "wl3", "user_id": "u1", "show_id": "s3", "rating": 0},
+    {"id": "wl4", "user_id": "u2", "show_id": "s1", "rating": 4},
+    {"id": "wl5", "user_id": "u2", "show_id": "s3", "rating": 2},
+    {"id": "wl6", "user_id": "u3", "show_id": "s2", "rating": 1},
+]
+
+
+# Pair weights and show weights, which incremental updates keep exact (similar lists may lag until a rebuild).
+def weights(fake_db):
+    pairs, shows = snapshot(fake_db)
+    return pairs, {show_id: weight for show_id, (weight, _) in shows.items() if weight}
+
+
+def snapshot(fake_db):
+    async def read():
+        pairs = {
+            (pair["a"], pair["b"]): pair["w"]
+            async for pair in fake_db["show_pairs_db"].find({"w": {"$gt": 0}})
+        }
+        shows = {
+            document["show_id"]: (document["weight"], document["similar"])
+            async for document in fake_db["similar_shows_db"].find({})
+        }
+        return pairs, shows
+    return asyncio.run(read())
+
+
+async def add(fake_db, *entries):
+    await fake_db["watchlist_db"].insert_many([dict(entry) for entry in entries])
+    await asyncio.gather(*(recommendations.on_entry_added(entry) for entry in entries))
+
+
+async def remove(fake_db, entry):
+    await fake_db["watchlist_db"].delete_one({"id": entry["id"]})
+    await recommendations.on_entry_removed(entry)
+
+
+def test_incremental_updates_match_a_rebuild(fake_db):
+    for entry in ENTRIES:
+        asyncio.run(add(fake_db, entry))
+    incremental = weights(fake_db)
+    assert incremental[0][("s1", "s2")] == 15
+
+    asyncio.run(recommendations.rebuild())
+    assert weights(fake_db) == incremental
+
+
+def test_concurrent_adds_by_one_user_count_the_pair_once(fake_db):
+    # Both entries are in watchlist_db before either background task runs.
+    asyncio.run(add(fake_db, ENTRIES[0], ENTRIES[1]))
+
+    pairs, shows = snapshot(fake_db)
+    assert pairs == {("s1", "s2"): 15, ("s2", "s1"): 15}
+    assert shows["s1"][0] == 25 and shows["s2"][0] == 9
+
+
+def test_repeated_tasks_change_nothing(fake_db):
+    asyncio.run(add(fake_db, ENTRIES[0], ENTRIES[1]))
+    before = snapshot(fake_db)
+
+    asyncio.run(recommendations.on_entry_added(ENTRIES[1]))
+    assert snapshot(fake_db) == before
+
+    asyncio.run(remove(fake_db, ENTRIES[1]))
+    asyncio.run(recommendations.on_entry_removed(ENTRIES[1]))
+    pairs, shows = snapshot(fake_db)
+    assert pairs == {}
+    assert shows["s1"][0] == 25 and shows["s2"][0] == 0
+
+
+def test_removals_match_a_rebuild(fake_db):
+    for entry in ENTRIES:
+        asyncio.run(add(fake_db, entry))
+    asyncio.run(remove(fake_db, ENTRIES[0]))
+    incremental = weights(fake_db)
+
+    asyncio.run(recommendations.rebuild())
+    assert weights(fake_db) == incremental
+
+
+def test_removed_show_is_forgotten(fake_db):
+    asyncio.run(add(fake_db, ENTRIES[0], ENTRIES[1], ENTRIES[2]))
+    asyncio.run(recommendations.remove_show("s1"))
+
+    pairs, shows = snapshot(fake_db)
+    assert all("s1" not in pair for pair in pairs)
+    assert "s1" not in shows
+    assert all(item["show_id"] != "s1" for _, similar in shows.values() for item in similar)
+    counted = asyncio.run(fake_db["recommendation_users_db"].find_one({"user_id": "u1"}))
+    assert [entry["show_id"] for entry in counted["entries"]] == ["s2", "s3"]
+
+
+@pytest.mark.parametrize("rating", [0, -1])
+def test_unrated_entries_count_as_one(rating):
+    assert recommendations.entry_weight({"rating": rating}) == 1
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import repository
+
+
+def make_entry(entry_id, show_id="s1", user_id="u1"):
+    return {"id": entry_id, "user_id": user_id, "show_id": show_id, "status": "watching", "rating": 0, "notes": ""}
+
+
+def status_of(coroutine):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(coroutine)
+    return error.value.status_code
+
+
+@pytest.fixture
+def entries(fake_db):
+    asyncio.run(repository.add_watchlist_entry(make_entry("wl1", "s1")))
+    asyncio.run(repository.add_watchlist_entry(make_entry("wl2", "s2")))
+    return fake_db
+
+
+def test_duplicate_entry_id_returns_409(entries):
+    assert status_of(repository.add_watchlist_entry(make_entry("wl1", "s3"))) == 409
+
+
+def test_second_entry_for_the_same_show_returns_409(entries):
+    assert status_of(repository.add_watchlist_entry(make_entry("wl3", "s1"))) == 409
+    assert asyncio.run(entries["watchlist_db"].count_documents({"user_id": "u1", "show_id": "s1"})) == 1
+
+
+def test_another_user_can_add_the_same_show(entries):
+    asyncio.run(repository.add_watchlist_entry(make_entry("wl3", "s1", user_id="u2")))
+    assert asyncio.run(entries["watchlist_db"].count_documents({"show_id": "s1"})) == 2
+
+
+def test_update_to_a_show_already_in_the_watchlist_returns_409(entries):
+    assert status_of(repository.update_watchlist_entry("wl2", "u1", {"show_id": "s1"})) == 409
+
+
+def test_update_returns_the_entry_before_the_change(entries):
+    before = asyncio.run(repository.update_watchlist_entry("wl1", "u1", {"status": "completed", "id": "ignored"}))
+    assert before["status"] == "watching"
+    assert asyncio.run(entries["watchlist_db"].find_one({"id": "wl1"}))["status"] == "completed"
+
+
+@pytest.mark.parametrize("user_id, watchlist_id", [("u2", "wl1"), ("u1", "missing")])
+def test_entries_of_other_users_and_missing_entries_return_404(entries, user_id, watchlist_id):
+    assert status_of(repository.get_owned_watchlist(watchlist_id, user_id)) == 404
+    assert status_of(repository.update_watchlist_entry(watchlist_id, user_id, {"status": "dropped"})) == 404
+    assert status_of(repository.delete_watchlist_entry(watchlist_id, user_id)) == 404
+    assert asyncio.run(entries["watchlist_db"].count_documents({})) == 2
+
+
+def test_watched_record_of_another_user_returns_404(fake_db):
+    record = {"id": "w1", "watchlist_id": "wl1", "episode_id": "e1", "watched_at": 0, "user_id": "u1"}
+    asyncio.run(fake_db["watched_episodes_db"].insert_one(record))
+    assert status_of(repository.delete_watched_episode("w1", "wl1", "u2")) == 404
+    assert asyncio.run(repository.delete_watched_episode("w1", "wl1", "u1"))["episode_id"] == "e1"
@@ -0,0 +1,39 @@
+import pytest
+from fastapi import HTTPException
+
+from models import Show
+from responses import parse_fields, project
+
+SHOW = {"id": "s1", "title": "Dark", "description": "Time travel", "genre": "Drama", "release_year": 2017, "type": "Series"}
+
+
+def test_parse_fields_without_fields_returns_none():
+    assert parse_fields(None, Show) is None
+    assert parse_fields("", Show) is None
+
+
+def test_parse_fields_always_includes_id_and_excludes_mongo_id():
+    assert parse_fields("title, genre", Show) == {"_id": 0, "id": 1, "title": 1, "genre": 1}
+
+
+def test_parse_fields_ignores_empty_names():
+    assert parse_fields("title,,", Show) == {"_id": 0, "id": 1, "title": 1}
+
+
+def test_parse_fields_rejects_unknown_fields():
+    with pytest.raises(HTTPException) as error:
+        parse_fields("title,password,_id", Show)
+    assert error.value.status_code == 422
+    assert "password" in error.value.detail and "_id" in error.value.detail
+
+
+def test_project_without_projection_returns_document():
+    assert project(SHOW, None) is SHOW
+
+
+def test_project_keeps_requested_fields_only():
+    assert project(SHOW, parse_fields("genre", Show)) == {"id": "s1", "genre": "Drama"}
+
+
+def test_project_skips_fields_missing_from_the_document():
+    assert project({"id": "s2"}, parse_fields("title", Show)) == {"id": "s2"}
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+from rollups import breakdown_of, buckets_for
+
+
+def timestamp(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_buckets_for():
+    assert buckets_for(timestamp(2026, 10, 17, 23, 59)) == {
+        "day": "2026-10-17", "week": "2026-W42", "month": "2026-10", "year": "2026",
+    }
+
+
+def test_buckets_for_uses_utc():
+    assert buckets_for(timestamp(2026, 10, 18))["day"] == "2026-10-18"
+
+
+def test_buckets_for_uses_the_iso_week_year():
+    # 1 January 2027 is a Friday, so it belongs to the last ISO week of 2026.
+    assert buckets_for(timestamp(2027, 1, 1)) == {
+        "day": "2027-01-01", "week": "2026-W53", "month": "2027-01", "year": "2027",
+    }
+
+
+def test_breakdown_of_year():
+    period, buckets = breakdown_of("year", "2026")
+    assert period == "month"
+    assert buckets[0] == "2026-01" and buckets[-1] == "2026-12" and len(buckets) == 12
+
+
+def test_breakdown_of_month():
+    assert breakdown_of("month", "2026-10")[1][-1] == "2026-10-31"
+    assert breakdown_of("month", "2028-02") == ("day", [f"2028-02-{day:02d}" for day in range(1, 30)])
+
+
+def test_breakdown_of_week():
+    assert breakdown_of("week", "2026-W42") == ("day", [f"2026-10-{day}" for day in range(12, 19)])
+    assert breakdown_of("week", "2026-W53")[1] == [
+        "2026-12-28", "2026-12-29", "2026-12-30", "2026-12-31", "2027-01-01", "2027-01-02", "2027-01-03",
+    ]
+
+
+def test_breakdown_of_day():
+    assert breakdown_of("day", "2026-10-17") == (None, [])
+
+
+def test_buckets_match_their_breakdown():
+    buckets = buckets_for(timestamp(2026, 2, 28))
+    for period, child in (("year", "month"), ("month", "day"), ("week", "day")):
+        assert buckets[child] in breakdown_of(period, buckets[period])[1]
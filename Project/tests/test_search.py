@@ -0,0 +1,85 @@
+from search import InvertedIndex, filter_query
+
+SHOWS = [
+    {"id": "s1", "title": "The Office", "description": "A mockumentary about office workers",
+     "genre": "Comedy", "release_year": 2005, "type": "Series"},
+    {"id": "s2", "title": "Dark", "description": "A family saga with a supernatural twist set in a small town",
+     "genre": "Drama", "release_year": 2017, "type": "Series"},
+    {"id": "s3", "title": "Office Space", "description": "Three workers hate their jobs",
+     "genre": "Comedy", "release_year": 1999, "type": "Movie"},
+    {"id": "s4", "title": "Mindhunter", "description": "Agents interview killers in an office basement",
+     "genre": "Crime", "release_year": 2017, "type": "Series"},
+]
+
+
+def make_index():
+    index = InvertedIndex()
+    for show in SHOWS:
+        index.upsert(show)
+    return index
+
+
+def ids(results):
+    return [show["id"] for show in results]
+
+
+def test_title_matches_rank_above_description_matches():
+    total, results, _ = make_index().search("office", {}, 10, 0)
+    assert total == 3
+    assert ids(results)[-1] == "s4"
+    assert all(result["score"] > 0 for result in results)
+
+
+def test_filters_limit_matches_and_facets():
+    total, results, facets = make_index().search("office", filter_query(genre="Comedy", year_from=2000), 10, 0)
+    assert (total, ids(results)) == (1, ["s1"])
+    assert facets["genre"] == [{"value": "Comedy", "count": 1}]
+
+
+def test_facets_count_every_match_not_only_the_page():
+    total, results, facets = make_index().search("office", {}, 1, 0)
+    assert total == 3 and len(results) == 1
+    assert facets["genre"] == [{"value": "Comedy", "count": 2}, {"value": "Crime", "count": 1}]
+
+
+def test_skip_pages_through_ranked_results():
+    index = make_index()
+    _, everything, _ = index.search("office", {}, 10, 0)
+    _, second, _ = index.search("office", {}, 1, 1)
+    assert ids(second) == ids(everything)[1:2]
+
+
+def test_empty_query_lists_filtered_shows_by_id():
+    total, results, _ = make_index().search("", filter_query(year_from=2017, year_to=2017), 10, 0)
+    assert (total, ids(results)) == (2, ["s2", "s4"])
+    assert "score" not in results[0]
+
+
+def test_stop_words_only_match_nothing():
+    assert make_index().search("the and of", {}, 10, 0) == (0, [], {"genre": [], "type": [], "release_year": []})
+
+
+def test_upsert_replaces_the_old_words():
+    index = make_index()
+    index.upsert({**SHOWS[1], "title": "Darkness", "description": "Renamed"})
+    assert index.search("saga", {}, 10, 0)[0] == 0
+    assert ids(index.search("darkness", {}, 10, 0)[1]) == ["s2"]
+
+
+def test_remove_drops_the_show_and_empty_postings():
+    index = make_index()
+    index.remove("s4")
+    index.remove("missing")
+    assert "s4" not in index.shows
+    assert "mindhunter" not in index.postings
+    assert sorted(ids(index.search("office", {}, 10, 0)[1])) == ["s1", "s3"]
+
+
+def test_write_hooks_only_apply_once_built():
+    index = InvertedIndex()
+    index.on_upsert(SHOWS[0])
+    assert index.shows == {}
+    index.built_at = 0
+    index.on_upsert(SHOWS[0])
+    index.on_delete("s1")
+    assert index.shows == {}
@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from models import Show
+from routes import shows
+
+
+def make_show(show_id, **fields):
+    return {"id": show_id, "title": f"Show {show_id}", "description": "", "genre": "Drama", "release_year": 2020,
+            "type": "Series", **fields}
+
+
+def test_update_to_the_id_of_another_show_returns_409(fake_db):
+    asyncio.run(shows.add_show(Show(**make_show("s1"))))
+    asyncio.run(shows.add_show(Show(**make_show("s2"))))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(shows.update_show("s1", Show(**make_show("s2"))))
+    assert error.value.status_code == 409
+
+
+def test_update_of_a_missing_show_returns_404(fake_db):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(shows.update_show("missing", Show(**make_show("missing"))))
+    assert error.value.status_code == 404
@@ -0,0 +1,64 @@
+import asyncio
+import gzip
+import os
+
+import transfer
+from transfer import _read_checkpoint, _write_checkpoint, read_documents
+
+
+def write_dump(path, content):
+    with gzip.open(path, "wb") as file:
+        file.write(content)
+    return path
+
+
+def read(path, skip=0):
+    async def collect():
+        return [item async for item in read_documents(path, skip)]
+
+    return asyncio.run(collect())
+
+
+def test_read_documents(tmp_path, monkeypatch):
+    # A tiny buffer makes lines span several reads.
+    monkeypatch.setattr(transfer, "TRANSFER_BUFFER_BYTES", 5)
+    dump = write_dump(tmp_path / "shows.ndjson.gz", b'{"id": "s1"}\n\nnot json\n{"id": "s2"}')
+    assert read(dump) == [(1, {"id": "s1"}), (3, None), (4, {"id": "s2"})]
+
+
+def test_read_documents_skips_lines_already_imported(tmp_path):
+    dump = write_dump(tmp_path / "shows.ndjson.gz", b'{"id": "s1"}\n{"id": "s2"}\n{"id": "s3"}\n')
+    assert read(dump, skip=2) == [(3, {"id": "s3"})]
+    assert read(dump, skip=3) == []
+
+
+def test_read_documents_skips_last_line_without_newline(tmp_path):
+    dump = write_dump(tmp_path / "shows.ndjson.gz", b'{"id": "s1"}\n{"id": "s2"}')
+    assert read(dump, skip=1) == [(2, {"id": "s2"})]
+    assert read(dump, skip=2) == []
+
+
+def test_checkpoint_round_trip(tmp_path):
+    dump = write_dump(tmp_path / "shows.ndjson.gz", b'{"id": "s1"}\n')
+    checkpoint = tmp_path / "shows.checkpoint"
+    assert _read_checkpoint(checkpoint, dump) == {"line": 0, "complete": False}
+    _write_checkpoint(checkpoint, dump, 1, complete=True)
+    assert _read_checkpoint(checkpoint, dump)["line"] == 1
+    assert _read_checkpoint(checkpoint, dump)["complete"] is True
+    assert not (tmp_path / "shows.checkpoint.part").exists()
+
+
+def test_checkpoint_of_a_replaced_dump_is_ignored(tmp_path):
+    dump = write_dump(tmp_path / "shows.ndjson.gz", b'{"id": "s1"}\n')
+    checkpoint = tmp_path / "shows.checkpoint"
+    _write_checkpoint(checkpoint, dump, 1)
+    write_dump(dump, b'{"id": "s1"}\n{"id": "s2"}\n')
+    os.utime(dump, ns=(0, 0))
+    assert _read_checkpoint(checkpoint, dump) == {"line": 0, "complete": False}
+
+
+def test_corrupt_checkpoint_is_ignored(tmp_path):
+    dump = write_dump(tmp_path / "shows.ndjson.gz", b'{"id": "s1"}\n')
+    checkpoint = tmp_path / "shows.checkpoint"
+    checkpoint.write_bytes(b"{not json")
+    assert _read_checkpoint(checkpoint, dump) == {"line": 0, "complete": False}
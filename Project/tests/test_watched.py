@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from models import WatchedBatch, WatchedEpisode
+from routes import watched
+
+
+def progress(fake_db):
+    return asyncio.run(fake_db["watch_progress_db"].find_one({"watchlist_id": "wl"}))
+
+
+def test_batch_marks_a_season_as_watched(entry):
+    result = asyncio.run(watched.add_watched_batch(WatchedBatch(watchlist_id="wl", watched_at=100, season_number=1), "u1"))
+
+    assert result["added"] == 3 and result["already_watched"] == 0
+    assert progress(entry)["episodes_watched"] == 3
+
+
+def test_repeated_batch_counts_episodes_as_already_watched(entry):
+    batch = WatchedBatch(watchlist_id="wl", watched_at=100, episode_ids=["e1", "e2"])
+    asyncio.run(watched.add_watched_batch(batch, "u1"))
+    result = asyncio.run(watched.add_watched_batch(WatchedBatch(watchlist_id="wl", watched_at=200, season_number=1), "u1"))
+
+    assert result["added"] == 1 and result["already_watched"] == 2
+    assert progress(entry)["episodes_watched"] == 3
+
+
+def test_batch_records_an_episode_whose_batch_id_is_taken(entry):
+    # A record added through /watched/add with a client id that happens to equal the batch id of e2.
+    asyncio.run(watched.add_watched_episode(WatchedEpisode(id="wl:e2", watchlist_id="wl", episode_id="e1", watched_at=50), "u1"))
+    result = asyncio.run(watched.add_watched_batch(WatchedBatch(watchlist_id="wl", watched_at=100, season_number=1), "u1"))
+
+    assert result["added"] == 2 and result["already_watched"] == 1
+    assert asyncio.run(entry["watched_episodes_db"].count_documents({"watchlist_id": "wl", "episode_id": "e2"})) == 1
+    assert progress(entry)["episodes_watched"] == 3
+
+
+def test_adding_an_episode_of_another_show_returns_404(entry):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(watched.add_watched_episode(WatchedEpisode(id="w1", watchlist_id="wl", episode_id="other", watched_at=50), "u1"))
+    assert error.value.status_code == 404
@@ -0,0 +1,291 @@
+"""
+transfer.py
+
+This file exports and imports the data of the Tracker API application, for migrating environments or restoring
+one user's data.
+
+How it works:
+- `export()` writes one gzip-compressed NDJSON file per collection (`users.ndjson.gz`, `shows.ndjson.gz`, ...)
+  into a directory. Documents are streamed from a cursor, encoded with orjson and compressed in blocks of
+  TRANSFER_BUFFER_BYTES, so memory use stays the same no matter how large a collection is.
+- `import_dump()` reads those files back and writes them with unordered `bulk_write` calls of TRANSFER_CHUNK_SIZE
+  documents. Each document replaces the one with the same `id` (or is inserted), so importing twice changes
+  nothing. While one chunk is written the next one is read, and after every chunk the number of lines done is
+  saved to `<collection>.checkpoint`: an interrupted import continues from there when started again.
+- A checkpoint remembers the size and modification time of the file it belongs to and is ignored if the file
+  changed. An export also deletes the checkpoint of every file it writes, so a fresh dump is imported in full.
+- Lines that are not valid JSON or have no `id` are skipped and counted in `failed`; the first
+  TRANSFER_FAILED_LINES of their line numbers are listed in `failed_lines`.
+- Importing shows or episodes bumps the catalog version counters of what was written (see etags.py), so running
+  servers stop serving cached shows, episode lists and 304s for the old data.
+- The collections are exported and imported in parallel. Compression runs in threads, so several collections
+  also use several CPU cores.
+- With a user id only that user's documents are exported: their user document, watchlist and watched records,
+  plus the shows on their watchlist and those shows' episodes.
+- Every run prints, per collection, the documents handled, the time taken and the throughput in documents per
+  second.
+- routes/admin.py streams the same export for one collection over HTTP (guarded by ADMIN_TOKEN).
+
+Usage:
+    python transfer.py export dump/                              # every collection
+    python transfer.py export dump/ --collections shows episodes
+    python transfer.py export dump/ --user <user_id>             # one user's data
+    python transfer.py import dump/                              # resumes from the checkpoints
+    python transfer.py import dump/ --restart                    # ignores the checkpoints
+
+Key Concepts:
+- The exported users collection contains password hashes: keep the files private.
+- Derived data is not transferred. After an import run `python progress.py rebuild`, `python rollups.py rebuild`
+  and `python recommendations.py rebuild`, and restart the server so the search index is rebuilt.
+
+Other modules can import these functions to export or import collections.
+"""
+
+import argparse
+import asyncio
+import gzip
+import os
+import time
+import zlib
+from pathlib import Path
+
+import orjson
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from database import episodes_db, shows_db, users_db, watchlist_db, watched_episodes_db
+from etags import SHOWS_KEY, bump_versions, episodes_key, show_key
+
+# Collections that can be transferred, by the name used for their files.
+COLLECTIONS = {
+    "users": users_db,
+    "shows": shows_db,
+    "episodes": episodes_db,
+    "watchlist": watchlist_db,
+    "watched": watched_episodes_db,
+}
+
+# Documents per bulk_write call (and per cursor batch when exporting).
+TRANSFER_CHUNK_SIZE = int(os.getenv("TRANSFER_CHUNK_SIZE", 1000))
+# Uncompressed bytes collected before they are compressed (export) or read at once (import).
+TRANSFER_BUFFER_BYTES = int(os.getenv("TRANSFER_BUFFER_BYTES", 1 << 20))
+# gzip level: 1 is fastest, 9 is smallest.
+TRANSFER_COMPRESSION_LEVEL = int(os.getenv("TRANSFER_COMPRESSION_LEVEL", 6))
+# Line numbers of skipped lines listed per collection in the import stats.
+TRANSFER_FAILED_LINES = 100
+
+
+# Returns the filter for each collection that selects one user's data.
+async def user_queries(user_id):
+    show_ids = await watchlist_db.distinct("show_id", {"user_id": user_id})
+    return {
+        "users": {"id": user_id},
+        "shows": {"id": {"$in": show_ids}},
+        "episodes": {"show_id": {"$in": show_ids}},
+        "watchlist": {"user_id": user_id},
+        "watched": {"user_id": user_id},
+    }
+
+
+def _throughput(stats, start):
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    stats["docs_per_second"] = round(stats["documents"] / stats["seconds"]) if stats["seconds"] else 0
+    return stats
+
+
+# Yields gzip-compressed NDJSON for every document of a collection that matches query.
+# `stats["documents"]` is updated as documents are read.
+async def gzip_chunks(name, query=None, stats=None):
+    stats = stats if stats is not None else {}
+    stats.setdefault("documents", 0)
+    compressor = zlib.compressobj(TRANSFER_COMPRESSION_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+    buffer = bytearray()
+    cursor = COLLECTIONS[name].find(query or {}, {"_id": 0}, batch_size=TRANSFER_CHUNK_SIZE)
+    async for document in cursor:
+        buffer += orjson.dumps(document, option=orjson.OPT_APPEND_NEWLINE)
+        stats["documents"] += 1
+        if len(buffer) >= TRANSFER_BUFFER_BYTES:
+            block = await asyncio.to_thread(compressor.compress, bytes(buffer))
+            buffer.clear()
+            if block:
+                yield block
+    yield await asyncio.to_thread(lambda: compressor.compress(bytes(buffer)) + compressor.flush())
+
+
+# Writes one collection to <directory>/<name>.ndjson.gz. Returns its stats.
+async def export_collection(name, directory, query=None):
+    start = time.perf_counter()
+    stats = {"collection": name, "documents": 0, "bytes": 0}
+    path = Path(directory) / f"{name}.ndjson.gz"
+    partial = path.with_name(path.name + ".part")
+    with open(partial, "wb") as file:
+        async for block in gzip_chunks(name, query, stats):
+            await asyncio.to_thread(file.write, block)
+            stats["bytes"] += len(block)
+    # Renamed only when complete, so a crashed export never looks like a finished file.
+    os.replace(partial, path)
+    # The old checkpoint counted lines of the previous dump.
+    (Path(directory) / f"{name}.checkpoint").unlink(missing_ok=True)
+    return _throughput(stats, start)
+
+
+# Exports the named collections (all by default) in parallel. Returns the stats of each.
+async def export(directory, names=None, user_id=None):
+    names = names or list(COLLECTIONS)
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    queries = await user_queries(user_id) if user_id else {}
+    return await asyncio.gather(*(export_collection(name, directory, queries.get(name)) for name in names))
+
+
+def _parse(line):
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return None
+
+
+# Yields (line_number, document) for every line of a gzip NDJSON file after the first `skip` lines.
+# document is None for a line that is not valid JSON.
+async def read_documents(path, skip=0):
+    with gzip.open(path, "rb") as file:
+        line_number = 0
+        rest = b""
+        while True:
+            data = await asyncio.to_thread(file.read, TRANSFER_BUFFER_BYTES)
+            if not data:
+                break
+            *lines, rest = (rest + data).split(b"\n")
+            for line in lines:
+                line_number += 1
+                if line_number > skip and line.strip():
+                    yield line_number, _parse(line)
+        if rest.strip() and line_number + 1 > skip:
+            yield line_number + 1, _parse(rest)
+
+
+# Identifies one version of a dump file: [size, modification time in ns].
+def _fingerprint(dump_path):
+    stat = dump_path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# Returns the checkpoint saved for dump_path, or a fresh one if there is none or it belongs to another file.
+def _read_checkpoint(path, dump_path):
+    fresh = {"line": 0, "complete": False}
+    try:
+        checkpoint = orjson.loads(path.read_bytes())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return fresh
+    return checkpoint if checkpoint.get("dump") == _fingerprint(dump_path) else fresh
+
+
+def _write_checkpoint(path, dump_path, line, complete=False):
+    partial = path.with_name(path.name + ".part")
+    partial.write_bytes(orjson.dumps({"line": line, "complete": complete, "dump": _fingerprint(dump_path)}))
+    os.replace(partial, path)
+
+
+# Returns the catalog version keys (see etags.py) that importing a document of a collection changes.
+def _version_keys(name, document):
+    if name == "shows":
+        return [SHOWS_KEY, show_key(document["id"])]
+    if name == "episodes":
+        return [episodes_key(document.get("show_id"))]
+    return []
+
+
+# Writes one chunk of replacements. Returns (written, failed).
+async def _write_chunk(collection, operations):
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        return result.upserted_count + result.matched_count, 0
+    except BulkWriteError as exc:
+        details = exc.details
+        failed = len(details.get("writeErrors", []))
+        return details.get("nUpserted", 0) + details.get("nMatched", 0), failed
+
+
+# Imports <directory>/<name>.ndjson.gz, continuing after the last checkpoint unless restart is set.
+async def import_collection(name, directory, restart=False):
+    start = time.perf_counter()
+    collection = COLLECTIONS[name]
+    path = Path(directory) / f"{name}.ndjson.gz"
+    checkpoint_path = Path(directory) / f"{name}.checkpoint"
+    checkpoint = {"line": 0, "complete": False} if restart else _read_checkpoint(checkpoint_path, path)
+    stats = {
+        "collection": name, "documents": 0, "failed": 0, "failed_lines": [], "resumed_at_line": checkpoint["line"],
+    }
+    if checkpoint["complete"]:
+        stats["skipped"] = "already imported"
+        return _throughput(stats, start)
+
+    pending = None  # (write task, last line in it, version keys) of the chunk being written
+
+    # Waits for the chunk being written, counts it, bumps the versions it changed and saves the checkpoint after it.
+    async def settle():
+        task, line, changed = pending
+        written, failed = await task
+        stats["documents"] += written
+        stats["failed"] += failed
+        await bump_versions(*changed)
+        _write_checkpoint(checkpoint_path, path, line)
+
+    operations = []
+    keys = []
+    last_line = checkpoint["line"]
+    async for last_line, document in read_documents(path, checkpoint["line"]):
+        if not isinstance(document, dict) or "id" not in document:
+            stats["failed"] += 1
+            if len(stats["failed_lines"]) < TRANSFER_FAILED_LINES:
+                stats["failed_lines"].append(last_line)
+            continue
+        operations.append(ReplaceOne({"id": document["id"]}, document, upsert=True))
+        keys.extend(_version_keys(name, document))
+        if len(operations) >= TRANSFER_CHUNK_SIZE:
+            if pending is not None:
+                await settle()
+            pending = (asyncio.create_task(_write_chunk(collection, operations)), last_line, keys)
+            operations = []
+            keys = []
+    if operations:
+        if pending is not None:
+            await settle()
+        pending = (asyncio.create_task(_write_chunk(collection, operations)), last_line, keys)
+    if pending is not None:
+        await settle()
+    _write_checkpoint(checkpoint_path, path, last_line, complete=True)
+    return _throughput(stats, start)
+
+
+# Imports the named collections (all whose files exist by default) in parallel. Returns the stats of each.
+async def import_dump(directory, names=None, restart=False):
+    names = names or [name for name in COLLECTIONS if (Path(directory) / f"{name}.ndjson.gz").exists()]
+    return await asyncio.gather(*(import_collection(name, directory, restart) for name in names))
+
+
+def _print_report(results, start):
+    for stats in results:
+        print(orjson.dumps(stats).decode())
+    total = sum(stats["documents"] for stats in results)
+    seconds = time.perf_counter() - start
+    print(f"{total} documents in {seconds:.1f} s ({total / seconds if seconds else 0:.0f} docs/s)")
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Export or import collections as gzip-compressed NDJSON.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory", help="Directory holding one <collection>.ndjson.gz file per collection")
+    parser.add_argument("--collections", nargs="+", choices=list(COLLECTIONS), help="Default: all")
+    parser.add_argument("--user", help="Export only this user's data")
+    parser.add_argument("--restart", action="store_true", help="Import from the start, ignoring checkpoints")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    if args.command == "export":
+        results = await export(args.directory, args.collections, args.user)
+    else:
+        results = await import_dump(args.directory, args.collections, args.restart)
+    _print_report(results, start)
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())